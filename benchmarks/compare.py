@@ -0,0 +1,56 @@
+"""
+Compare two benchmark result files side by side.
+
+Usage:
+    python benchmarks/compare.py benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+
+import json
+import sys
+from typing import Dict, Iterator, Tuple
+
+
+def flatten(result: dict, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in result.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def keyed(results: list, fields: Tuple[str, ...]) -> Dict[tuple, dict]:
+    return {tuple(result[field] for field in fields): result for result in results}
+
+
+def main() -> None:
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    with open(sys.argv[1]) as f:
+        old = json.load(f)
+    with open(sys.argv[2]) as f:
+        new = json.load(f)
+
+    print(f"old: {old['environment']['commit']} ({old['environment']['timestamp']})")
+    print(f"new: {new['environment']['commit']} ({new['environment']['timestamp']})")
+
+    sections = (("vector", ("index", "n", "dimension")), ("phonetic", ("n",)))
+    for section, fields in sections:
+        old_results = keyed(old.get(section, []), fields)
+        for key, new_result in keyed(new.get(section, []), fields).items():
+            if key not in old_results:
+                continue
+            print()
+            print(f"[{section}] " + " ".join(f"{field}={value}" for field, value in zip(fields, key)))
+            old_metrics = dict(flatten(old_results[key]))
+            for metric, new_value in flatten(new_result):
+                old_value = old_metrics.get(metric)
+                if old_value is None or metric in fields or metric in ("k", "queries"):
+                    continue
+                change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+                print(f"  {metric:<32} {old_value:>14.4f} {new_value:>14.4f} {change:>+8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
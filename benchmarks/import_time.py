@@ -0,0 +1,108 @@
+"""
+Import-time benchmark and guard for the lazily imported backends.
+
+This script:
+1. Imports each module in a fresh interpreter with python -X importtime
+2. Reports the best wall time over a few runs and the slowest top-level dependencies
+3. Checks that no heavy backend (torch, transformers, google.generativeai, epitran) was pulled in
+4. Exits with status 1 when a module goes over its budget or imports a heavy backend,
+   so it can run in CI next to the build
+
+Search workers and short CLI runs only need FAISS and numpy; the backends are imported when an
+embedder or matcher is constructed.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modules src.faiss_manager --budget 0.5 --runs 5
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+root = Path(__file__).parent.parent
+
+# module -> budget in seconds, interpreter startup included
+budgets: Dict[str, float] = {
+    "src.faiss_manager": 1.0,
+    "src.image_embedder": 1.0,
+    "src.phonetic_matcher": 1.0,
+    "src.sharded_index": 1.0,
+    "src.search_service": 1.5,
+}
+heavy_modules: List[str] = ["torch", "transformers", "google.generativeai", "epitran", "sentence_transformers"]
+
+probe = (
+    "import importlib, sys; importlib.import_module(sys.argv[1]); "
+    "print(','.join(name for name in sys.argv[2:] if name in sys.modules))"
+)
+
+
+def import_once(module: str) -> Tuple[float, subprocess.CompletedProcess]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe, module, *heavy_modules],
+        cwd=root,
+        capture_output=True,
+        text=True
+    )
+    return time.perf_counter() - start, result
+
+
+def top_level_imports(stderr: str) -> List[Tuple[int, str]]:
+    # "import time: self [us] | cumulative | imported package"; nested imports are indented
+    # by two spaces per level
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name[1:].rstrip()
+        if not name.startswith(" "):
+            timings.append((int(cumulative_us), name))
+    return sorted(timings, reverse=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=list(budgets))
+    parser.add_argument("--budget", type=float, default=None, help="Seconds, overrides the per-module budgets")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules:
+        budget = args.budget if args.budget is not None else budgets.get(module, 1.0)
+        runs = [import_once(module) for _ in range(args.runs)]
+        wall, result = min(runs, key=lambda run: run[0])
+        if result.returncode != 0:
+            print(f"{module}: import failed\n    {result.stderr.strip().splitlines()[-1]}")
+            failures.append(module)
+            continue
+
+        timings = top_level_imports(result.stderr)
+        loaded = [name for name in result.stdout.strip().split(",") if name]
+        passed = wall <= budget and not loaded
+        print(
+            f"{module:<22} {wall * 1e3:6.0f} ms wall (best of {args.runs}), "
+            f"{sum(us for us, _ in timings) / 1e3:6.0f} ms importing, budget {budget * 1e3:.0f} ms "
+            f"[{'ok' if passed else 'FAIL'}]"
+        )
+        for us, name in timings[:args.top]:
+            print(f"    {us / 1e3:8.1f} ms  {name}")
+        if loaded:
+            print(f"    heavy backends imported: {', '.join(loaded)}")
+        if not passed:
+            failures.append(module)
+
+    if failures:
+        print(f"Over budget or importing heavy backends: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Offline recall/latency benchmarks for the vector and phonetic search paths.
+
+This script:
+1. Generates synthetic embedding corpora (sizes x dimensions) and French-like mark strings
+2. Builds, saves and reloads each index configuration through FaissManager
+3. Measures build/load time, index size, QPS, p50/p99 latency and recall@k against exact IndexFlatL2
+4. Measures phonetic throughput: transcription, full scan, q-gram retrieval and candidate reranking
+5. Writes everything as JSON to benchmarks/results/ so runs can be compared across commits
+
+Text queries are embedded by the deterministic FakeEmbedder, so nothing leaves the machine.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 10000 100000 1000000 --dimensions 768 3072
+    python benchmarks/compare.py benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import faiss
+import numpy as np
+from benchmarks import synthetic
+from src.faiss_manager import FaissManager
+from src.embedder import FakeEmbedder
+from src.index_config import IndexConfig
+from src.storage_provider import FileSystemStorageProvider
+from src.phonetic_matcher import PhoneticMatcher
+
+results_dir = Path(__file__).parent / "results"
+
+
+def index_config(name: str, n: int, dimension: int) -> IndexConfig:
+    # IVF needs ~39 training points per list; keep nlist ~ 4 * sqrt(n) within that limit
+    nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+    configs = {
+        "flat": IndexConfig.flat(),
+        "sq_fp16": IndexConfig.sq_fp16(),
+        "sq8": IndexConfig.sq8(),
+        "hnsw": IndexConfig.hnsw(),
+        "ivf_flat": IndexConfig.ivf_flat(nlist),
+        "ivf_pq": IndexConfig.ivf_pq(nlist, m=dimension // 32),
+    }
+    if name not in configs:
+        raise ValueError(f"Unknown index {name!r}, expected one of {list(configs)}")
+    return configs[name]
+
+
+def latency_stats(latencies: np.ndarray) -> dict:
+    return {
+        "p50_ms": float(np.percentile(latencies, 50) * 1e3),
+        "p99_ms": float(np.percentile(latencies, 99) * 1e3),
+        "mean_ms": float(latencies.mean() * 1e3),
+        "qps": float(len(latencies) / latencies.sum()),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux and bytes on macOS; a process-wide high-water mark
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == "darwin" else 2**10)
+
+
+def bench_vectors(n: int, dimension: int, index_name: str, n_queries: int, k: int, workdir: str) -> dict:
+    config = index_config(index_name, n, dimension)
+    index_path = os.path.join(workdir, f"{index_name}_{n}_{dimension}.faiss")
+    mapping_path = os.path.join(workdir, f"{index_name}_{n}_{dimension}_mapping.json")
+    storage = FileSystemStorageProvider(index_path, mapping_path)
+    faiss_manager = FaissManager(storage_provider=storage, embedder=FakeEmbedder(dimension))
+    exact = faiss.IndexFlatL2(dimension)
+
+    build_seconds = 0.0
+    offset = 0
+    for chunk in synthetic.embedding_chunks(n, dimension):
+        texts = [f"mark-{i}" for i in range(offset, offset + len(chunk))]
+        started = time.perf_counter()
+        if faiss_manager.index is None:
+            faiss_manager.create_index(dimension, config)
+            faiss_manager.train(chunk)
+        faiss_manager.add_vectors(chunk, texts)
+        build_seconds += time.perf_counter() - started
+        exact.add(chunk)
+        offset += len(chunk)
+
+    started = time.perf_counter()
+    faiss_manager.save()
+    save_seconds = time.perf_counter() - started
+
+    loaded = FaissManager(storage_provider=storage, embedder=FakeEmbedder(dimension))
+    started = time.perf_counter()
+    loaded.load()
+    load_seconds = time.perf_counter() - started
+
+    mmapped = FaissManager(storage_provider=storage, embedder=FakeEmbedder(dimension))
+    started = time.perf_counter()
+    mmapped.load(mmap=True)
+    mmap_load_seconds = time.perf_counter() - started
+
+    queries = synthetic.queries(n_queries, dimension)
+    _, ground_truth = exact.search(queries, k)
+
+    started = time.perf_counter()
+    batch = loaded.search_batch(queries, k)
+    batch_seconds = time.perf_counter() - started
+    found = sum(len(np.intersect1d(truth, ids[ids >= 0])) for truth, ids in zip(ground_truth, batch.ids))
+
+    latencies = np.empty(n_queries)
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        loaded.search_by_embedding(query, k)
+        latencies[i] = time.perf_counter() - started
+
+    # search() end to end with the fake embedder: query embedding, mapping lookups and glue included
+    text_queries = [f"query-{i}" for i in range(min(n_queries, 200))]
+    text_latencies = np.empty(len(text_queries))
+    for i, text in enumerate(text_queries):
+        started = time.perf_counter()
+        loaded.search(text, k)
+        text_latencies[i] = time.perf_counter() - started
+
+    index_bytes = os.path.getsize(index_path)
+    for path in (index_path, mapping_path):
+        os.remove(path)
+    return {
+        "n": n,
+        "dimension": dimension,
+        "index": index_name,
+        "factory": config.factory,
+        "k": k,
+        "queries": n_queries,
+        "build_seconds": build_seconds,
+        "save_seconds": save_seconds,
+        "load_seconds": load_seconds,
+        "mmap_load_seconds": mmap_load_seconds,
+        "index_bytes": index_bytes,
+        "bytes_per_vector": index_bytes / n,
+        "peak_rss_mb": peak_rss_mb(),
+        f"recall_at_{k}": found / (n_queries * k),
+        "batch_qps": n_queries / batch_seconds,
+        "search_by_embedding": latency_stats(latencies),
+        "search_fake_embedder": latency_stats(text_latencies),
+    }
+
+
+def bench_phonetic(n: int, n_queries: int, k: int) -> dict:
+    matcher = PhoneticMatcher()
+    corpus = synthetic.marks(n)
+
+    started = time.perf_counter()
+    phonetic_index = matcher.build_index(dict(enumerate(corpus)))
+    transcribe_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    phonetic_index.qgrams
+    qgram_build_seconds = time.perf_counter() - started
+
+    query_phonetics = [matcher.to_phonetic(query) for query in synthetic.marks(n_queries, seed=1)]
+
+    def timed(search) -> dict:
+        latencies = np.empty(len(query_phonetics))
+        for i, query_phonetic in enumerate(query_phonetics):
+            started = time.perf_counter()
+            search(query_phonetic)
+            latencies[i] = time.perf_counter() - started
+        return latency_stats(latencies)
+
+    # The pre-index path: rerank a semantic candidate list (transcriptions warm in the matcher cache)
+    candidates = corpus[:300]
+    for candidate in candidates:
+        matcher.to_phonetic(candidate)
+    rerank_latencies = np.empty(len(query_phonetics))
+    for i, query in enumerate(synthetic.marks(n_queries, seed=1)):
+        started = time.perf_counter()
+        matcher.rank_by_phonetic_similarity(query, candidates)
+        rerank_latencies[i] = time.perf_counter() - started
+
+    return {
+        "n": n,
+        "k": k,
+        "queries": n_queries,
+        "transcriptions_per_second": n / transcribe_seconds,
+        "qgram_build_seconds": qgram_build_seconds,
+        "scan_top_k": timed(lambda q: phonetic_index.search(q, k)),
+        "qgram_top_k": timed(lambda q: phonetic_index.search_nearest(q, k)),
+        "qgram_within_2": timed(lambda q: phonetic_index.search_within(q, 2)),
+        "rerank_300": latency_stats(rerank_latencies),
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "faiss": faiss.__version__,
+        "faiss_threads": faiss.omp_get_max_threads(),
+        "numpy": np.__version__,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[768, 3072])
+    parser.add_argument("--indexes", nargs="+", default=["flat", "sq8", "hnsw", "ivf_flat"])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--phonetic-sizes", type=int, nargs="*", default=[10000])
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "vector": [], "phonetic": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            for dimension in args.dimensions:
+                for index_name in args.indexes:
+                    result = bench_vectors(n, dimension, index_name, args.queries, args.k, workdir)
+                    report["vector"].append(result)
+                    print(
+                        f"{index_name:<9} n={n:<8} d={dimension:<5} build={result['build_seconds']:7.2f}s "
+                        f"recall@{args.k}={result[f'recall_at_{args.k}']:.3f} "
+                        f"p50={result['search_by_embedding']['p50_ms']:.2f}ms "
+                        f"p99={result['search_by_embedding']['p99_ms']:.2f}ms "
+                        f"batch={result['batch_qps']:.0f} q/s"
+                    )
+
+    for n in args.phonetic_sizes:
+        result = bench_phonetic(n, min(args.queries, 200), args.k)
+        report["phonetic"].append(result)
+        print(
+            f"phonetic  n={n:<8} scan p50={result['scan_top_k']['p50_ms']:.2f}ms "
+            f"qgram p50={result['qgram_top_k']['p50_ms']:.2f}ms "
+            f"rerank300 p50={result['rerank_300']['p50_ms']:.2f}ms"
+        )
+
+    output = Path(args.output) if args.output else results_dir / f"{report['environment']['commit'] or 'nogit'}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
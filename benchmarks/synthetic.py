@@ -0,0 +1,55 @@
+"""
+Deterministic synthetic data for the benchmarks: clustered unit-length embeddings
+and French-looking trademark strings. No API call, no dataset download.
+"""
+
+from typing import Iterator, List
+import numpy as np
+
+_ONSETS = ["", "b", "c", "d", "f", "g", "j", "l", "m", "n", "p", "r", "s", "t", "v",
+           "br", "ch", "cr", "fl", "gr", "pl", "qu", "tr", "vr"]
+_VOWELS = ["a", "e", "i", "o", "u", "é", "è", "ou", "au", "eau", "ai", "oi", "an", "en", "on", "in"]
+_CODAS = ["", "", "", "l", "r", "s", "x", "t", "que", "ne", "tte", "lle"]
+_WORDS = ["Le", "La", "Les", "Maison", "Crédit", "Société", "Groupe", "Atelier", "Café", "Domaine"]
+
+
+def embedding_chunks(n: int, dimension: int, seed: int = 0, clusters: int = 256, chunk_size: int = 50000) -> Iterator[np.ndarray]:
+    # Gaussian blobs around random centres: neighbourhoods look like real embedding spaces,
+    # unlike uniform noise where every point is about as far as every other
+    centres = _centres(dimension, seed, clusters)
+    for start in range(0, n, chunk_size):
+        yield _sample(centres, min(chunk_size, n - start), np.random.default_rng([seed, start]))
+
+
+def embeddings(n: int, dimension: int, seed: int = 0) -> np.ndarray:
+    return np.vstack(list(embedding_chunks(n, dimension, seed)))
+
+
+def queries(n: int, dimension: int, seed: int = 0, clusters: int = 256) -> np.ndarray:
+    # Same clusters as the corpus built with this seed, but not corpus members
+    return _sample(_centres(dimension, seed, clusters), n, np.random.default_rng([seed, 2**32 - 1]))
+
+
+def _centres(dimension: int, seed: int, clusters: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((clusters, dimension)).astype('float32')
+
+
+def _sample(centres: np.ndarray, n: int, rng: np.random.Generator) -> np.ndarray:
+    vectors = centres[rng.integers(0, len(centres), n)] + 0.6 * rng.standard_normal((n, centres.shape[1])).astype('float32')
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def marks(n: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    result: List[str] = []
+    for _ in range(n):
+        syllables = rng.integers(1, 4)
+        word = "".join(
+            _ONSETS[rng.integers(len(_ONSETS))] + _VOWELS[rng.integers(len(_VOWELS))]
+            for _ in range(syllables)
+        ) + _CODAS[rng.integers(len(_CODAS))]
+        word = word.capitalize()
+        if rng.random() < 0.3:
+            word = f"{_WORDS[rng.integers(len(_WORDS))]} {word}"
+        result.append(word)
+    return result
@@ -0,0 +1,43 @@
+"""
+Script for building a sharded FAISS index from raw data.
+
+This script:
+1. Loads raw data from JSON file
+2. Extracts the "Mark" text of each record, keyed by ApplicationNumber
+3. Splits the records across N shards by id hash
+4. Builds and saves one FAISS cosine index (and mapping) per shard
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.storage_provider import FileSystemStorageProvider
+from src.embedding_cache import EmbeddingCache
+from src.index_config import IndexConfig
+from src.sharded_index import build_shards, shard_storages
+
+json_file = "data/marques-francaises-latest-50k.json"
+index_path = "data/marques_index.faiss"
+mapping_path = "data/marques_mapping.json"
+cache_path = "data/embedding_cache.sqlite"
+shards = 4
+
+embedding_cache = EmbeddingCache(cache_path)
+data = FileSystemStorageProvider(index_path, mapping_path).load_data(json_file)
+
+marks_by_id = {}
+for record in data:
+    if "Mark" in record:
+        marks_by_id[record["ApplicationNumber"]] = record["Mark"]
+
+build_shards(
+    list(marks_by_id.values()),
+    list(marks_by_id.keys()),
+    shard_storages(index_path, mapping_path, shards),
+    index_config=IndexConfig.flat(metric="cosine"),
+    mode="hash",
+    embedding_cache=embedding_cache
+)
+print(f"Built {shards} shards from {len(marks_by_id)} marks")
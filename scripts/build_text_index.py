@@ -2,11 +2,13 @@
 Script for building FAISS indexes from raw data.
 
 This script:
-1. Loads raw data from JSON file
-2. Extracts text fields (e.g., "Mark" field from trademark records)
-3. Generates embeddings using Google Gemini API
-4. Builds a FAISS L2 index for similarity search
-5. Saves the index and mapping to disk
+1. Streams the raw JSON (or JSONL) feed record by record
+2. Normalizes each "Mark" (HTML entities, case, accents, whitespace) and groups records by it
+3. Generates one embedding per distinct mark using Google Gemini API, chunk by chunk
+4. Builds a FAISS cosine-similarity index for similarity search
+5. Saves the index, the mapping and the mark -> records groups to disk
+6. Precomputes the phonetic transcriptions next to the mapping
+7. Stores filing date, Nice classes and status per record for filtered searches
 """
 
 import sys
@@ -16,25 +18,26 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.faiss_manager import FaissManager
 from src.storage_provider import FileSystemStorageProvider
+from src.embedding_cache import EmbeddingCache
 from src.index_builder import IndexBuilder
+from src.index_config import IndexConfig
+from src.phonetic_matcher import PhoneticMatcher
+from src.corpus_ingestion import CorpusIngestor
 
 json_file = "data/marques-francaises-latest-50k.json"
 index_path = "data/marques_index.faiss"
 mapping_path = "data/marques_mapping.json"
+cache_path = "data/embedding_cache.sqlite"
 
 storage = FileSystemStorageProvider(index_path, mapping_path)
-faiss_manager = FaissManager(storage_provider=storage)
+embedding_cache = EmbeddingCache(cache_path)
+faiss_manager = FaissManager(storage_provider=storage, embedding_cache=embedding_cache)
 indexBuilder = IndexBuilder(faiss_manager)
 
-data = storage.load_data(json_file)
+# Gemini embeddings are not unit-length; cosine normalizes them at add and query time
+ingestor = CorpusIngestor(indexBuilder, chunk_size=2000)
+report = ingestor.build(json_file, index_config=IndexConfig.flat(metric="cosine"))
+print(report.format())
 
-marks = []
-for record in data[:10000]:
-    try:
-        marks.append(record["Mark"])
-    except KeyError:
-        # Some records may not have "Mark" field 
-        print(record["ApplicationNumber"], record["ApplicationDate"])
-        pass
-
-indexBuilder.build_index_from_texts(marks)
\ No newline at end of file
+# Transcribe every mark once at build time instead of on every phonetic query
+PhoneticMatcher().build_index(faiss_manager.mapping).save(storage)
@@ -0,0 +1,48 @@
+"""
+Script for comparing compressed storage modes of the text index.
+
+This script:
+1. Loads the pre-built FAISS text index
+2. Reconstructs its vectors by stored id and samples query vectors from the corpus
+3. Builds scalar-quantized (fp16/int8), PQ and Matryoshka-truncated variants
+4. Reports memory footprint and recall@10 of each mode against the exact index
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from src.faiss_manager import FaissManager
+from src.storage_provider import FileSystemStorageProvider
+from src.index_config import IndexConfig
+from src.index_evaluation import compare_compression
+
+index_path = "data/marques_index.faiss"
+mapping_path = "data/marques_mapping.json"
+
+storage = FileSystemStorageProvider(index_path, mapping_path)
+faiss_manager = FaissManager(storage_provider=storage)
+faiss_manager.load()
+
+_, embeddings = faiss_manager.reconstruct_all()
+metric = faiss_manager.config.metric
+rng = np.random.default_rng(0)
+queries = embeddings[rng.choice(len(embeddings), min(500, len(embeddings)), replace=False)]
+dimension = embeddings.shape[1]
+
+# Every mode is compared with the metric the index was built with
+configs = {
+    "flat": IndexConfig.flat(metric=metric),
+    "sq_fp16": IndexConfig.sq_fp16(metric=metric),
+    "sq8": IndexConfig.sq8(metric=metric),
+    "pq": IndexConfig.pq(m=dimension // 32, metric=metric),
+    "flat_768": IndexConfig(factory="Flat", output_dimensionality=768, metric=metric),
+    "sq8_768": IndexConfig(factory="SQ8", output_dimensionality=768, metric=metric),
+    "sq8_256": IndexConfig(factory="SQ8", output_dimensionality=256, metric=metric),
+}
+
+print(f"{len(embeddings)} vectors of dimension {dimension} ({metric})")
+for report in compare_compression(storage, embeddings, queries, configs, k=10):
+    print(report.format())
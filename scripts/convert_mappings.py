@@ -0,0 +1,31 @@
+"""
+Script for converting JSON mappings to the memory-mapped mapping store.
+
+This script:
+1. Loads each existing *_mapping.json file
+2. Writes it as a compact store (sorted ids, offsets, UTF-8 payload blob)
+3. Prints the number of converted entries
+
+Point FileSystemStorageProvider at the resulting directory instead of the
+.json file to load mappings lazily.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.mapping_store import convert_json_mapping
+
+mappings = [
+    ("data/marques_mapping.json", "data/marques_mapping.mmap"),
+    ("data/images_mapping.json", "data/images_mapping.mmap"),
+]
+
+for json_path, store_path in mappings:
+    if not Path(json_path).exists():
+        print(f"Skipping {json_path} (not found)")
+        continue
+
+    count = convert_json_mapping(json_path, store_path)
+    print(f"{json_path} -> {store_path} ({count} entries)")
@@ -6,6 +6,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from src.faiss_manager import FaissManager
 from src.storage_provider import FileSystemStorageProvider
 from src.phonetic_matcher import PhoneticMatcher
+from src.phonetic_index import PhoneticIndex
 
 USE_SEMANTIC_SEARCH_RESULT = False
 
@@ -54,8 +55,12 @@ else:
     print("=" * 60)
     print()
     
-    all_brands = list(faiss_manager.mapping.values())
-    print(f"Total brands in database: {len(all_brands)}")
+    # Transcriptions are precomputed at build time; fall back to transcribing the mapping once
+    if PhoneticIndex.exists(storage):
+        phonetic_index = PhoneticIndex.load(storage)
+    else:
+        phonetic_index = phonetic_matcher.build_index(faiss_manager.mapping)
+    print(f"Total brands in database: {len(phonetic_index.ids)}")
     print()
     
     for query in test_queries:
@@ -64,10 +69,10 @@ else:
         print(f"Query phonetic: {query_phonetic}")
         print()
         
-        phonetic_results = phonetic_matcher.rank_by_phonetic_similarity(query, all_brands)
+        phonetic_results = phonetic_matcher.search_similar(query, phonetic_index, k=10)
         
         print(f"Top 10 phonetic matches (full scan):")
-        for i, (text, distance) in enumerate(phonetic_results[:10], 1):
+        for i, (_, text, distance) in enumerate(phonetic_results, 1):
             text_phonetic = phonetic_matcher.to_phonetic(text)
             print(f"  {i}. {text}")
             print(f"     → {text_phonetic} (Levenshtein: {distance})")
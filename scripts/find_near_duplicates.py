@@ -0,0 +1,61 @@
+"""
+Script for finding near-duplicate marks and images across the whole index.
+
+This script:
+1. Loads the pre-built FAISS text and image indexes (memory-mapped)
+2. Runs a tiled range search of every vector against its own index
+3. Groups the pairs closer than the threshold into clusters (connected components)
+4. Writes the clusters with their payloads to JSON and prints the largest ones
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.faiss_manager import FaissManager
+from src.storage_provider import FileSystemStorageProvider
+
+indexes = [
+    ("text", "data/marques_index.faiss", "data/marques_mapping.json", "data/marques_duplicates.json"),
+    ("image", "data/images_index.faiss", "data/images_mapping.json", "data/images_duplicates.json"),
+]
+# Both models produce unit vectors: a 0.95 cosine score is a 0.1 squared L2 distance
+thresholds = {"l2": 0.1, "ip": 0.95, "cosine": 0.95}
+batch_size = 4096
+threads = None  # all cores
+
+for name, index_path, mapping_path, output_path in indexes:
+    storage = FileSystemStorageProvider(index_path, mapping_path)
+    if not storage.index_exists():
+        print(f"Skipping {name}: {index_path} not found")
+        continue
+
+    faiss_manager = FaissManager(storage_provider=storage)
+    faiss_manager.load(mmap=True)
+    threshold = thresholds[faiss_manager.config.metric]
+
+    start = time.perf_counter()
+    graph = faiss_manager.range_graph(threshold, batch_size=batch_size, threads=threads)
+    clusters = graph.clusters()
+    elapsed = time.perf_counter() - start
+
+    print(f"{name}: {len(graph.ids)} vectors, {len(graph.pairs()[0])} pairs within {threshold} "
+          f"({faiss_manager.config.metric}), {len(clusters)} clusters in {elapsed:.1f}s")
+    for cluster in clusters[:5]:
+        print(f"    {len(cluster)}: {faiss_manager.lookup(cluster[:5]).tolist()}")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(
+            [{"ids": cluster.tolist(), "payloads": faiss_manager.lookup(cluster).tolist()} for cluster in clusters],
+            f,
+            ensure_ascii=False,
+            indent=2
+        )
+    print(f"    Saved to {output_path}")
+    print()
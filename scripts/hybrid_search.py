@@ -0,0 +1,55 @@
+"""
+Script for clearance checks combining semantic and phonetic similarity.
+
+This script:
+1. Loads the pre-built FAISS index, mapping and phonetic index
+2. Runs the semantic and phonetic retrieval for each query concurrently
+3. Fuses both rankings with reciprocal-rank fusion
+4. Displays the fused matches with their rank in each source
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.faiss_manager import FaissManager
+from src.storage_provider import FileSystemStorageProvider
+from src.embedding_cache import EmbeddingCache
+from src.phonetic_matcher import PhoneticMatcher
+from src.phonetic_index import PhoneticIndex
+from src.hybrid_searcher import HybridSearcher
+
+index_path = "data/marques_index.faiss"
+mapping_path = "data/marques_mapping.json"
+cache_path = "data/embedding_cache.sqlite"
+
+storage = FileSystemStorageProvider(index_path, mapping_path)
+embedding_cache = EmbeddingCache(cache_path)
+faiss_manager = FaissManager(storage_provider=storage, embedding_cache=embedding_cache)
+faiss_manager.load(mmap=True)
+
+phonetic_matcher = PhoneticMatcher()
+if PhoneticIndex.exists(storage):
+    phonetic_index = PhoneticIndex.load(storage)
+else:
+    phonetic_index = phonetic_matcher.build_index(faiss_manager.mapping)
+
+searcher = HybridSearcher(faiss_manager, phonetic_matcher, phonetic_index, fusion="rrf", time_budget=0.5)
+
+test_queries = [
+    "Selego",
+    "Crédit",
+    "Larodj",
+]
+
+for query in test_queries:
+    hits = searcher.search(query, k=10)
+    
+    print(f"Query: {query}")
+    print(f"Top {len(hits)} fused matches (pool: {searcher.last_pool_size}, exact: {searcher.last_exact}):")
+    for hit in hits:
+        print(f"    {hit.text} (score: {hit.score:.4f}, semantic rank: {hit.semantic_rank}, phonetic rank: {hit.phonetic_rank})")
+    print()
+
+searcher.close()
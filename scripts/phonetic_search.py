@@ -6,6 +6,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from src.faiss_manager import FaissManager
 from src.storage_provider import FileSystemStorageProvider
 from src.phonetic_matcher import PhoneticMatcher
+from src.phonetic_index import PhoneticIndex
 
 USE_SEMANTIC_SEARCH_RESULT = True
 
@@ -41,17 +42,19 @@ if USE_SEMANTIC_SEARCH_RESULT:
         print()
 
 else:
-    faiss_manager = FaissManager(storage_provider=storage)
-    faiss_manager.load()
-    
-    all_brands = list(faiss_manager.mapping.values())
+    if PhoneticIndex.exists(storage):
+        phonetic_index = PhoneticIndex.load(storage)
+    else:
+        faiss_manager = FaissManager(storage_provider=storage)
+        faiss_manager.load()
+        phonetic_index = phonetic_matcher.build_index(faiss_manager.mapping)
     
     for query in test_queries:
-        phonetic_results = phonetic_matcher.rank_by_phonetic_similarity(query, all_brands)
+        phonetic_results = phonetic_matcher.search_similar(query, phonetic_index, k=10)
         
         print(f"Query: {query}")
         print(f"Phonetic matches (top 10):")
-        for text, distance in phonetic_results[:10]:
+        for _, text, distance in phonetic_results:
             phonetic_repr = phonetic_matcher.to_phonetic(text)
             print(f"    {text} → {phonetic_repr} (Levenshtein: {distance})")
         print()
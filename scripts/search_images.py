@@ -5,7 +5,7 @@ This script:
 1. Loads the pre-built FAISS image index and mapping
 2. Generates embeddings for query image using CLIP
 3. Performs similarity search to find the closest matches
-4. Displays results with distances
+4. Displays results with distances (or cosine scores)
 """
 
 import os
@@ -21,6 +21,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.faiss_manager import FaissManager
 from src.storage_provider import FileSystemStorageProvider
+from src.embedding_cache import EmbeddingCache
 from src.image_embedder import ImageEmbedder
 
 def load_image_from_url(url: str) -> Image.Image:
@@ -31,12 +32,16 @@ def load_image_from_url(url: str) -> Image.Image:
 
 index_path = "data/images_index.faiss"
 mapping_path = "data/images_mapping.json"
+cache_path = "data/embedding_cache.sqlite"
+# Vision-only CLIP weights as safetensors, written on the first run
+clip_weights_path = "data/clip_vision"
 
 storage = FileSystemStorageProvider(index_path, mapping_path)
-faiss_manager = FaissManager(storage_provider=storage)
-image_embedder = ImageEmbedder()
+embedding_cache = EmbeddingCache(cache_path)
+faiss_manager = FaissManager(storage_provider=storage, embedding_cache=embedding_cache)
+image_embedder = ImageEmbedder(embedding_cache=embedding_cache, weights_cache=clip_weights_path)
 
-faiss_manager.load()
+faiss_manager.load(mmap=True)
 
 test_queries = [
     "https://images.unsplash.com/photo-1574158622682-e40e69881006?w=800&h=600&fit=crop",
@@ -49,7 +54,8 @@ for query_url in test_queries:
     
     print(f"Query: {query_url}")
     print(f"Found {len(results)} matches:")
+    label = "score" if faiss_manager.config.higher_is_better else "distance"
     for image_url, distance in results:
-        print(f"    {image_url} (distance: {distance})")
+        print(f"    {image_url} ({label}: {distance})")
     print()
 
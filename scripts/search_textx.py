@@ -5,7 +5,8 @@ This script:
 1. Loads the pre-built FAISS index and mapping
 2. Generates embeddings for query text using Google Gemini API
 3. Performs similarity search to find the closest matches
-4. Displays results with distances
+4. Displays results with distances (or cosine scores)
+5. Repeats a query restricted to a filing period, Nice classes and status
 """
 
 import sys
@@ -15,14 +16,18 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.faiss_manager import FaissManager
 from src.storage_provider import FileSystemStorageProvider
+from src.embedding_cache import EmbeddingCache
+from src.record_attributes import RecordFilter
 
 index_path = "data/marques_index.faiss"
 mapping_path = "data/marques_mapping.json"
+cache_path = "data/embedding_cache.sqlite"
 
 storage = FileSystemStorageProvider(index_path, mapping_path)
-faiss_manager = FaissManager(storage_provider=storage)
+embedding_cache = EmbeddingCache(cache_path)
+faiss_manager = FaissManager(storage_provider=storage, embedding_cache=embedding_cache)
 
-faiss_manager.load()
+faiss_manager.load(mmap=True)
 
 test_queries = [
     "Selego",
@@ -34,6 +39,15 @@ for query in test_queries:
     
     print(f"Query: {query}")
     print(f"Found {len(results)} matches:")
+    label = "score" if faiss_manager.config.higher_is_better else "distance"
     for text, distance in results:
-        print(f"    {text} (distance: {distance})")
-    print()
\ No newline at end of file
+        print(f"    {text} ({label}: {distance})")
+    print()
+
+# Clearance search: class 9 and 42 marks filed since 2015 that are still registered
+if faiss_manager.attributes is not None:
+    where = RecordFilter(date_from="2015-01-01", classes=[9, 42], statuses=["Registered"])
+    results = faiss_manager.search("Selego", k=3, where=where)
+    print(f"Query: Selego {where}")
+    for text, distance in results:
+        print(f"    {text} ({label}: {distance})")
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Script for serving text, image and phonetic search over HTTP.
+
+This script:
+1. Loads the FAISS indexes (memory-mapped), the phonetic index and the CLIP model once
+2. Starts an asyncio HTTP server; concurrent queries arriving within a few milliseconds
+   are embedded and searched as one batch
+3. Reloads the indexes without downtime on POST /admin/reload or SIGHUP
+
+Endpoints:
+    GET  /health
+    GET  /metrics          Prometheus text format (/metrics.json for JSON)
+    POST /search/text      {"query": "Selego", "k": 10}
+    POST /search/image     raw image bytes (?k=10) or {"url": "...", "k": 10} (hosts in image_url_hosts only)
+    POST /search/phonetic  {"query": "Selego", "k": 10, "max_distance": 2}
+    POST /admin/reload     "Authorization: Bearer $ADMIN_TOKEN" when ADMIN_TOKEN is set, else local clients only
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import asyncio
+import signal
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aiohttp import web
+from src.search_service import SearchService
+from src.storage_provider import FileSystemStorageProvider
+from src.embedding_cache import EmbeddingCache
+from src.image_embedder import ImageEmbedder
+from src.phonetic_matcher import PhoneticMatcher
+from src.metrics import metrics
+
+text_index_path = "data/marques_index.faiss"
+text_mapping_path = "data/marques_mapping.json"
+image_index_path = "data/images_index.faiss"
+image_mapping_path = "data/images_mapping.json"
+cache_path = "data/embedding_cache.sqlite"
+# Vision-only CLIP weights as safetensors, written on the first run
+clip_weights_path = "data/clip_vision"
+# Loopback only by default; put a reverse proxy in front (and set ADMIN_TOKEN) to expose it
+host = "127.0.0.1"
+port = 8080
+# Hosts /search/image may fetch {"url": ...} queries from; empty disables URL queries
+image_url_hosts = []
+
+text_storage = FileSystemStorageProvider(text_index_path, text_mapping_path)
+image_storage = FileSystemStorageProvider(image_index_path, image_mapping_path)
+embedding_cache = EmbeddingCache(cache_path)
+has_images = image_storage.index_exists()
+metrics.enable()
+
+service = SearchService(
+    text_storage=text_storage,
+    image_storage=image_storage if has_images else None,
+    embedding_cache=embedding_cache,
+    image_embedder=ImageEmbedder(embedding_cache=embedding_cache, weights_cache=clip_weights_path) if has_images else None,
+    phonetic_matcher=PhoneticMatcher(),
+    max_batch=64,
+    max_wait_ms=5,
+    url_hosts=image_url_hosts,
+    admin_token=os.getenv("ADMIN_TOKEN") or None
+)
+state = service.load()
+print(f"Loaded {state.text.index.ntotal} text vectors" + (f", {state.image.index.ntotal} image vectors" if has_images else ""))
+
+
+async def on_startup(app: web.Application) -> None:
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(service.reload()))
+
+
+app = service.app()
+app.on_startup.append(on_startup)
+web.run_app(app, host=host, port=port)
@@ -0,0 +1,57 @@
+"""
+Script for searching a sharded FAISS index with local worker processes.
+
+This script:
+1. Starts one worker process per shard, each memory-mapping its index and listening on a Unix socket
+2. Connects a coordinator that embeds each query once and sends it to every shard
+3. Merges the per-shard top-k into the global top-k and displays the results
+
+For shards on other machines, run serve_shard() there with a (host, port) address and
+pass those addresses to ShardedSearcher. TCP shards require an authkey: set the same
+SHARD_AUTHKEY environment variable on every machine.
+"""
+
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.embedding_cache import EmbeddingCache
+from src.sharded_index import ShardedSearcher, shard_storages, start_shards
+
+index_path = "data/marques_index.faiss"
+mapping_path = "data/marques_mapping.json"
+cache_path = "data/embedding_cache.sqlite"
+shards = 4
+# Local workers only need a key shared with this process: a random one unless SHARD_AUTHKEY is set
+authkey = os.getenv("SHARD_AUTHKEY", "").encode('utf-8') or os.urandom(32)
+
+if __name__ == "__main__":
+    socket_dir = tempfile.mkdtemp()
+    addresses = [os.path.join(socket_dir, f"shard{i}.sock") for i in range(shards)]
+    processes = start_shards(shard_storages(index_path, mapping_path, shards), addresses, authkey=authkey)
+
+    searcher = ShardedSearcher(addresses, authkey=authkey, embedding_cache=EmbeddingCache(cache_path))
+    print(f"{searcher.ntotal} vectors across {shards} shards: {[info['ntotal'] for info in searcher.shard_info]}")
+
+    test_queries = [
+        "Selego",
+        "Crédit",
+    ]
+
+    for query in test_queries:
+        results = searcher.search(query, k=3)
+        print(f"Query: {query}")
+        print(f"Found {len(results)} matches:")
+        label = "score" if searcher.config.higher_is_better else "distance"
+        for text, distance in results:
+            print(f"    {text} ({label}: {distance})")
+        print()
+
+    searcher.stop()
+    for process in processes:
+        process.join()
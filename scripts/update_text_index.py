@@ -0,0 +1,46 @@
+"""
+Script for applying the daily trademark feed to an existing FAISS index.
+
+This script:
+1. Loads the existing index, mapping and mark -> records groups (built by build_text_index.py)
+2. Loads new filings and withdrawals from the daily feed files
+3. Adds each filing to the group of its normalized mark; only marks not yet indexed are embedded
+4. Removes the vectors of marks whose last record was withdrawn
+5. Saves the index, mapping, groups and record attributes to disk
+6. Refreshes the phonetic index, transcribing only the new marks
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.faiss_manager import FaissManager
+from src.storage_provider import FileSystemStorageProvider
+from src.embedding_cache import EmbeddingCache
+from src.index_builder import IndexBuilder
+from src.phonetic_matcher import PhoneticMatcher
+from src.phonetic_index import PhoneticIndex
+from src.corpus_ingestion import CorpusIngestor, iter_json_records
+
+new_filings_file = "data/daily_new_filings.json"
+withdrawals_file = "data/daily_withdrawals.json"
+index_path = "data/marques_index.faiss"
+mapping_path = "data/marques_mapping.json"
+cache_path = "data/embedding_cache.sqlite"
+
+storage = FileSystemStorageProvider(index_path, mapping_path)
+embedding_cache = EmbeddingCache(cache_path)
+faiss_manager = FaissManager(storage_provider=storage, embedding_cache=embedding_cache)
+faiss_manager.load()
+indexBuilder = IndexBuilder(faiss_manager)
+
+new_filings = list(iter_json_records(new_filings_file))
+# Withdrawals are a list of ApplicationNumber values
+removals = storage.load_data(withdrawals_file)
+
+report = CorpusIngestor(indexBuilder).update(new_filings, removals)
+print(f"{len(removals)} withdrawals: {report.format()}")
+
+previous = PhoneticIndex.load(storage) if PhoneticIndex.exists(storage) else None
+PhoneticMatcher().build_index(faiss_manager.mapping, previous).save(storage)
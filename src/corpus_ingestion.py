@@ -0,0 +1,273 @@
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Set, TextIO, Tuple, Union
+from itertools import islice
+import html
+import json
+import re
+import unicodedata
+from src.faiss_manager import FaissManager
+from src.index_builder import IndexBuilder
+from src.index_config import IndexConfig
+from src.record_attributes import RecordAttributes
+from src.storage_provider import StorageProvider
+
+_separators = re.compile(r"[\s,]*")
+
+
+def iter_json_records(path: str, chunk_size: int = 1 << 20, max_record_size: int = 1 << 24) -> Iterator[Any]:
+    # A top-level JSON array or JSON Lines, decoded one value at a time from a sliding buffer:
+    # memory stays at one read chunk plus one record whatever the file size. A record that does not
+    # decode within max_record_size characters is a syntax error, not a record cut by the chunk boundary
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, position, eof = _refill(f, "", 0, chunk_size)
+        in_array: Optional[bool] = None
+
+        while True:
+            position = _separators.match(buffer, position).end()
+            if position == len(buffer):
+                if not eof:
+                    buffer, position, eof = _refill(f, buffer, position, chunk_size)
+                    continue
+                if in_array:
+                    raise ValueError(f"Unterminated JSON array in {path}")
+                return
+
+            if in_array is None:
+                in_array = buffer[position] == "["
+                if in_array:
+                    position += 1
+                    continue
+            if in_array and buffer[position] == "]":
+                return
+
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ValueError(f"Invalid JSON in {path}: {e}") from e
+                if len(buffer) - position > max_record_size:
+                    raise ValueError(f"Invalid JSON or a record over {max_record_size} characters in {path}: {e}") from e
+                # Most likely a record cut by the chunk boundary
+                buffer, position, eof = _refill(f, buffer, position, chunk_size)
+                continue
+            if end == len(buffer) and not eof:
+                # A value touching the end of the buffer ("12" of "1234") may be cut short
+                if end - position > max_record_size:
+                    raise ValueError(f"Record over {max_record_size} characters in {path}")
+                buffer, position, eof = _refill(f, buffer, position, chunk_size)
+                continue
+            position = end
+            yield value
+
+
+def _refill(f: TextIO, buffer: str, position: int, chunk_size: int) -> Tuple[str, int, bool]:
+    more = f.read(chunk_size)
+    return buffer[position:] + more, 0, not more
+
+
+def normalize_mark(text: str) -> str:
+    # "L&#39;ORÉAL", "L'Oréal" and " l'oreal " are the same mark
+    text = unicodedata.normalize('NFKD', html.unescape(text))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.casefold().split())
+
+
+def display_mark(text: str) -> str:
+    # What gets embedded and returned: entities decoded, whitespace collapsed, case and accents kept
+    return " ".join(html.unescape(text).split())
+
+
+class MarkGroups:
+    _sidecar_name: str = "mark_groups.json"
+
+    def __init__(self, records: Optional[Dict[int, List[str]]] = None):
+        # FAISS id of each distinct normalized mark -> the record ids (ApplicationNumber) filed under it
+        self.records: Dict[int, List[str]] = records or {}
+        self._group_of: Dict[str, int] = {record_id: group for group, record_ids in self.records.items() for record_id in record_ids}
+
+    @staticmethod
+    def group_id(normalized: str) -> int:
+        # Prefixed so an all-digit mark is hashed rather than read as a numeric id
+        return FaissManager.stable_id(f"mark:{normalized}")
+
+    @classmethod
+    def load(cls, storage_provider: StorageProvider) -> "MarkGroups":
+        if not storage_provider.sidecar_exists(MarkGroups._sidecar_name):
+            raise FileNotFoundError("Mark groups not found")
+        data = json.loads(storage_provider.load_sidecar(MarkGroups._sidecar_name))
+        return cls({int(group): record_ids for group, record_ids in data.items()})
+
+    @staticmethod
+    def exists(storage_provider: StorageProvider) -> bool:
+        return storage_provider.sidecar_exists(MarkGroups._sidecar_name)
+
+    def save(self, storage_provider: StorageProvider) -> None:
+        storage_provider.save_sidecar(MarkGroups._sidecar_name, json.dumps(self.records).encode('utf-8'))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def record_count(self) -> int:
+        return len(self._group_of)
+
+    def group_of(self, record_id: str) -> Optional[int]:
+        return self._group_of.get(record_id)
+
+    def add(self, record_id: str, normalized: str) -> Tuple[int, bool]:
+        # Returns the record's group and whether the group is new (its mark needs an embedding)
+        group = MarkGroups.group_id(normalized)
+        is_new = group not in self.records
+        self.records.setdefault(group, []).append(record_id)
+        self._group_of[record_id] = group
+        return group, is_new
+
+    def remove(self, record_id: str) -> Optional[int]:
+        # Returns the group if this was its last record (its vector should go)
+        group = self._group_of.pop(record_id, None)
+        if group is None:
+            return None
+        self.records[group].remove(record_id)
+        if self.records[group]:
+            return None
+        del self.records[group]
+        return group
+
+
+class IngestionReport(NamedTuple):
+    records: int
+    skipped: int
+    duplicate_records: int
+    distinct_marks: int
+    embedded: int
+    removed: int = 0
+
+    def format(self) -> str:
+        return (
+            f"{self.records} records ({self.skipped} without mark/id, {self.duplicate_records} repeated ids), "
+            f"{self.distinct_marks} distinct marks, {self.embedded} embedded, {self.removed} removed"
+        )
+
+
+class CorpusIngestor:
+    def __init__(
+        self,
+        index_builder: IndexBuilder,
+        text_field: str = "Mark",
+        id_field: str = "ApplicationNumber",
+        chunk_size: int = 2000,
+        **attribute_fields: str
+    ):
+        # One vector per distinct normalized mark, keyed by MarkGroups.group_id; the records behind it
+        # are kept in the mark_groups sidecar and in the record attributes used by filtered searches.
+        # attribute_fields are passed to RecordAttributes.from_records (date_field, classes_field, ...)
+        self.index_builder: IndexBuilder = index_builder
+        self.faiss_manager: FaissManager = index_builder.faiss_manager
+        self.text_field: str = text_field
+        self.id_field: str = id_field
+        self.chunk_size: int = chunk_size
+        self.attribute_fields: Dict[str, str] = attribute_fields
+
+    def build(self, path: str, index_config: Union[str, IndexConfig, None] = None, limit: Optional[int] = None) -> IngestionReport:
+        groups = MarkGroups()
+        attribute_parts: List[RecordAttributes] = []
+        counts = {"records": 0, "skipped": 0, "duplicates": 0, "embedded": 0}
+
+        def chunks() -> Iterator[Tuple[List[str], List[int]]]:
+            texts: List[str] = []
+            ids: List[int] = []
+            records: List[Mapping[str, Any]] = []
+            for record in islice(iter_json_records(path), limit):
+                counts["records"] += 1
+                record_id, normalized = self._key(record)
+                if normalized is None:
+                    counts["skipped"] += 1
+                    continue
+                if groups.group_of(record_id) is not None:
+                    # Same ApplicationNumber twice in the feed: the first one wins
+                    counts["duplicates"] += 1
+                    continue
+
+                group, is_new = groups.add(record_id, normalized)
+                records.append(record)
+                if is_new:
+                    texts.append(display_mark(record[self.text_field]))
+                    ids.append(group)
+                if len(records) >= self.chunk_size:
+                    attribute_parts.append(self._attributes(records, groups, attribute_parts))
+                    records = []
+                if len(texts) >= self.chunk_size:
+                    counts["embedded"] += len(texts)
+                    yield texts, ids
+                    texts, ids = [], []
+
+            if records:
+                attribute_parts.append(self._attributes(records, groups, attribute_parts))
+            counts["embedded"] += len(texts)
+            yield texts, ids
+
+        self.index_builder.build_index_chunked(chunks(), index_config)
+        storage = self.faiss_manager.storage_provider
+        groups.save(storage)
+        self.faiss_manager.attributes = RecordAttributes.concat(attribute_parts)
+        self.faiss_manager.attributes.save(storage)
+        return IngestionReport(counts["records"], counts["skipped"], counts["duplicates"], len(groups), counts["embedded"])
+
+    def update(self, records: Sequence[Mapping[str, Any]], withdrawals: Sequence[Union[int, str]] = ()) -> IngestionReport:
+        # Daily feed on a built index: a filing whose normalized mark is already indexed only joins
+        # its group; a mark is embedded when its first record arrives and removed with its last one
+        storage = self.faiss_manager.storage_provider
+        groups = MarkGroups.load(storage)
+        before: Set[int] = set(groups.records)
+        texts: Dict[int, str] = {}
+        skipped = 0
+
+        for record_id in withdrawals:
+            groups.remove(str(record_id))
+        accepted = []
+        for record in records:
+            record_id, normalized = self._key(record)
+            if normalized is None:
+                skipped += 1
+                continue
+            # A re-filed record may have changed its mark
+            groups.remove(record_id)
+            group, _ = groups.add(record_id, normalized)
+            texts.setdefault(group, display_mark(record[self.text_field]))
+            accepted.append(record)
+
+        after = set(groups.records)
+        upserts = {group: texts[group] for group in after - before}
+        removals = list(before - after)
+        self.index_builder.apply_updates(upserts, removals)
+
+        attributes = self.faiss_manager.attributes
+        if attributes is not None:
+            changed = [str(record_id) for record_id in withdrawals] + [self._key(record)[0] for record in accepted]
+            attributes = attributes.remove_records(FaissManager.to_faiss_ids(changed))
+            attributes = attributes.upsert(
+                [groups.group_of(self._key(record)[0]) for record in accepted],
+                accepted,
+                record_ids=FaissManager.to_faiss_ids([self._key(record)[0] for record in accepted]),
+                **self.attribute_fields
+            )
+            self.faiss_manager.attributes = attributes
+            attributes.save(storage)
+        groups.save(storage)
+        return IngestionReport(len(records), skipped, 0, len(groups), len(upserts), len(removals))
+
+    def _key(self, record: Mapping[str, Any]) -> Tuple[str, Optional[str]]:
+        record_id = record.get(self.id_field)
+        text = record.get(self.text_field)
+        if record_id is None or not isinstance(text, str):
+            return str(record_id), None
+        return str(record_id), normalize_mark(text) or None
+
+    def _attributes(self, records: List[Mapping[str, Any]], groups: MarkGroups, previous: List[RecordAttributes]) -> RecordAttributes:
+        record_ids = [self._key(record)[0] for record in records]
+        return RecordAttributes.from_records(
+            [groups.group_of(record_id) for record_id in record_ids],
+            records,
+            status_names=previous[-1].status_names if previous else None,
+            record_ids=FaissManager.to_faiss_ids(record_ids),
+            **self.attribute_fields
+        )
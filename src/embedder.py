@@ -0,0 +1,167 @@
+from typing import Dict, List, Optional, Protocol, Tuple, Type, Union
+import os
+import hashlib
+import numpy as np
+
+
+class Embedder(Protocol):
+    # Recorded in the index metadata; an index only accepts queries from the same model id and dimension
+    model_id: str
+    dimension: int
+    batch_size: int
+    # Transient failures the embedding pipeline should retry
+    retryable_errors: Tuple[Type[BaseException], ...]
+
+    def embed(self, texts: List[str], task_type: str = "retrieval_document") -> np.ndarray:
+        """Return a (len(texts), dimension) float32 array"""
+
+
+def truncate_embeddings(embeddings: Union[List[List[float]], np.ndarray], output_dimensionality: Optional[int]) -> np.ndarray:
+    # Matryoshka prefixes are only unit-length at full size: renormalize after truncating
+    embeddings_np = np.array(embeddings, dtype='float32', ndmin=2)
+    if output_dimensionality is None:
+        return embeddings_np
+    if output_dimensionality > embeddings_np.shape[1]:
+        raise ValueError(f"Cannot truncate {embeddings_np.shape[1]}-d embeddings to {output_dimensionality} dimensions")
+    truncated = np.ascontiguousarray(embeddings_np[:, :output_dimensionality])
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    return truncated / np.maximum(norms, 1e-12)
+
+
+class GeminiEmbedder:
+    _default_model: str = "models/gemini-embedding-001"
+    _dimensions: Dict[str, int] = {
+        "models/gemini-embedding-001": 3072,
+        "models/text-embedding-004": 768,
+    }
+
+    def __init__(
+        self,
+        model_name: str = _default_model,
+        output_dimensionality: Optional[int] = None,
+        batch_size: int = 100,
+        api_key: Optional[str] = None
+    ):
+        # The Google client takes most of a second to import: only processes that embed text load it
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("Google API key required.")
+        genai.configure(api_key=api_key)
+        # Quota exhaustion, overload, timeouts, dropped connections
+        self.retryable_errors: Tuple[Type[BaseException], ...] = (
+            google_exceptions.ResourceExhausted,
+            google_exceptions.TooManyRequests,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.DeadlineExceeded,
+            google_exceptions.InternalServerError,
+            ConnectionError,
+            TimeoutError
+        )
+
+        self.model_name: str = model_name
+        self.output_dimensionality: Optional[int] = output_dimensionality
+        self.batch_size: int = batch_size
+        # Truncated embeddings live in their own namespace (cache, index metadata)
+        self.model_id: str = model_name if output_dimensionality is None else f"{model_name}@{output_dimensionality}"
+        self._dimension: Optional[int] = output_dimensionality or GeminiEmbedder._dimensions.get(model_name)
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            # Unknown model: ask the API once
+            self._dimension = self.embed(["dimension probe"], "retrieval_query").shape[1]
+        return self._dimension
+
+    def embed(self, texts: List[str], task_type: str = "retrieval_document") -> np.ndarray:
+        import google.generativeai as genai
+
+        options = {}
+        if self.output_dimensionality is not None:
+            options["output_dimensionality"] = self.output_dimensionality
+
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            result = genai.embed_content(
+                model=self.model_name,
+                content=texts[start:start + self.batch_size],
+                task_type=task_type,
+                **options
+            )
+            # - BatchEmbeddingDict: embedding is list[list[float]]
+            # - EmbeddingDict: embedding is list[float]
+            if isinstance(result, dict) and 'embedding' in result:
+                embedding_data = result['embedding']
+                if isinstance(embedding_data, list):
+                    if len(embedding_data) > 0 and isinstance(embedding_data[0], list):
+                        embeddings.extend(embedding_data)
+                    else:
+                        embeddings.append(embedding_data)
+
+        if not embeddings:
+            return np.empty((0, self._dimension or 0), dtype='float32')
+        return truncate_embeddings(embeddings, self.output_dimensionality)
+
+
+class SentenceTransformerEmbedder:
+    _default_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    retryable_errors: Tuple[Type[BaseException], ...] = ()
+
+    def __init__(
+        self,
+        model_name: str = _default_model,
+        backend: str = "torch",
+        batch_size: int = 64,
+        num_threads: Optional[int] = None,
+        prompts: Optional[Dict[str, str]] = None,
+        normalize: bool = True
+    ):
+        # Local CPU inference: no network round-trip, no quota. backend="onnx" runs the exported
+        # ONNX graph through onnxruntime (sentence-transformers[onnx])
+        from sentence_transformers import SentenceTransformer
+        import torch
+
+        if num_threads is not None:
+            torch.set_num_threads(num_threads)
+        self.model = SentenceTransformer(model_name, device="cpu", backend=backend)
+        self.model_name: str = model_name
+        self.batch_size: int = batch_size
+        # Optional per-task prefixes, e.g. {"retrieval_query": "query: ", "retrieval_document": "passage: "} for E5
+        self.prompts: Dict[str, str] = prompts or {}
+        self.normalize: bool = normalize
+        self.model_id: str = f"sentence-transformers/{model_name.split('/')[-1]}"
+        self.dimension: int = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str], task_type: str = "retrieval_document") -> np.ndarray:
+        prefix = self.prompts.get(task_type, "")
+        embeddings = self.model.encode(
+            [prefix + text for text in texts],
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize,
+            show_progress_bar=False
+        )
+        return np.asarray(embeddings, dtype='float32').reshape(len(texts), self.dimension)
+
+
+class FakeEmbedder:
+    retryable_errors: Tuple[Type[BaseException], ...] = ()
+
+    def __init__(self, dimension: int = 64, batch_size: int = 100):
+        # Deterministic unit vectors seeded by the text: offline tests and benchmarks
+        self.dimension: int = dimension
+        self.batch_size: int = batch_size
+        self.model_id: str = f"fake-{dimension}"
+        self.calls: int = 0
+
+    def embed(self, texts: List[str], task_type: str = "retrieval_document") -> np.ndarray:
+        self.calls += (len(texts) + self.batch_size - 1) // self.batch_size
+        embeddings = np.empty((len(texts), self.dimension), dtype='float32')
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+            embeddings[i] = np.random.default_rng(seed).standard_normal(self.dimension)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
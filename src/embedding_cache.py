@@ -0,0 +1,105 @@
+from typing import List, Optional, Sequence, Tuple, Union
+from collections import OrderedDict
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+
+CacheKey = Tuple[str, str, str]
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, memory_size: int = 10000):
+        self.path: str = path
+        self.memory_size: int = memory_size
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self._memory: "OrderedDict[CacheKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        # One connection shared by the embedding worker threads, serialized by the lock;
+        # WAL lets several build/search processes read while one writes
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, task_type TEXT NOT NULL, content_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, task_type, content_hash))"
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def content_hash(content: Union[str, bytes]) -> str:
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return hashlib.sha256(content).hexdigest()
+
+    def get(self, model: str, task_type: str, content: Union[str, bytes]) -> Optional[np.ndarray]:
+        return self.get_many(model, task_type, [content])[0]
+
+    def put(self, model: str, task_type: str, content: Union[str, bytes], vector: Sequence[float]) -> None:
+        self.put_many(model, task_type, [content], [vector])
+
+    def get_many(self, model: str, task_type: str, contents: Sequence[Union[str, bytes]]) -> List[Optional[np.ndarray]]:
+        keys = [(model, task_type, self.content_hash(content)) for content in contents]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+
+        with self._lock:
+            missing: List[int] = []
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(i)
+                else:
+                    self._memory.move_to_end(key)
+                    results[i] = vector
+
+            if missing:
+                hashes = [keys[i][2] for i in missing]
+                found = {}
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(hashes), 500):
+                    chunk = hashes[start:start + 500]
+                    rows = self._connection.execute(
+                        f"SELECT content_hash, vector FROM embeddings WHERE model = ? AND task_type = ? "
+                        f"AND content_hash IN ({','.join('?' * len(chunk))})",
+                        [model, task_type, *chunk]
+                    )
+                    found.update({content_hash: np.frombuffer(blob, dtype='float32') for content_hash, blob in rows})
+
+                for i in missing:
+                    vector = found.get(keys[i][2])
+                    if vector is not None:
+                        results[i] = vector
+                        self._remember(keys[i], vector)
+
+            hit_count = sum(vector is not None for vector in results)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def put_many(self, model: str, task_type: str, contents: Sequence[Union[str, bytes]], vectors: Sequence[Sequence[float]]) -> None:
+        if len(contents) != len(vectors):
+            raise ValueError("Number of contents must match number of vectors")
+
+        rows = []
+        with self._lock:
+            for content, vector in zip(contents, vectors):
+                vector_np = np.asarray(vector, dtype='float32')
+                key = (model, task_type, self.content_hash(content))
+                self._remember(key, vector_np)
+                rows.append((model, task_type, key[2], vector_np.tobytes()))
+
+            self._connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _remember(self, key: CacheKey, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
@@ -0,0 +1,167 @@
+from typing import Callable, Deque, Iterator, List, Optional, Tuple, Type
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import random
+import threading
+import time
+from src.embedding_cache import EmbeddingCache
+from src.metrics import metrics
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("Rate must be positive")
+
+        self.rate_per_second: float = rate_per_minute / 60.0
+        # Default burst: one second worth of quota, never less than a single token
+        self.capacity: float = capacity if capacity is not None else max(1.0, self.rate_per_second)
+        self._level: float = self.capacity
+        self._updated: float = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        # Requests larger than the bucket wait for a full bucket and leave it in debt,
+        # so a 100-text batch still works against a small texts/min burst capacity
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(tokens, self.capacity)
+                if self._level >= needed:
+                    self._level -= tokens
+                    return waited
+                wait = (needed - self._level) / self.rate_per_second
+            time.sleep(wait)
+            waited += wait
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: Optional[float] = None, texts_per_minute: Optional[float] = None):
+        self.requests: Optional[TokenBucket] = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.texts: Optional[TokenBucket] = TokenBucket(texts_per_minute) if texts_per_minute else None
+
+    def acquire(self, n_texts: int) -> float:
+        waited = 0.0
+        if self.requests is not None:
+            waited += self.requests.acquire(1)
+        if self.texts is not None:
+            waited += self.texts.acquire(n_texts)
+        return waited
+
+
+class EmbeddingPipeline:
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], List[List[float]]],
+        batch_size: int = 100,
+        concurrency: int = 4,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+        cache: Optional[EmbeddingCache] = None,
+        cache_namespace: Tuple[str, str] = ("", "")
+    ):
+        if batch_size <= 0 or concurrency <= 0:
+            raise ValueError("Batch size and concurrency must be positive")
+
+        self.embed_batch = embed_batch
+        self.batch_size: int = batch_size
+        self.concurrency: int = concurrency
+        self.rate_limiter: RateLimiter = rate_limiter or RateLimiter()
+        self.max_retries: int = max_retries
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.retry_on: Tuple[Type[BaseException], ...] = retry_on
+        self.cache: Optional[EmbeddingCache] = cache
+        self.cache_namespace: Tuple[str, str] = cache_namespace
+
+        self.retries: int = 0
+        self.throttled_seconds: float = 0.0
+        self._stats_lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        embeddings: List[List[float]] = []
+        for _, batch_embeddings in self.iter_batches(texts):
+            embeddings.extend(batch_embeddings)
+        return embeddings
+
+    def iter_batches(self, texts: List[str], start: int = 0) -> Iterator[Tuple[int, List[List[float]]]]:
+        # Yields (offset, embeddings) in input order while up to 2x concurrency batches are in flight
+        offsets = iter(range(start, len(texts), self.batch_size))
+        pending: Deque[Tuple[int, Future]] = deque()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                for offset in offsets:
+                    pending.append((offset, executor.submit(self._embed_cached, texts[offset:offset + self.batch_size])))
+                    if len(pending) >= 2 * self.concurrency:
+                        break
+
+                while pending:
+                    offset, future = pending.popleft()
+                    batch_embeddings = future.result()
+                    next_offset = next(offsets, None)
+                    if next_offset is not None:
+                        pending.append((next_offset, executor.submit(self._embed_cached, texts[next_offset:next_offset + self.batch_size])))
+                    yield offset, batch_embeddings
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def _embed_cached(self, batch: List[str]) -> List[List[float]]:
+        if self.cache is None:
+            return self._embed_with_retry(batch)
+
+        model, task_type = self.cache_namespace
+        cached = self.cache.get_many(model, task_type, batch)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        metrics.inc("embedding_cache_hits_total", len(batch) - len(missing), model=model, task=task_type)
+
+        # Only cache misses reach the API (and count against the rate limits)
+        embeddings: List[List[float]] = [vector.tolist() if vector is not None else [] for vector in cached]
+        if missing:
+            fresh = self._embed_with_retry([batch[i] for i in missing])
+            self.cache.put_many(model, task_type, [batch[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                embeddings[i] = vector
+        return embeddings
+
+    def _embed_with_retry(self, batch: List[str]) -> List[List[float]]:
+        attempt = 0
+        model, task_type = self.cache_namespace
+        while True:
+            waited = self.rate_limiter.acquire(len(batch))
+            metrics.inc("embedding_throttled_seconds_total", waited, model=model)
+            try:
+                with metrics.timer("embedding_batch_seconds", model=model, task=task_type):
+                    embeddings = self.embed_batch(batch)
+            except self.retry_on as e:
+                if attempt >= self.max_retries:
+                    raise
+                # Counted only when another attempt follows, like self.retries
+                metrics.inc("embedding_retries_total", model=model, error=type(e).__name__)
+                # Exponential backoff with equal jitter so concurrent workers do not retry in lockstep
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                delay = delay / 2 + random.uniform(0, delay / 2)
+                attempt += 1
+                with self._stats_lock:
+                    self.retries += 1
+                    self.throttled_seconds += waited
+                time.sleep(delay)
+                continue
+
+            with self._stats_lock:
+                self.throttled_seconds += waited
+            metrics.inc("embedding_texts_total", len(batch), model=model, task=task_type)
+
+            if len(embeddings) != len(batch):
+                raise ValueError(f"Expected {len(batch)} embeddings, got {len(embeddings)}")
+            return embeddings
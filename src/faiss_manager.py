@@ -1,110 +1,607 @@
-from typing import List, Dict, Tuple, Optional
+from typing import Callable, List, Tuple, Optional, Union, NamedTuple, Mapping, Sequence
+import json
 import os
+import hashlib
 import faiss
 import numpy as np
-import google.generativeai as genai
-from dotenv import load_dotenv
 from src.storage_provider import StorageProvider
+from src.index_config import IndexConfig
+from src.mapping_store import MappingStore
+from src.embedding_cache import EmbeddingCache
+from src.embedder import Embedder, GeminiEmbedder
+from src.record_attributes import RecordAttributes, RecordFilter
+from src.similarity_graph import SimilarityGraph
+from src.metrics import metrics
 
-load_dotenv()
+
+class BatchSearchResult(NamedTuple):
+    # Squared L2 distances for "l2" indexes; inner-product / cosine scores (higher is better) otherwise
+    distances: np.ndarray
+    ids: np.ndarray
+    payloads: np.ndarray
+    
+    def to_tuples(self, row: int) -> List[Tuple[str, float]]:
+        found = np.not_equal(self.payloads[row], None)
+        return list(zip(self.payloads[row][found].tolist(), self.distances[row][found].tolist()))
 
 
 class FaissManager:
-    _model_name: str = "models/gemini-embedding-001"
+    _metadata_name: str = "meta.json"
+    # Filters matching at most this many records are answered by an exact scan of those vectors
+    _exact_filter_limit: int = 1024
+    # IO_FLAG_MMAP_IFC maps flat codes and inverted lists; older faiss builds only have IO_FLAG_MMAP
+    _mmap_io_flags: int = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
     
-    def __init__(self, storage_provider: StorageProvider):
+    def __init__(
+        self,
+        storage_provider: StorageProvider,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        embedder: Optional[Embedder] = None
+    ):
         self.storage_provider: StorageProvider = storage_provider
-        self.index: Optional[faiss.IndexFlatL2] = None
-        self.mapping: Dict[int, str] = {}
-        
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
+        self.embedding_cache: Optional[EmbeddingCache] = embedding_cache
+        # Text embedding model; defaults to Gemini on the first text query
+        self.embedder: Optional[Embedder] = embedder
+        self.index: Optional[faiss.Index] = None
+        self.config: IndexConfig = IndexConfig()
+        self.read_only: bool = False
+        self.mapping: Mapping[int, str] = {}
+        self._payloads: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._payloads_source: Mapping[int, str] = {}
+        # Model id and dimension the loaded index was built with, from its metadata
+        self._index_embedder: Optional[dict] = None
+        # Per-record filing date, classes and status for filtered searches, keyed by FAISS id
+        self.attributes: Optional[RecordAttributes] = None
         
     def create_l2_index(self, dimension: int) -> None:
-        self.index = faiss.IndexFlatL2(dimension)
+        self.create_index(dimension, IndexConfig.flat())
+    
+    def create_index(self, dimension: int, config: Union[str, IndexConfig, None] = None) -> None:
+        self.config = IndexConfig.from_value(config)
+        self._index_embedder = None
+        self.attributes = None
+        self.index = faiss.index_factory(dimension, self.config.factory, self.config.faiss_metric)
+        if self.config.id_map and not self.has_id_map:
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None:
+                # IVF stores caller ids natively; an IDMap wrapper would go out of sync on removal.
+                # The hashtable direct map makes remove_ids by id O(1) instead of a full list scan
+                ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+            else:
+                self.index = faiss.index_factory(dimension, f"IDMap2,{self.config.factory}", self.config.faiss_metric)
+        self.read_only = False
+        
+        hnsw = self._hnsw()
+        if hnsw is not None and self.config.ef_construction is not None:
+            hnsw.efConstruction = self.config.ef_construction
+        self._apply_search_defaults()
     
-    def add_vectors(self, embeddings: List[List[float]], texts: List[str]) -> None:
+    @property
+    def is_trained(self) -> bool:
+        return self.index is not None and self.index.is_trained
+    
+    def train(self, embeddings: Union[List[List[float]], np.ndarray], sample_size: Optional[int] = None, seed: int = 0) -> None:
+        if self.index is None:
+            raise ValueError("Index not created. Call create_index() first.")
+        
+        if self.index.is_trained:
+            return
+        
+        embeddings_np = self._prepare_vectors(embeddings)
+        sample_size = sample_size or self.config.train_size
+        if len(embeddings_np) > sample_size:
+            rng = np.random.default_rng(seed)
+            sample_ids = np.sort(rng.choice(len(embeddings_np), sample_size, replace=False))
+            embeddings_np = embeddings_np[sample_ids]
+        
+        self.index.train(embeddings_np)
+    
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> None:
+        if nprobe is not None:
+            self.config.nprobe = nprobe
+        if ef_search is not None:
+            self.config.ef_search = ef_search
+        self._apply_search_defaults()
+    
+    def add_vectors(self, embeddings: List[List[float]], texts: List[str], ids: Optional[Sequence[Union[int, str]]] = None) -> None:
         if self.index is None:
             raise ValueError("Index not created. Call create_l2_index() first.")
         
         if len(embeddings) != len(texts):
             raise ValueError("Number of embeddings must match number of texts")
         
-        embeddings_np = np.array(embeddings, dtype='float32')
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError("Number of ids must match number of texts")
+        
+        self._check_writable()
+        
+        embeddings_np = self._prepare_vectors(embeddings)
+        
+        # A memory-mapped MappingStore is read-only; materialize it before appending
+        if not isinstance(self.mapping, dict):
+            self.mapping = dict(self.mapping.items())
         
-        start_idx = self.index.ntotal
-        self.index.add(embeddings_np)
+        if self.has_id_map:
+            if ids is not None:
+                faiss_ids = FaissManager.to_faiss_ids(ids)
+            else:
+                start_idx = max(self.mapping) + 1 if self.mapping else 0
+                faiss_ids = np.arange(start_idx, start_idx + len(texts), dtype='int64')
+            self.index.add_with_ids(embeddings_np, faiss_ids)
+        else:
+            if ids is not None:
+                raise ValueError("Explicit ids require an id-mapped index. Use IndexConfig(id_map=True).")
+            start_idx = self.index.ntotal
+            faiss_ids = np.arange(start_idx, start_idx + len(texts), dtype='int64')
+            self.index.add(embeddings_np)
+        self._payloads = None
         
-        for i, text in enumerate(texts):
-            self.mapping[start_idx + i] = text
+        for faiss_id, text in zip(faiss_ids.tolist(), texts):
+            self.mapping[faiss_id] = text
     
+    def upsert(self, ids: Sequence[Union[int, str]], embeddings: Union[List[List[float]], np.ndarray], payloads: List[str]) -> None:
+        if not self.has_id_map:
+            raise ValueError("Upserts require an id-mapped index. Use IndexConfig(id_map=True).")
+        
+        if len(set(FaissManager.to_faiss_ids(ids).tolist())) != len(ids):
+            raise ValueError("Upsert ids must be unique")
+        
+        self.remove(ids)
+        self.add_vectors(embeddings, payloads, ids=ids)
+    
+    def remove(self, ids: Sequence[Union[int, str]]) -> int:
+        if self.index is None:
+            raise ValueError("Index not created. Call create_l2_index() first.")
+        
+        if not self.has_id_map:
+            raise ValueError("Removal by id requires an id-mapped index. Use IndexConfig(id_map=True).")
+        
+        self._check_writable()
+        
+        faiss_ids = FaissManager.to_faiss_ids(ids)
+        try:
+            removed = self.index.remove_ids(faiss_ids)
+        except RuntimeError as e:
+            # HNSW graphs cannot drop nodes
+            raise ValueError(f"Index type {self.config.factory} does not support removal: {e}") from e
+        
+        if not isinstance(self.mapping, dict):
+            self.mapping = dict(self.mapping.items())
+        for faiss_id in faiss_ids.tolist():
+            self.mapping.pop(faiss_id, None)
+        self._payloads = None
+        return int(removed)
+    
+    @property
+    def has_id_map(self) -> bool:
+        if isinstance(faiss.downcast_index(self.index), (faiss.IndexIDMap, faiss.IndexIDMap2)):
+            return True
+        return self.config.id_map and faiss.try_extract_index_ivf(self.index) is not None
+    
+    @staticmethod
+    def to_faiss_ids(ids: Sequence[Union[int, str]]) -> np.ndarray:
+        return np.fromiter((FaissManager.stable_id(value) for value in ids), dtype='int64', count=len(ids))
+    
+    @staticmethod
+    def stable_id(value: Union[int, str]) -> int:
+        # Numeric record ids (e.g. ApplicationNumber "4801234") are used as-is; anything else
+        # is hashed to a stable non-negative 63-bit id
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        text = str(value).strip()
+        if text.isdigit() and len(text) < 19:
+            return int(text)
+        digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') & 0x7FFFFFFFFFFFFFFF
+    
+    def memory_footprint(self) -> int:
+        # Serialized size: vectors or codes plus quantizer tables, as held in RAM and on disk
+        if self.index is None:
+            raise ValueError("Index not created. Call create_index() first.")
+        return int(faiss.serialize_index(self.index).size)
+    
+    def reconstruct_all(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Sorted FAISS ids and their stored (decoded, for compressed indexes) vectors. Reads by id:
+        # reconstruct_n walks positions 0..ntotal-1, which IDMap2 indexes with hashed ids do not have
+        self._check_searchable()
+        ids = self._vector_ids()
+        return ids, self._reconstruct(ids)
+    
+    @metrics.timed("index_save_seconds")
     def save(self) -> None:
         if self.index is None:
             raise ValueError("Index not created. Nothing to save.")
         
         index_data = faiss.serialize_index(self.index)
+        metrics.inc("index_save_bytes_total", index_data.size)
+        metrics.set("index_vectors", self.index.ntotal, factory=self.config.factory)
         self.storage_provider.save_index(index_data)
         self.storage_provider.save_mapping(self.mapping)
+        self.storage_provider.save_sidecar(FaissManager._metadata_name, self._metadata_bytes())
+        if self.attributes is not None:
+            self.attributes.save(self.storage_provider)
+    
+    def serialize_index(self) -> bytes:
+        if self.index is None:
+            raise ValueError("Index not created. Nothing to serialize.")
+        return faiss.serialize_index(self.index).tobytes()
     
-    def load(self) -> None:
+    def restore_index(self, index_data: bytes, config: IndexConfig, mapping: Mapping[int, str]) -> None:
+        self.index = faiss.deserialize_index(np.frombuffer(index_data, dtype=np.uint8))
+        self.config = config
+        self.mapping = mapping
+        self.read_only = False
+        self._payloads = None
+        self._apply_search_defaults()
+    
+    @metrics.timed("index_load_seconds")
+    def load(self, mmap: bool = False) -> None:
         if not self.storage_provider.index_exists():
             raise FileNotFoundError("Index not found")
         
         if not self.storage_provider.mapping_exists():
             raise FileNotFoundError("Mapping not found")
         
-        index_data = self.storage_provider.load_index()
-        index_array = np.frombuffer(index_data, dtype=np.uint8)
-        self.index = faiss.deserialize_index(index_array)
+        index_path = self.storage_provider.index_local_path() if mmap else None
+        if index_path is not None:
+            # Vectors stay in the OS page cache, shared by every process mapping the same file
+            self.index = faiss.read_index(index_path, FaissManager._mmap_io_flags)
+            self.read_only = True
+            metrics.inc("index_load_bytes_total", os.path.getsize(index_path), mode="mmap")
+        else:
+            index_data = self.storage_provider.load_index()
+            metrics.inc("index_load_bytes_total", len(index_data), mode="read")
+            index_array = np.frombuffer(index_data, dtype=np.uint8)
+            self.index = faiss.deserialize_index(index_array)
+            self.read_only = False
+            del index_data, index_array
         self.mapping = self.storage_provider.load_mapping()
+        self._payloads = None
     
-    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
-        if self.index is None:
-            raise ValueError("Index not created. Call create_l2_index() first.")
+        # Indexes saved before metadata existed are plain IndexFlatL2
+        self.config = IndexConfig()
+        self._index_embedder = None
+        if self.storage_provider.sidecar_exists(FaissManager._metadata_name):
+            metadata = json.loads(self.storage_provider.load_sidecar(FaissManager._metadata_name))
+            self.config = IndexConfig.from_dict(metadata.get("index", {}))
+            self._index_embedder = metadata.get("embedder")
+        self._apply_search_defaults()
+        self._check_embedder()
+        metrics.set("index_vectors", self.index.ntotal, factory=self.config.factory)
+        self.attributes = RecordAttributes.load(self.storage_provider) if RecordAttributes.exists(self.storage_provider) else None
+    
+    def search(self, query: str, k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None, where: Optional[RecordFilter] = None) -> List[Tuple[str, float]]:
+        result = self.search_texts([query], k, nprobe=nprobe, ef_search=ef_search, where=where)
+        return result.to_tuples(0)
+    
+    def search_by_embedding(self, embedding: np.ndarray, k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None, where: Optional[RecordFilter] = None) -> List[Tuple[str, float]]:
+        result = self.search_batch(np.asarray(embedding, dtype='float32')[np.newaxis, :], k, nprobe=nprobe, ef_search=ef_search, where=where)
+        return result.to_tuples(0)
+    
+    def search_texts(self, queries: List[str], k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None, where: Optional[RecordFilter] = None) -> BatchSearchResult:
+        return self.search_batch(self.embed_queries(queries), k, nprobe=nprobe, ef_search=ef_search, where=where)
+    
+    @metrics.timed("query_embedding_seconds")
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        self._check_searchable()
+        return FaissManager.embed_query_texts(self.text_embedder(), queries, self.index.d, self.embedding_cache)
+    
+    @staticmethod
+    def embed_query_texts(
+        embedder: Embedder,
+        queries: List[str],
+        dimension: int,
+        embedding_cache: Optional[EmbeddingCache] = None
+    ) -> np.ndarray:
+        # Shared with coordinators that have no local index (ShardedSearcher)
+        query_np = np.empty((len(queries), dimension), dtype='float32')
+        missing = list(range(len(queries)))
+        if embedding_cache is not None:
+            cached = embedding_cache.get_many(embedder.model_id, "retrieval_query", queries)
+            missing = [i for i, vector in enumerate(cached) if vector is None]
+            for i, vector in enumerate(cached):
+                if vector is not None:
+                    query_np[i] = vector
+            metrics.inc("embedding_cache_hits_total", len(queries) - len(missing), model=embedder.model_id, task="retrieval_query")
         
-        if self.index.ntotal == 0:
-            raise ValueError("Index is empty. Add vectors first.")
+        if missing:
+            batch = [queries[i] for i in missing]
+            with metrics.timer("embedding_batch_seconds", model=embedder.model_id, task="retrieval_query"):
+                query_np[missing] = embedder.embed(batch, "retrieval_query")
+            metrics.inc("embedding_texts_total", len(batch), model=embedder.model_id, task="retrieval_query")
+            if embedding_cache is not None:
+                embedding_cache.put_many(embedder.model_id, "retrieval_query", batch, query_np[missing])
+        
+        return query_np
+    
+    def text_embedder(self) -> Embedder:
+        if self.embedder is None:
+            self.embedder = GeminiEmbedder(output_dimensionality=self.config.output_dimensionality)
+            self._check_embedder()
+        return self.embedder
+    
+    def search_batch(self, embeddings: np.ndarray, k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None, where: Optional[RecordFilter] = None) -> BatchSearchResult:
+        self._check_searchable()
+        
+        query_np = self._prepare_vectors(embeddings)
+        if query_np.ndim != 2 or query_np.shape[1] != self.index.d:
+            raise ValueError(f"Expected embeddings of shape (n, {self.index.d}), got {query_np.shape}")
+        
+        selector = None
+        if where is not None:
+            if self.attributes is None:
+                raise ValueError("Index has no record attributes. Set faiss_manager.attributes before filtering.")
+            matching = self.attributes.matching_ids(where)
+            if len(matching) <= FaissManager._exact_filter_limit:
+                result = self._search_subset(query_np, k, matching)
+                if result is not None:
+                    return result
+            selector = self.attributes.id_selector(matching)
+            hnsw = self._hnsw()
+            if hnsw is not None:
+                # The graph walk only collects matching nodes: widen the beam by the filter's selectivity
+                ef_search = ef_search if ef_search is not None else hnsw.efSearch
+                ef_search = min(self.index.ntotal, int(np.ceil(ef_search * len(self.attributes) / max(len(matching), 1))))
+        
+        with metrics.timer("faiss_search_seconds", filtered=str(selector is not None).lower()):
+            distances, ids = self.index.search(query_np, k, params=self._search_parameters(nprobe, ef_search, selector))
+        metrics.inc("faiss_queries_total", len(query_np))
+        with metrics.timer("mapping_lookup_seconds"):
+            payloads = self.lookup(ids)
+        return BatchSearchResult(distances, ids, payloads)
+    
+    def knn_graph(
+        self,
+        k: int = 10,
+        batch_size: int = 4096,
+        threads: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ) -> SimilarityGraph:
+        # The k nearest other vectors of every vector in the index
+        if k < 1:
+            raise ValueError("k must be >= 1")
+        
+        def search_tile(vectors: np.ndarray, tile_ids: np.ndarray, params: Optional[faiss.SearchParameters]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            # One extra neighbor for the vector itself, which is not always first (ties, PQ codes)
+            distances, found = self.index.search(vectors, k + 1, params=params)
+            kept = (found >= 0) & (found != tile_ids[:, np.newaxis])
+            kept &= np.cumsum(kept, axis=1) <= k
+            return np.nonzero(kept)[0], found[kept], distances[kept]
+        
+        with metrics.timer("similarity_graph_seconds", mode="knn"):
+            return self._similarity_graph(search_tile, batch_size, threads, nprobe, ef_search)
+    
+    def range_graph(
+        self,
+        threshold: float,
+        batch_size: int = 4096,
+        threads: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ) -> SimilarityGraph:
+        # Every pair of vectors closer than threshold: a squared L2 distance for "l2" indexes,
+        # a minimum score for "ip"/"cosine" ones (e.g. 0.95 cosine for near-identical marks)
+        def search_tile(vectors: np.ndarray, tile_ids: np.ndarray, params: Optional[faiss.SearchParameters]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+            lims, distances, found = self.index.range_search(vectors, threshold, params=params)
+            rows = np.repeat(np.arange(len(vectors)), np.diff(lims.astype('int64')))
+            kept = found != tile_ids[rows]
+            return rows[kept], found[kept], distances[kept]
+        
+        with metrics.timer("similarity_graph_seconds", mode="range"):
+            return self._similarity_graph(search_tile, batch_size, threads, nprobe, ef_search)
+    
+    def _similarity_graph(
+        self,
+        search_tile: Callable[[np.ndarray, np.ndarray, Optional[faiss.SearchParameters]], Tuple[np.ndarray, np.ndarray, np.ndarray]],
+        batch_size: int,
+        threads: Optional[int],
+        nprobe: Optional[int],
+        ef_search: Optional[int]
+    ) -> SimilarityGraph:
+        # The index queries itself with its own stored vectors, batch_size at a time: each tile is
+        # one FAISS call that OpenMP spreads over `threads` cores, instead of one call per vector
+        self._check_searchable()
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
         
-        query_result = genai.embed_content(
-            model=FaissManager._model_name,
-            content=query,
-            task_type="retrieval_query"
-        )
+        node_ids = self._vector_ids()
+        params = self._search_parameters(nprobe, ef_search)
+        rows: List[np.ndarray] = []
+        neighbors: List[np.ndarray] = []
+        distances: List[np.ndarray] = []
+        default_threads = faiss.omp_get_max_threads()
+        if threads is not None:
+            faiss.omp_set_num_threads(threads)
+        try:
+            for start in range(0, len(node_ids), batch_size):
+                tile_ids = node_ids[start:start + batch_size]
+                tile_rows, tile_neighbors, tile_distances = search_tile(self._reconstruct(tile_ids), tile_ids, params)
+                rows.append(tile_rows + start)
+                neighbors.append(tile_neighbors)
+                distances.append(tile_distances)
+                metrics.inc("faiss_queries_total", len(tile_ids))
+        finally:
+            faiss.omp_set_num_threads(default_threads)
         
-        query_np = np.array([query_result['embedding']], dtype='float32')
-        distances, indices = self.index.search(query_np, k)
+        rows_np = np.concatenate(rows).astype('int64')
+        neighbors_np = np.concatenate(neighbors).astype('int64')
+        distances_np = np.concatenate(distances).astype('float32')
+        # FAISS ids to node positions; vectors without a payload are left out of the graph
+        positions = np.minimum(np.searchsorted(node_ids, neighbors_np), len(node_ids) - 1)
+        known = node_ids[positions] == neighbors_np
+        rows_np, positions, distances_np = rows_np[known], positions[known], distances_np[known]
         
-        indices = indices[0]
-        distances = distances[0]
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows_np, minlength=len(node_ids)))]).astype('int64')
+        return SimilarityGraph(node_ids, indptr, positions, distances_np, self.config.higher_is_better)
+    
+    def _vector_ids(self) -> np.ndarray:
+        # Sorted FAISS ids of the indexed vectors, as recorded in the mapping
+        if isinstance(self.mapping, MappingStore):
+            return np.asarray(self.mapping.ids(), dtype='int64')
+        return self._payload_table()[0]
+    
+    def _reconstruct(self, ids: np.ndarray) -> np.ndarray:
+        try:
+            return self.index.reconstruct_batch(ids)
+        except RuntimeError as e:
+            ivf = self._ivf()
+            if ivf is None:
+                raise ValueError(f"Index type {self.config.factory} cannot reconstruct its vectors: {e}") from e
+            # The id -> list entry table of IVF indexes is not always there after a load: rebuild it
+            ivf.set_direct_map_type(faiss.DirectMap.Hashtable if self.config.id_map else faiss.DirectMap.Array)
+            return self.index.reconstruct_batch(ids)
+    
+    def _search_subset(self, query_np: np.ndarray, k: int, ids: np.ndarray) -> Optional[BatchSearchResult]:
+        # Selective filters: an exact scan of the few matching vectors is cheaper than the index
+        # traversal, and HNSW/IVF would otherwise miss matches outside the visited nodes/lists
+        payloads = self.lookup(ids)
+        ids = ids[np.not_equal(payloads, None)]
+        try:
+            vectors = self.index.reconstruct_batch(ids) if len(ids) else np.empty((0, self.index.d), dtype='float32')
+        except RuntimeError:
+            # IVF without a direct map cannot reconstruct: filter inside the index instead
+            return None
+        
+        subset = faiss.IndexFlat(self.index.d, self.config.faiss_metric)
+        subset.add(vectors)
+        distances, positions = subset.search(query_np, k)
+        found_ids = np.full(positions.shape, -1, dtype='int64')
+        found = positions >= 0
+        found_ids[found] = ids[positions[found]]
+        return BatchSearchResult(distances, found_ids, self.lookup(found_ids))
+    
+    def lookup(self, ids: np.ndarray) -> np.ndarray:
+        if isinstance(self.mapping, MappingStore):
+            return self.mapping.lookup(ids)
         
-        results: List[Tuple[str, float]] = []
-        for i, faiss_id in enumerate(indices):
-            if faiss_id in self.mapping:
-                mapped_text = self.mapping[faiss_id]
-                distance = float(distances[i])
-                results.append((mapped_text, distance))
+        ids = np.asarray(ids, dtype='int64')
+        keys, values = self._payload_table()
+        
+        payloads = np.full(ids.shape, None, dtype=object)
+        if len(keys) == 0:
+            return payloads
+        positions = np.minimum(np.searchsorted(keys, ids), len(keys) - 1)
+        found = keys[positions] == ids
+        payloads[found] = values[positions[found]]
+        return payloads
+    
+    def _payload_table(self) -> Tuple[np.ndarray, np.ndarray]:
+        # Sorted ids + payloads so lookups are one vectorized searchsorted instead of a dict probe per hit;
+        # works for positional ids and for sparse external ids alike
+        if self._payloads is None or self._payloads_source is not self.mapping:
+            keys = np.fromiter(self.mapping.keys(), dtype='int64', count=len(self.mapping))
+            values = np.empty(len(keys), dtype=object)
+            values[:] = list(self.mapping.values())
+            order = np.argsort(keys, kind='stable')
+            self._payloads = (keys[order], values[order])
+            self._payloads_source = self.mapping
+        return self._payloads
+    
+    def _prepare_vectors(self, embeddings: Union[List[List[float]], np.ndarray]) -> np.ndarray:
+        if self.config.metric != "cosine":
+            return np.ascontiguousarray(embeddings, dtype='float32')
+        # normalize_L2 works in place: normalize a private copy, never the caller's array
+        vectors = np.array(embeddings, dtype='float32', order='C')
+        if vectors.ndim == 2 and len(vectors):
+            faiss.normalize_L2(vectors)
+        return vectors
+    
+    def _check_writable(self) -> None:
+        if not self.index.is_trained:
+            raise ValueError("Index not trained. Call train() first.")
         
-        return results
+        if self.read_only:
+            raise ValueError("Index is memory-mapped read-only. Call load(mmap=False) to modify it.")
     
-    def search_by_embedding(self, embedding: np.ndarray, k: int = 5) -> List[Tuple[str, float]]:
+    def _check_searchable(self) -> None:
         if self.index is None:
             raise ValueError("Index not created. Call create_l2_index() first.")
         
         if self.index.ntotal == 0:
             raise ValueError("Index is empty. Add vectors first.")
+    
+    def _metadata_bytes(self) -> bytes:
+        metadata = {"index": self.config.to_dict()}
+        if self.embedder is not None:
+            metadata["embedder"] = {"model_id": self.embedder.model_id, "dimension": self.embedder.dimension}
+        elif self._index_embedder is not None:
+            metadata["embedder"] = self._index_embedder
+        return json.dumps(metadata, indent=2).encode('utf-8')
+    
+    def _check_embedder(self) -> None:
+        # Fail fast: queries embedded by another model would search a meaningless space
+        if self.embedder is None:
+            return
+        
+        expected = self._index_embedder
+        if expected is not None and expected.get("model_id") != self.embedder.model_id:
+            raise ValueError(f"Index was built with embedder {expected.get('model_id')}, not {self.embedder.model_id}")
         
-        query_np = np.array([embedding], dtype='float32')
-        distances, indices = self.index.search(query_np, k)
+        if self.index is not None and self.index.d != self.embedder.dimension:
+            raise ValueError(
+                f"Index dimension {self.index.d} does not match embedder {self.embedder.model_id} "
+                f"(dimension {self.embedder.dimension})"
+            )
+    
+    def _ivf(self) -> Optional[faiss.IndexIVF]:
+        try:
+            return faiss.extract_index_ivf(self.index)
+        except RuntimeError:
+            return None
+    
+    def _hnsw(self) -> Optional[faiss.HNSW]:
+        index = self._unwrap(self.index)[0]
+        if isinstance(index, faiss.IndexHNSW):
+            return index.hnsw
+        return None
+    
+    @staticmethod
+    def _unwrap(index: faiss.Index) -> Tuple[faiss.Index, List[faiss.Index]]:
+        # Strip pre-transforms (OPQ) and id maps to reach the index that owns the search knobs
+        wrappers: List[faiss.Index] = []
+        index = faiss.downcast_index(index)
+        while True:
+            if isinstance(index, faiss.IndexPreTransform):
+                wrappers.append(index)
+                index = faiss.downcast_index(index.index)
+            elif isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+                index = faiss.downcast_index(index.index)
+            else:
+                return index, wrappers
+    
+    def _apply_search_defaults(self) -> None:
+        ivf = self._ivf()
+        if ivf is not None and self.config.nprobe is not None:
+            ivf.nprobe = self.config.nprobe
+        
+        hnsw = self._hnsw()
+        if hnsw is not None and self.config.ef_search is not None:
+            hnsw.efSearch = self.config.ef_search
+    
+    def _search_parameters(self, nprobe: Optional[int], ef_search: Optional[int], selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+        if nprobe is None and ef_search is None and selector is None:
+            return None
         
-        indices = indices[0]
-        distances = distances[0]
+        # Parameter objects replace the index defaults wholesale: carry the current ones over
+        index, wrappers = self._unwrap(self.index)
+        if isinstance(index, faiss.IndexIVF) and (nprobe is not None or selector is not None):
+            params = faiss.SearchParametersIVF(nprobe=nprobe if nprobe is not None else index.nprobe)
+        elif isinstance(index, faiss.IndexHNSW) and (ef_search is not None or selector is not None):
+            params = faiss.SearchParametersHNSW(efSearch=ef_search if ef_search is not None else index.hnsw.efSearch)
+        elif selector is not None:
+            params = faiss.SearchParameters()
+        else:
+            return None
         
-        results: List[Tuple[str, float]] = []
-        for i, faiss_id in enumerate(indices):
-            if faiss_id in self.mapping:
-                mapped_text = self.mapping[faiss_id]
-                distance = float(distances[i])
-                results.append((mapped_text, distance))
+        if selector is not None:
+            # Id maps translate the selector to internal ids; FAISS skips non-matching vectors while scanning
+            params.sel = selector
+            params.referenced_objects = [selector]
         
-        return results
\ No newline at end of file
+        for _ in wrappers:
+            inner = params
+            params = faiss.SearchParametersPreTransform(index_params=inner)
+            # The SWIG wrapper does not own index_params; keep it alive with the outer object
+            params.referenced_objects = [inner]
+        return params
@@ -0,0 +1,171 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import time
+import numpy as np
+from src.faiss_manager import FaissManager
+from src.phonetic_index import PhoneticIndex
+from src.phonetic_matcher import PhoneticMatcher
+
+
+class HybridHit(NamedTuple):
+    id: int
+    text: str
+    score: float
+    semantic_rank: Optional[int]
+    # Higher is better for every metric, like score: cosine mapped to [0, 1], raw inner product,
+    # or 1 / (1 + distance) for l2 indexes
+    semantic_score: Optional[float]
+    phonetic_rank: Optional[int]
+    phonetic_distance: Optional[int]
+
+
+class HybridSearcher:
+    _fusions = ("rrf", "weighted")
+
+    def __init__(
+        self,
+        faiss_manager: FaissManager,
+        phonetic_matcher: PhoneticMatcher,
+        phonetic_index: PhoneticIndex,
+        fusion: str = "rrf",
+        rrf_k: int = 60,
+        semantic_weight: float = 0.5,
+        phonetic_weight: float = 0.5,
+        candidate_factor: int = 5,
+        min_candidates: int = 50,
+        max_candidates: int = 1000,
+        time_budget: Optional[float] = None
+    ):
+        if fusion not in HybridSearcher._fusions:
+            raise ValueError(f"Unknown fusion {fusion!r}, expected one of {HybridSearcher._fusions}")
+        if min_candidates <= 0 or max_candidates < min_candidates:
+            raise ValueError("Candidate pool bounds must satisfy 0 < min_candidates <= max_candidates")
+
+        self.faiss_manager: FaissManager = faiss_manager
+        self.phonetic_matcher: PhoneticMatcher = phonetic_matcher
+        self.phonetic_index: PhoneticIndex = phonetic_index
+        self.fusion: str = fusion
+        self.rrf_k: int = rrf_k
+        self.semantic_weight: float = semantic_weight
+        self.phonetic_weight: float = phonetic_weight
+        self.candidate_factor: int = candidate_factor
+        self.min_candidates: int = min_candidates
+        self.max_candidates: int = max_candidates
+        # Seconds per query; the pool is only widened while another round still fits
+        self.time_budget: Optional[float] = time_budget
+
+        self.last_pool_size: int = 0
+        self.last_exact: bool = False
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
+    def search(self, query: str, k: int = 10) -> List[HybridHit]:
+        started = time.perf_counter()
+        # The embedding API call and the phonetic transcription run side by side
+        embedding_future = self._executor.submit(self.faiss_manager.embed_queries, [query])
+        query_phonetic = self.phonetic_matcher.to_phonetic(query)
+        embedding = embedding_future.result()
+
+        pool = min(self.max_candidates, max(self.min_candidates, k * self.candidate_factor))
+        while True:
+            round_started = time.perf_counter()
+            semantic_future = self._executor.submit(self._semantic_candidates, embedding, pool)
+            phonetic = self.phonetic_index.search_nearest(query_phonetic, pool)
+            semantic = semantic_future.result()
+
+            hits, exact = self._fuse(semantic, phonetic, query_phonetic, pool, k)
+            now = time.perf_counter()
+            # Widening doubles the pool, so the next round costs at least as much as this one
+            out_of_time = self.time_budget is not None and now + 2 * (now - round_started) > started + self.time_budget
+            if exact or pool >= self.max_candidates or out_of_time:
+                self.last_pool_size = pool
+                self.last_exact = exact
+                return hits
+            pool = min(self.max_candidates, pool * 2)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def _semantic_candidates(self, embedding: np.ndarray, pool: int) -> List[Tuple[int, str, float]]:
+        result = self.faiss_manager.search_batch(embedding, pool)
+        return [
+            (int(faiss_id), payload, float(distance))
+            for faiss_id, payload, distance in zip(result.ids[0], result.payloads[0], result.distances[0])
+            if faiss_id >= 0 and payload is not None
+        ]
+
+    def _fuse(
+        self,
+        semantic: List[Tuple[int, str, float]],
+        phonetic: List[Tuple[int, int]],
+        query_phonetic: str,
+        pool: int,
+        k: int
+    ) -> Tuple[List[HybridHit], bool]:
+        # Per-source contribution of each candidate, plus an upper bound on what any candidate
+        # that source did not return could still contribute (0 once the source is exhausted)
+        semantic_similarities = [self._semantic_similarity(distance) for _, _, distance in semantic]
+        semantic_scores = [self._contribution(rank, similarity, self.semantic_weight) for rank, similarity in enumerate(semantic_similarities, 1)]
+        # Normalized by the query length only, so similarity stays monotone in the phonetic rank
+        phonetic_similarities = [max(0.0, 1.0 - distance / max(1, len(query_phonetic))) for _, distance in phonetic]
+        phonetic_scores = [self._contribution(rank, similarity, self.phonetic_weight) for rank, similarity in enumerate(phonetic_similarities, 1)]
+        semantic_bound = self._bound(semantic_scores, pool, self.semantic_weight)
+        phonetic_bound = self._bound(phonetic_scores, pool, self.phonetic_weight)
+
+        entries: Dict[int, dict] = {}
+        for rank, ((faiss_id, text, _), similarity, score) in enumerate(zip(semantic, semantic_similarities, semantic_scores), 1):
+            entries[faiss_id] = {"text": text, "score": score, "semantic": (rank, similarity), "phonetic": None}
+        for rank, ((position, distance), score) in enumerate(zip(phonetic, phonetic_scores), 1):
+            faiss_id = self.phonetic_index.ids[position]
+            entry = entries.setdefault(faiss_id, {"text": self.phonetic_index.texts[position], "score": 0.0, "semantic": None, "phonetic": None})
+            entry["score"] += score
+            entry["phonetic"] = (rank, distance)
+
+        ranked = sorted(entries.items(), key=lambda item: (-item[1]["score"], item[0]))
+        hits = [
+            HybridHit(
+                faiss_id,
+                entry["text"],
+                entry["score"],
+                entry["semantic"][0] if entry["semantic"] else None,
+                entry["semantic"][1] if entry["semantic"] else None,
+                entry["phonetic"][0] if entry["phonetic"] else None,
+                entry["phonetic"][1] if entry["phonetic"] else None
+            )
+            for faiss_id, entry in ranked[:k]
+        ]
+
+        # Threshold test: the top-k membership is final when no candidate seen by only one source, and no
+        # candidate seen by neither, could still overtake the k-th fused score
+        if len(ranked) < k:
+            return hits, semantic_bound == 0.0 and phonetic_bound == 0.0
+        kth_score = ranked[k - 1][1]["score"]
+        challenger = semantic_bound + phonetic_bound
+        for _, entry in ranked[k:]:
+            upper = entry["score"]
+            upper += semantic_bound if entry["semantic"] is None else 0.0
+            upper += phonetic_bound if entry["phonetic"] is None else 0.0
+            challenger = max(challenger, upper)
+        return hits, kth_score >= challenger
+
+    def _semantic_similarity(self, value: float) -> float:
+        # Monotone in the FAISS rank for every metric, so the threshold test stays valid
+        metric = self.faiss_manager.config.metric
+        if metric == "cosine":
+            return (1.0 + value) / 2.0
+        if metric == "ip":
+            return value
+        return 1.0 / (1.0 + value)
+
+    def _contribution(self, rank: int, similarity: float, weight: float) -> float:
+        if self.fusion == "rrf":
+            return weight / (self.rrf_k + rank)
+        return weight * similarity
+
+    def _bound(self, scores: List[float], pool: int, weight: float) -> float:
+        if len(scores) < pool:
+            # The source returned everything it has
+            return 0.0
+        if self.fusion == "rrf":
+            return weight / (self.rrf_k + len(scores) + 1)
+        # Sources return candidates best-first, so an unreturned one scores at most the last
+        return scores[-1]
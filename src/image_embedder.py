@@ -1,28 +1,188 @@
-import torch
 from PIL import Image
-from transformers import CLIPProcessor, CLIPModel
 import numpy as np
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Tuple
+from src.embedding_cache import EmbeddingCache
+from src.metrics import metrics
 
 
 class ImageEmbedder:
     _model_name = "openai/clip-vit-large-patch14"
+    _backends = ("fp32", "int8", "compile")
 
-    def __init__(self):
-        torch.set_num_threads(1)
-        self.model = CLIPModel.from_pretrained(ImageEmbedder._model_name)
-        self.processor = CLIPProcessor.from_pretrained(ImageEmbedder._model_name)
+    def __init__(
+        self,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        num_threads: int = 1,
+        backend: str = "fp32",
+        validation_images: Optional[List[Image.Image]] = None,
+        min_cosine: float = 0.99,
+        weights_cache: Optional[str] = None
+    ):
+        if backend not in ImageEmbedder._backends:
+            raise ValueError(f"Unknown backend {backend!r}, expected one of {ImageEmbedder._backends}")
+        
+        self.embedding_cache: Optional[EmbeddingCache] = embedding_cache
+        self.backend: str = backend
+        self.backend_cosine: Optional[float] = None
+        # Cache namespace: int8 and compiled vectors drift from fp32 and must not be served in its place
+        self.model_id: str = ImageEmbedder._model_name if backend == "fp32" else f"{ImageEmbedder._model_name}:{backend}"
+        # torch and transformers take seconds to import: only processes that embed images pay for them
+        import torch
+        torch.set_num_threads(num_threads)
+        self.model, self.processor = ImageEmbedder._load_model(weights_cache)
         self.model.to('cpu')
         self.model.eval()
+        self._dimension: int = self.model.config.projection_dim
+    
+        if backend != "fp32":
+            # Never enabled unchecked: without caller images, a built-in synthetic set is compared
+            validation_images = validation_images or ImageEmbedder._synthetic_images()
+            reference = self._forward(validation_images)
+            self._apply_backend()
+            self._validate_backend(validation_images, reference, min_cosine)
     
     def embed_image(self, image: Image.Image) -> np.ndarray:
+        return self.embed_images([image])[0]
+    
+    def embed_images(self, images: List[Image.Image], batch_size: int = 32) -> np.ndarray:
+        embeddings = np.empty((len(images), self.get_embedding_dimension()), dtype='float32')
+        missing = list(range(len(images)))
+        contents: List[bytes] = []
+        
+        if self.embedding_cache is not None:
+            contents = [ImageEmbedder._image_content(image) for image in images]
+            cached = self.embedding_cache.get_many(self.model_id, "image", contents)
+            missing = [i for i, vector in enumerate(cached) if vector is None]
+            for i, vector in enumerate(cached):
+                if vector is not None:
+                    embeddings[i] = vector
+        
+        for start in range(0, len(missing), batch_size):
+            positions = missing[start:start + batch_size]
+            with metrics.timer("image_embedding_seconds", backend=self.backend):
+                embeddings[positions] = self._forward([images[i] for i in positions])
+            metrics.inc("images_embedded_total", len(positions), backend=self.backend)
+            if self.embedding_cache is not None:
+                self.embedding_cache.put_many(self.model_id, "image", [contents[i] for i in positions], embeddings[positions])
+    
+        return embeddings
+    
+    @staticmethod
+    def _load_model(weights_cache: Optional[str]) -> Tuple[Any, Any]:
+        # Vision tower and projection only: the same image embeddings as CLIPModel.get_image_features
+        # without loading the text tower. weights_cache is a directory holding a vision-only
+        # safetensors copy, written on first use; later loads memory-map it and skip the hub
+        from transformers import CLIPConfig, CLIPImageProcessor, CLIPVisionModelWithProjection
+        
+        cached = weights_cache is not None and os.path.isfile(os.path.join(weights_cache, "model.safetensors"))
+        if cached:
+            model = CLIPVisionModelWithProjection.from_pretrained(weights_cache)
+        else:
+            # The projection size lives in the top-level CLIP config, not always in its vision part
+            config = CLIPConfig.from_pretrained(ImageEmbedder._model_name)
+            config.vision_config.projection_dim = config.projection_dim
+            model = CLIPVisionModelWithProjection.from_pretrained(ImageEmbedder._model_name, config=config.vision_config)
+        processor = CLIPImageProcessor.from_pretrained(weights_cache if cached else ImageEmbedder._model_name)
+        
+        if weights_cache is not None and not cached:
+            # Written aside and renamed so a concurrent worker never loads a half-written copy
+            tmp_path = f"{weights_cache}.tmp{os.getpid()}"
+            model.save_pretrained(tmp_path, safe_serialization=True)
+            processor.save_pretrained(tmp_path)
+            try:
+                os.replace(tmp_path, weights_cache)
+            except OSError:
+                # Another process won the race
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        return model, processor
+    
+    def _forward(self, images: List[Image.Image]) -> np.ndarray:
+        import torch
         with torch.no_grad():
-            inputs = self.processor(images=image, return_tensors="pt")
+            inputs = self.processor(images=images, return_tensors="pt")
             inputs = {k: v.to('cpu') for k, v in inputs.items()}
-            image_features = self.model.get_image_features(**inputs)
+            image_features = self.model(**inputs).image_embeds
             image_features = image_features / image_features.norm(p=2, dim=-1, keepdim=True)
-            result = image_features.detach().cpu().numpy()
-            return result[0]
+            return image_features.detach().cpu().numpy().astype('float32')
+    
+    def _apply_backend(self) -> None:
+        import torch
+        if self.backend == "int8":
+            # Dynamic quantization: int8 weights for every Linear layer, activations quantized on the fly
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif self.backend == "compile":
+            self.model = torch.compile(self.model)
+    
+    def _validate_backend(self, images: List[Image.Image], reference: np.ndarray, min_cosine: float) -> None:
+        # Both sides are L2-normalized, so the row-wise dot product is the cosine similarity
+        cosine = float(np.min(np.sum(self._forward(images) * reference, axis=1)))
+        self.backend_cosine = cosine
+        if cosine < min_cosine:
+            raise ValueError(f"{self.backend} backend drifts from fp32: min cosine {cosine:.4f} < {min_cosine}")
+    
+    @staticmethod
+    def _synthetic_images(count: int = 8, size: int = 224) -> List[Image.Image]:
+        # Deterministic gradients, blocks and noise: enough spread to expose a drifting backend
+        rng = np.random.default_rng(0)
+        ramp = np.linspace(0, 255, size, dtype=np.float32)
+        images = []
+        for i in range(count):
+            pixels = np.empty((size, size, 3), dtype=np.float32)
+            pixels[..., 0] = ramp[np.newaxis, :] if i % 2 else ramp[:, np.newaxis]
+            pixels[..., 1] = np.kron(rng.uniform(0, 255, (8, 8)), np.ones((size // 8, size // 8)))
+            pixels[..., 2] = rng.uniform(0, 255, (size, size))
+            images.append(Image.fromarray(pixels.astype(np.uint8), 'RGB'))
+        return images
+    
+    @staticmethod
+    def _image_content(image: Image.Image) -> bytes:
+        # Decoded pixels plus geometry: the same picture served from another URL still hits
+        return f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode('utf-8') + image.tobytes()
     
     def get_embedding_dimension(self) -> int:
-        return self.model.config.projection_dim
+        return self._dimension
 
+
+_worker_embedder: Optional[ImageEmbedder] = None
+
+
+def _init_worker(num_threads: int, backend: str, weights_cache: Optional[str]) -> None:
+    global _worker_embedder
+    _worker_embedder = ImageEmbedder(num_threads=num_threads, backend=backend, weights_cache=weights_cache)
+
+
+def _embed_shard(images: List[Image.Image], batch_size: int) -> np.ndarray:
+    return _worker_embedder.embed_images(images, batch_size=batch_size)
+
+
+class ImageEmbedderPool:
+    def __init__(
+        self,
+        workers: int = 2,
+        threads_per_worker: Optional[int] = None,
+        backend: str = "fp32",
+        weights_cache: Optional[str] = None
+    ):
+        # Each worker process loads its own model copy; split the cores between them
+        threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self.workers: int = workers
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(threads_per_worker, backend, weights_cache)
+        )
+    
+    def embed_images(self, images: List[Image.Image], batch_size: int = 32) -> np.ndarray:
+        if len(images) == 0:
+            return np.empty((0, 0), dtype='float32')
+        
+        # One batch per task keeps the workers evenly loaded; map() preserves input order
+        shards = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+        results = self._executor.map(_embed_shard, shards, [batch_size] * len(shards))
+        return np.vstack(list(results))
+    
+    def close(self) -> None:
+        self._executor.shutdown()
@@ -0,0 +1,260 @@
+from typing import Callable, Dict, Iterable, List, Optional, Protocol, Tuple, Union
+from dataclasses import dataclass, field
+from io import BytesIO
+import os
+import queue
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from PIL import Image
+from src.faiss_manager import FaissManager
+from src.index_config import IndexConfig
+from src.image_embedder import ImageEmbedder
+
+_DONE = object()
+
+
+class Fetcher(Protocol):
+    def fetch(self, source: str) -> bytes:
+        """Return the raw (encoded) image bytes for a source"""
+
+
+class HttpFetcher:
+    def __init__(
+        self,
+        concurrency: int = 16,
+        timeout: float = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        follow_redirects: bool = True
+    ):
+        self.concurrency: int = concurrency
+        self.timeout: float = timeout
+        self.max_retries: int = max_retries
+        self.backoff_factor: float = backoff_factor
+        self.follow_redirects: bool = follow_redirects
+        # requests.Session is not documented as thread-safe: one keep-alive session per fetch thread
+        self._local = threading.local()
+
+    def fetch(self, source: str) -> bytes:
+        response = self._session().get(source, timeout=self.timeout, allow_redirects=self.follow_redirects)
+        response.raise_for_status()
+        return response.content
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            retry = Retry(
+                total=self.max_retries,
+                backoff_factor=self.backoff_factor,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=("GET",)
+            )
+            adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency, max_retries=retry)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+
+class DirectoryFetcher:
+    def __init__(self, root: str):
+        self.root: str = root
+
+    def fetch(self, source: str) -> bytes:
+        with open(os.path.join(self.root, source), 'rb') as f:
+            return f.read()
+
+
+@dataclass
+class StageStats:
+    name: str
+    processed: int = 0
+    failed: int = 0
+    busy_seconds: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    def record(self, started: float, ok: bool = True, count: int = 1) -> None:
+        now = time.perf_counter()
+        self.started = started if self.started is None else min(self.started, started)
+        self.finished = now if self.finished is None else max(self.finished, now)
+        self.busy_seconds += now - started
+        if ok:
+            self.processed += count
+        else:
+            self.failed += count
+
+    @property
+    def throughput(self) -> float:
+        if self.started is None or self.finished is None or self.finished <= self.started:
+            return 0.0
+        return self.processed / (self.finished - self.started)
+
+
+@dataclass
+class PipelineReport:
+    stages: Dict[str, StageStats]
+    failures: List[Tuple[str, str, str]] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    def format(self, max_failures: int = 10) -> str:
+        lines = [f"Pipeline finished in {self.elapsed_seconds:.1f}s"]
+        for stats in self.stages.values():
+            lines.append(
+                f"  {stats.name:<6} ok={stats.processed:<6} failed={stats.failed:<5} "
+                f"{stats.throughput:8.1f} items/s  busy={stats.busy_seconds:.1f}s"
+            )
+        for stage, source, error in self.failures[:max_failures]:
+            lines.append(f"  [{stage}] {source}: {error}")
+        if len(self.failures) > max_failures:
+            lines.append(f"  ... {len(self.failures) - max_failures} more failures")
+        return "\n".join(lines)
+
+
+class ImagePipeline:
+    def __init__(
+        self,
+        fetcher: Fetcher,
+        image_embedder: ImageEmbedder,
+        fetch_workers: int = 16,
+        decode_workers: int = 4,
+        batch_size: int = 32,
+        queue_size: int = 256,
+        max_side: Optional[int] = 448
+    ):
+        self.fetcher: Fetcher = fetcher
+        self.image_embedder: ImageEmbedder = image_embedder
+        self.fetch_workers: int = fetch_workers
+        self.decode_workers: int = decode_workers
+        self.batch_size: int = batch_size
+        self.queue_size: int = queue_size
+        # CLIP works at 224px; shrinking large downloads early makes decode and preprocessing cheaper
+        self.max_side: Optional[int] = max_side
+
+    def run(
+        self,
+        sources: Iterable[str],
+        faiss_manager: FaissManager,
+        index_config: Union[str, IndexConfig, None] = None
+    ) -> PipelineReport:
+        # index_config is only used when faiss_manager has no index yet
+        if faiss_manager.index is None:
+            # CLIP features are L2-normalized: cosine scores are directly comparable across queries
+            faiss_manager.create_index(self.image_embedder.get_embedding_dimension(), index_config or IndexConfig.flat(metric="cosine"))
+        if not faiss_manager.is_trained:
+            raise ValueError("Vectors are added as they stream in: train the index first or use one that needs no training")
+
+        report = PipelineReport(stages={name: StageStats(name) for name in ("fetch", "decode", "embed")})
+        lock = threading.Lock()
+        fetch_queue: "queue.Queue" = queue.Queue(self.queue_size)
+        decode_queue: "queue.Queue" = queue.Queue(self.queue_size)
+        embed_queue: "queue.Queue" = queue.Queue(self.queue_size)
+        remaining = {"fetch": self.fetch_workers, "decode": self.decode_workers}
+        feed_errors: List[BaseException] = []
+
+        def fail(stage: str, failed_sources: List[str], started: float, error: Exception) -> None:
+            with lock:
+                report.stages[stage].record(started, ok=False, count=len(failed_sources))
+                report.failures.extend((stage, source, f"{type(error).__name__}: {error}") for source in failed_sources)
+
+        def finish(stage: str, downstream: "queue.Queue", sentinels: int) -> None:
+            # The last worker of a stage tells the next stage there is nothing more to come
+            with lock:
+                remaining[stage] -= 1
+                last = remaining[stage] == 0
+            if last:
+                for _ in range(sentinels):
+                    downstream.put(_DONE)
+
+        def feed() -> None:
+            # A failing sources iterator must still stop the workers, or run() would wait forever
+            try:
+                for source in sources:
+                    fetch_queue.put(source)
+            except BaseException as e:
+                feed_errors.append(e)
+            finally:
+                for _ in range(self.fetch_workers):
+                    fetch_queue.put(_DONE)
+
+        def fetch_worker() -> None:
+            while (source := fetch_queue.get()) is not _DONE:
+                started = time.perf_counter()
+                try:
+                    data = self.fetcher.fetch(source)
+                except Exception as e:
+                    fail("fetch", [source], started, e)
+                    continue
+                with lock:
+                    report.stages["fetch"].record(started)
+                decode_queue.put((source, data))
+            finish("fetch", decode_queue, self.decode_workers)
+
+        def decode_worker() -> None:
+            while (item := decode_queue.get()) is not _DONE:
+                source, data = item
+                started = time.perf_counter()
+                try:
+                    image = self._decode(data)
+                except Exception as e:
+                    fail("decode", [source], started, e)
+                    continue
+                with lock:
+                    report.stages["decode"].record(started)
+                embed_queue.put((source, image))
+            finish("decode", embed_queue, 1)
+
+        pipeline_started = time.perf_counter()
+        threads = [threading.Thread(target=feed, daemon=True)]
+        threads += [threading.Thread(target=fetch_worker, daemon=True) for _ in range(self.fetch_workers)]
+        threads += [threading.Thread(target=decode_worker, daemon=True) for _ in range(self.decode_workers)]
+        for thread in threads:
+            thread.start()
+
+        batch: List[Tuple[str, Image.Image]] = []
+        while (item := embed_queue.get()) is not _DONE:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._embed_batch(batch, faiss_manager, report, fail)
+                batch = []
+        if batch:
+            self._embed_batch(batch, faiss_manager, report, fail)
+
+        for thread in threads:
+            thread.join()
+        report.elapsed_seconds = time.perf_counter() - pipeline_started
+        if feed_errors:
+            # Sources read before the failure are indexed; the caller still learns the input was cut short
+            raise feed_errors[0]
+        return report
+
+    def _decode(self, data: bytes) -> Image.Image:
+        image = Image.open(BytesIO(data))
+        if self.max_side is not None:
+            # draft() lets the JPEG decoder skip straight to a reduced scale
+            image.draft('RGB', (self.max_side, self.max_side))
+        image = image.convert('RGB')
+        if self.max_side is not None:
+            image.thumbnail((self.max_side, self.max_side))
+        return image
+
+    def _embed_batch(
+        self,
+        batch: List[Tuple[str, Image.Image]],
+        faiss_manager: FaissManager,
+        report: PipelineReport,
+        fail: Callable[[str, List[str], float, Exception], None]
+    ) -> None:
+        sources = [source for source, _ in batch]
+        started = time.perf_counter()
+        try:
+            embeddings = self.image_embedder.embed_images([image for _, image in batch], batch_size=self.batch_size)
+        except Exception as e:
+            fail("embed", sources, started, e)
+            return
+        report.stages["embed"].record(started, count=len(batch))
+        faiss_manager.add_vectors(embeddings, sources)
@@ -1,68 +1,343 @@
-from typing import List
-import os
-import time
-import google.generativeai as genai
-from dotenv import load_dotenv
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import io
+import json
+import hashlib
+import numpy as np
 from tqdm import tqdm
 from src.faiss_manager import FaissManager
-load_dotenv()
+from src.index_config import IndexConfig
+from src.embedding_pipeline import EmbeddingPipeline, RateLimiter
+from src.embedding_cache import EmbeddingCache
+from src.embedder import Embedder, GeminiEmbedder
+
+
+class _TrainingBuffer:
+    def __init__(self, capacity: int):
+        # Vectors embedded before the index is trained, in one preallocated array: appending a batch
+        # copies that batch only, where growing with np.vstack recopied the whole buffer every time
+        self.capacity: int = capacity
+        self.vectors: Optional[np.ndarray] = None
+        self.size: int = 0
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def append(self, batch: np.ndarray) -> None:
+        if self.vectors is None:
+            self.vectors = np.empty((max(self.capacity, len(batch)), batch.shape[1]), dtype='float32')
+        elif self.size + len(batch) > len(self.vectors):
+            # Only the batch crossing the capacity gets here, right before the buffer is flushed
+            grown = np.empty((self.size + len(batch), self.vectors.shape[1]), dtype='float32')
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+        self.vectors[self.size:self.size + len(batch)] = batch
+        self.size += len(batch)
+    
+    def view(self) -> np.ndarray:
+        return self.vectors[:self.size]
 
 
 class IndexBuilder:
-    _api_key: str = os.getenv("GOOGLE_API_KEY")
-    _model_name: str = "models/gemini-embedding-001"
+    # Checkpoints are incremental: a small header (fingerprint, offset, segment count), the empty
+    # trained index written once, and one segment per checkpoint holding only the vectors embedded
+    # since the previous one. A resume replays the segments into the index
+    _checkpoint_name: str = "checkpoint.npz"
+    _trained_name: str = "checkpoint.trained.faiss"
+    _segment_name: str = "checkpoint.{:05d}.npy"
     
-    def __init__(self, faiss_manager: FaissManager):
+    def __init__(
+        self,
+        faiss_manager: FaissManager,
+        concurrency: int = 4,
+        requests_per_minute: Optional[float] = 50,
+        texts_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        embedder: Optional[Embedder] = None
+    ):
         self.faiss_manager: FaissManager = faiss_manager
-        
-        if not IndexBuilder._api_key:
-            raise ValueError("Google API key required.")
-        
-        genai.configure(api_key=IndexBuilder._api_key)
+        self.concurrency: int = concurrency
+        self.requests_per_minute: Optional[float] = requests_per_minute
+        self.texts_per_minute: Optional[float] = texts_per_minute
+        self.max_retries: int = max_retries
+        # Defaults to the cache the FaissManager uses for queries
+        self.embedding_cache: Optional[EmbeddingCache] = embedding_cache or faiss_manager.embedding_cache
+        # Defaults to the FaissManager's embedder, then to Gemini once the index config is known
+        self.embedder: Optional[Embedder] = embedder or faiss_manager.embedder
 
-    def build_index_from_texts(self, texts: List[str]) -> None:
+    def build_index_from_texts(self, texts: List[str], index_config: Union[str, IndexConfig, None] = None) -> None:
         if len(texts) == 0:
             raise ValueError("Cannot build index with empty texts")
         
+        config = IndexConfig.from_value(index_config)
+        self._resolve_embedder(config)
         embeddings = self._generate_embeddings(texts, batch_size=100)
         dimension = len(embeddings[0])
         
-        self.faiss_manager.create_l2_index(dimension)
+        self.faiss_manager.create_index(dimension, config)
+        # Approximate indexes (IVF, PQ, OPQ) learn centroids/codebooks from a sample of the corpus
+        self.faiss_manager.train(embeddings)
         self.faiss_manager.add_vectors(embeddings, texts)
         
         self.faiss_manager.save()
     
+    def build_index_streaming(
+        self,
+        texts: List[str],
+        index_config: Union[str, IndexConfig, None] = None,
+        batch_size: int = 100,
+        checkpoint_every: int = 20,
+        ids: Optional[Sequence[Union[int, str]]] = None
+    ) -> None:
+        if len(texts) == 0:
+            raise ValueError("Cannot build index with empty texts")
+        
+        if ids is not None and len(ids) != len(texts):
+            raise ValueError("Number of ids must match number of texts")
+        
+        config = IndexConfig.from_value(index_config)
+        if ids is not None:
+            config.id_map = True
+        embedder = self._resolve_embedder(config)
+        fingerprint = self._fingerprint(texts, config, ids, embedder.model_id)
+        pending = _TrainingBuffer(config.train_size + batch_size)
+        offset, segments = self._restore_checkpoint(texts, config, fingerprint, ids, pending)
+        
+        pipeline = self._pipeline("retrieval_document", batch_size)
+        total_batches = (len(texts) + batch_size - 1) // batch_size
+        completed = 0
+        # Vectors embedded since the last checkpoint: the next segment
+        unsaved: List[np.ndarray] = []
+        
+        with tqdm(total=total_batches, initial=offset // batch_size, desc="Building index", unit="batch") as pbar:
+            for i, batch_embeddings in pipeline.iter_batches(texts, start=offset):
+                batch_np = np.asarray(batch_embeddings, dtype='float32')
+                offset = i + len(batch_np)
+                unsaved.append(batch_np)
+                
+                if self.faiss_manager.index is None:
+                    self.faiss_manager.create_index(batch_np.shape[1], config)
+                    if self.faiss_manager.is_trained:
+                        self._save_trained()
+                
+                if self.faiss_manager.is_trained:
+                    self.faiss_manager.add_vectors(batch_np, texts[i:offset], ids=ids[i:offset] if ids is not None else None)
+                else:
+                    # Approximate indexes need a training sample before the first add
+                    pending.append(batch_np)
+                    if len(pending) >= config.train_size:
+                        self._flush_pending(pending.view(), texts, offset, ids, checkpoint=True)
+                        pending = _TrainingBuffer(0)
+                
+                completed += 1
+                if completed % checkpoint_every == 0 and offset < len(texts):
+                    self._save_checkpoint(fingerprint, offset, segments, unsaved)
+                    segments += 1
+                    unsaved = []
+                
+                pbar.update(1)
+                pbar.set_postfix({"vectors": self.faiss_manager.index.ntotal, "texts": offset, "retries": pipeline.retries})
+        
+        if len(pending):
+            self._flush_pending(pending.view(), texts, offset, ids)
+        
+        self.faiss_manager.save()
+        self._delete_checkpoint(segments)
+    
+    def build_index_chunked(
+        self,
+        chunks: Iterable[Tuple[List[str], Sequence[Union[int, str]]]],
+        index_config: Union[str, IndexConfig, None] = None,
+        batch_size: int = 100
+    ) -> int:
+        # Bounded memory: only one (texts, ids) chunk and its embeddings are alive at a time, so the
+        # corpus can come from a streaming reader. A rerun after a crash replays the chunks and the
+        # embedding cache turns the already-embedded texts into lookups
+        config = IndexConfig.from_value(index_config)
+        config.id_map = True
+        self._resolve_embedder(config)
+        self.faiss_manager.index = None
+        self.faiss_manager.mapping = {}
+        pipeline = self._pipeline("retrieval_document", batch_size)
+        pending = _TrainingBuffer(config.train_size)
+        pending_texts: List[str] = []
+        pending_ids: List[Union[int, str]] = []
+        
+        with tqdm(desc="Building index", unit="text") as pbar:
+            for texts, ids in chunks:
+                if len(ids) != len(texts):
+                    raise ValueError("Number of ids must match number of texts")
+                if not texts:
+                    continue
+                
+                chunk_np = np.asarray(pipeline.embed(texts), dtype='float32')
+                if self.faiss_manager.index is None:
+                    self.faiss_manager.create_index(chunk_np.shape[1], config)
+                
+                if self.faiss_manager.is_trained:
+                    self.faiss_manager.add_vectors(chunk_np, texts, ids=ids)
+                else:
+                    # Approximate indexes need a training sample before the first add
+                    pending.append(chunk_np)
+                    pending_texts.extend(texts)
+                    pending_ids.extend(ids)
+                    if len(pending) >= config.train_size:
+                        self._flush_pending(pending.view(), pending_texts, len(pending), pending_ids)
+                        pending, pending_texts, pending_ids = _TrainingBuffer(0), [], []
+                
+                pbar.update(len(texts))
+                pbar.set_postfix({"vectors": self.faiss_manager.index.ntotal, "retries": pipeline.retries})
+        
+        if self.faiss_manager.index is None:
+            raise ValueError("Cannot build index with empty texts")
+        if len(pending):
+            self._flush_pending(pending.view(), pending_texts, len(pending), pending_ids)
+        
+        self.faiss_manager.save()
+        return self.faiss_manager.index.ntotal
+    
+    def apply_updates(self, upserts: Dict[Union[int, str], str], removals: Sequence[Union[int, str]] = ()) -> None:
+        # Daily feed: embed only new/changed records, then upsert and drop withdrawals in place
+        if removals:
+            self.faiss_manager.remove(removals)
+        
+        if upserts:
+            self._resolve_embedder(self.faiss_manager.config)
+            record_ids = list(upserts.keys())
+            texts = list(upserts.values())
+            embeddings = self._generate_embeddings(texts, batch_size=100)
+            self.faiss_manager.upsert(record_ids, embeddings, texts)
+        
+        self.faiss_manager.save()
+    
+    def _flush_pending(
+        self,
+        pending: np.ndarray,
+        texts: List[str],
+        offset: int,
+        ids: Optional[Sequence[Union[int, str]]],
+        checkpoint: bool = False
+    ) -> None:
+        start = offset - len(pending)
+        self.faiss_manager.train(pending)
+        if checkpoint:
+            self._save_trained()
+        self.faiss_manager.add_vectors(pending, texts[start:offset], ids=ids[start:offset] if ids is not None else None)
+    
+    def _save_trained(self) -> None:
+        # The trained, still empty index: centroids and codebooks, written once per build
+        self.faiss_manager.storage_provider.save_sidecar(IndexBuilder._trained_name, self.faiss_manager.serialize_index())
+    
+    def _save_checkpoint(self, fingerprint: str, offset: int, segment: int, unsaved: List[np.ndarray]) -> None:
+        # The segment goes first: the header, rewritten last, is what makes it part of the checkpoint
+        storage_provider = self.faiss_manager.storage_provider
+        buffer = io.BytesIO()
+        np.save(buffer, np.vstack(unsaved))
+        storage_provider.save_sidecar(IndexBuilder._segment_name.format(segment), buffer.getvalue())
+        
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            fingerprint=np.array(fingerprint),
+            offset=np.array(offset, dtype='int64'),
+            segments=np.array(segment + 1, dtype='int64')
+        )
+        storage_provider.save_sidecar(IndexBuilder._checkpoint_name, buffer.getvalue())
+    
+    def _restore_checkpoint(
+        self,
+        texts: List[str],
+        config: IndexConfig,
+        fingerprint: str,
+        ids: Optional[Sequence[Union[int, str]]],
+        pending: _TrainingBuffer
+    ) -> Tuple[int, int]:
+        # Returns the resume offset and the number of segments already written; vectors of an
+        # untrained index go back into pending
+        self.faiss_manager.index = None
+        self.faiss_manager.mapping = {}
+        storage_provider = self.faiss_manager.storage_provider
+        if not storage_provider.sidecar_exists(IndexBuilder._checkpoint_name):
+            # A trained index left by a run that crashed before its first checkpoint
+            storage_provider.delete_sidecar(IndexBuilder._trained_name)
+            return 0, 0
+        
+        checkpoint = np.load(io.BytesIO(storage_provider.load_sidecar(IndexBuilder._checkpoint_name)))
+        if "segments" not in checkpoint.files or str(checkpoint["fingerprint"]) != fingerprint:
+            tqdm.write("Ignoring checkpoint from a different corpus or index config")
+            self._delete_checkpoint(int(checkpoint["segments"]) if "segments" in checkpoint.files else 0)
+            return 0, 0
+        
+        offset = int(checkpoint["offset"])
+        segments = int(checkpoint["segments"])
+        if storage_provider.sidecar_exists(IndexBuilder._trained_name):
+            self.faiss_manager.restore_index(storage_provider.load_sidecar(IndexBuilder._trained_name), config, {})
+        
+        start = 0
+        for segment in range(segments):
+            vectors = np.load(io.BytesIO(storage_provider.load_sidecar(IndexBuilder._segment_name.format(segment))))
+            end = start + len(vectors)
+            if self.faiss_manager.index is not None:
+                self.faiss_manager.add_vectors(vectors, texts[start:end], ids=ids[start:end] if ids is not None else None)
+            else:
+                pending.append(vectors)
+            start = end
+        if start != offset:
+            raise ValueError(f"Checkpoint segments hold {start} vectors, expected {offset}")
+        
+        tqdm.write(f"Resuming build from checkpoint at {offset}/{len(texts)} texts")
+        return offset, segments
+    
+    def _delete_checkpoint(self, segments: int) -> None:
+        storage_provider = self.faiss_manager.storage_provider
+        for segment in range(segments):
+            storage_provider.delete_sidecar(IndexBuilder._segment_name.format(segment))
+        storage_provider.delete_sidecar(IndexBuilder._trained_name)
+        storage_provider.delete_sidecar(IndexBuilder._checkpoint_name)
+    
+    def _resolve_embedder(self, config: IndexConfig) -> Embedder:
+        if self.embedder is None:
+            self.embedder = GeminiEmbedder(output_dimensionality=config.output_dimensionality)
+        # The manager records the embedder in the index metadata and uses it for queries
+        self.faiss_manager.embedder = self.embedder
+        return self.embedder
+    
+    @staticmethod
+    def _fingerprint(texts: List[str], config: IndexConfig, ids: Optional[Sequence[Union[int, str]]], model_id: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(model_id.encode('utf-8'))
+        digest.update(json.dumps(config.to_dict(), sort_keys=True).encode('utf-8'))
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b"\0")
+        if ids is not None:
+            digest.update(FaissManager.to_faiss_ids(ids).tobytes())
+        return digest.hexdigest()
+    
     def _generate_embeddings(self, texts: List[str], task_type: str = "retrieval_document", batch_size: int = 100) -> List[List[float]]:
+        pipeline = self._pipeline(task_type, batch_size)
         embeddings: List[List[float]] = []
         total_texts = len(texts)
         total_batches = (total_texts + batch_size - 1) // batch_size
         
         with tqdm(total=total_batches, desc="Generating embeddings", unit="batch") as pbar:
-            for batch_num, i in enumerate(range(0, total_texts, batch_size), 1):
-                batch_texts = texts[i:i + batch_size]
-                
-                result = genai.embed_content(
-                    model=IndexBuilder._model_name,
-                    content=batch_texts,
-                    task_type=task_type
-                )
-                
-                # - BatchEmbeddingDict: embedding is list[list[float]]
-                # - EmbeddingDict: embedding is list[float]
-                if isinstance(result, dict) and 'embedding' in result:
-                    embedding_data = result['embedding']
-                    if isinstance(embedding_data, list):
-                        if len(embedding_data) > 0 and isinstance(embedding_data[0], list):
-                            embeddings.extend(embedding_data)
-                        else:
-                            embeddings.append(embedding_data)
+            for i, batch_embeddings in pipeline.iter_batches(texts):
+                embeddings.extend(batch_embeddings)
                 
                 pbar.update(1)
-                pbar.set_postfix({"embeddings": len(embeddings), "texts": min(i + batch_size, total_texts)})
-                
-                # Avoid rate limiting by sleep 1 minute after every 50 requests
-                if batch_num % 50 == 0 and batch_num < total_batches:
-                    pbar.write(f"⏸️  Rate limit: Sleeping 60s after {batch_num} requests...")
-                    time.sleep(60)
+                pbar.set_postfix({"embeddings": len(embeddings), "texts": min(i + batch_size, total_texts), "retries": pipeline.retries})
         
-        return embeddings
\ No newline at end of file
+        return embeddings
+    
+    def _pipeline(self, task_type: str, batch_size: int) -> EmbeddingPipeline:
+        embedder = self.embedder
+        return EmbeddingPipeline(
+            lambda batch_texts: embedder.embed(batch_texts, task_type),
+            batch_size=batch_size,
+            concurrency=self.concurrency,
+            rate_limiter=RateLimiter(self.requests_per_minute, self.texts_per_minute),
+            max_retries=self.max_retries,
+            retry_on=embedder.retryable_errors,
+            cache=self.embedding_cache,
+            cache_namespace=(embedder.model_id, task_type)
+        )
\ No newline at end of file
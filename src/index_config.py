@@ -0,0 +1,82 @@
+from dataclasses import dataclass, asdict
+from typing import Optional, Union
+import faiss
+
+
+@dataclass
+class IndexConfig:
+    factory: str = "Flat"
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    ef_construction: Optional[int] = None
+    train_size: int = 100000
+    id_map: bool = False
+    # Matryoshka truncation: keep only the leading dimensions of the embedding model output
+    output_dimensionality: Optional[int] = None
+    # "l2" (squared distance, lower is better), "ip" (raw inner product) or
+    # "cosine" (inner product on L2-normalized vectors, in [-1, 1]); "ip" and "cosine" are higher-is-better
+    metric: str = "l2"
+
+    _metrics = ("l2", "ip", "cosine")
+
+    def __post_init__(self):
+        if self.metric not in IndexConfig._metrics:
+            raise ValueError(f"Unknown metric {self.metric!r}, expected one of {IndexConfig._metrics}")
+
+    @property
+    def faiss_metric(self) -> int:
+        return faiss.METRIC_L2 if self.metric == "l2" else faiss.METRIC_INNER_PRODUCT
+
+    @property
+    def higher_is_better(self) -> bool:
+        return self.metric != "l2"
+
+    @classmethod
+    def flat(cls, metric: str = "l2") -> "IndexConfig":
+        return cls(factory="Flat", metric=metric)
+
+    @classmethod
+    def sq_fp16(cls, metric: str = "l2") -> "IndexConfig":
+        return cls(factory="SQfp16", metric=metric)
+
+    @classmethod
+    def sq8(cls, metric: str = "l2") -> "IndexConfig":
+        return cls(factory="SQ8", metric=metric)
+
+    @classmethod
+    def pq(cls, m: int, nbits: int = 8, metric: str = "l2") -> "IndexConfig":
+        return cls(factory=f"PQ{m}x{nbits}", metric=metric)
+
+    @classmethod
+    def ivf_flat(cls, nlist: int, nprobe: int = 16, metric: str = "l2") -> "IndexConfig":
+        return cls(factory=f"IVF{nlist},Flat", nprobe=nprobe, metric=metric)
+
+    @classmethod
+    def ivf_pq(cls, nlist: int, m: int, nbits: int = 8, nprobe: int = 16, metric: str = "l2") -> "IndexConfig":
+        return cls(factory=f"IVF{nlist},PQ{m}x{nbits}", nprobe=nprobe, metric=metric)
+
+    @classmethod
+    def opq_ivf_pq(cls, nlist: int, m: int, nbits: int = 8, nprobe: int = 16, metric: str = "l2") -> "IndexConfig":
+        return cls(factory=f"OPQ{m},IVF{nlist},PQ{m}x{nbits}", nprobe=nprobe, metric=metric)
+
+    @classmethod
+    def hnsw(cls, m: int = 32, ef_search: int = 64, ef_construction: int = 200, metric: str = "l2") -> "IndexConfig":
+        return cls(factory=f"HNSW{m}", ef_search=ef_search, ef_construction=ef_construction, metric=metric)
+
+    @classmethod
+    def from_value(cls, value: Union[str, "IndexConfig", None]) -> "IndexConfig":
+        if value is None:
+            return cls()
+        if isinstance(value, IndexConfig):
+            return value
+        if isinstance(value, str):
+            return cls(factory=value)
+        raise TypeError(f"Unsupported index config: {value!r}")
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "IndexConfig":
+        known = {k: v for k, v in data.items() if k in cls.__dataclass_fields__}
+        return cls(**known)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
@@ -0,0 +1,79 @@
+from typing import Dict, List, NamedTuple
+import time
+import numpy as np
+from src.embedder import truncate_embeddings
+from src.faiss_manager import FaissManager
+from src.index_config import IndexConfig
+from src.storage_provider import StorageProvider
+
+
+class CompressionReport(NamedTuple):
+    name: str
+    factory: str
+    dimension: int
+    memory_bytes: int
+    bytes_per_vector: float
+    recall: float
+    build_seconds: float
+
+    def format(self) -> str:
+        return (
+            f"{self.name:<12} {self.factory:<14} d={self.dimension:<5} "
+            f"{self.memory_bytes / 2**20:9.1f} MiB  {self.bytes_per_vector:8.1f} B/vec  "
+            f"recall={self.recall:.3f}  build={self.build_seconds:.1f}s"
+        )
+
+
+def recall_at_k(reference_ids: np.ndarray, candidate_ids: np.ndarray) -> float:
+    # Fraction of the exact top-k neighbours that the candidate index also returns
+    k = reference_ids.shape[1]
+    found = sum(len(np.intersect1d(ref[ref >= 0], cand[cand >= 0])) for ref, cand in zip(reference_ids, candidate_ids))
+    return found / (len(reference_ids) * k)
+
+
+def compare_compression(
+    storage_provider: StorageProvider,
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    configs: Dict[str, IndexConfig],
+    k: int = 10
+) -> List[CompressionReport]:
+    # Every candidate (and the exact reference) is built in memory through FaissManager, so training,
+    # search defaults and normalization match the production indexes; nothing is saved to storage_provider
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    queries = np.ascontiguousarray(queries, dtype='float32')
+    payloads = [""] * len(embeddings)
+    references: Dict[str, np.ndarray] = {}
+
+    reports: List[CompressionReport] = []
+    for name, config in configs.items():
+        # Ground truth comes from an exact search over the full-size vectors, with each mode's metric
+        if config.metric not in references:
+            exact = FaissManager(storage_provider=storage_provider)
+            exact.create_index(embeddings.shape[1], IndexConfig.flat(metric=config.metric))
+            exact.add_vectors(embeddings, payloads)
+            references[config.metric] = exact.search_batch(queries, k).ids
+        reference_ids = references[config.metric]
+
+        vectors = truncate_embeddings(embeddings, config.output_dimensionality)
+        query_vectors = truncate_embeddings(queries, config.output_dimensionality)
+
+        candidate = FaissManager(storage_provider=storage_provider)
+        started = time.perf_counter()
+        candidate.create_index(vectors.shape[1], config)
+        candidate.train(vectors)
+        candidate.add_vectors(vectors, payloads)
+        build_seconds = time.perf_counter() - started
+
+        candidate_ids = candidate.search_batch(query_vectors, k).ids
+        memory_bytes = candidate.memory_footprint()
+        reports.append(CompressionReport(
+            name,
+            config.factory,
+            vectors.shape[1],
+            memory_bytes,
+            memory_bytes / len(vectors),
+            recall_at_k(reference_ids, candidate_ids),
+            build_seconds
+        ))
+    return reports
@@ -0,0 +1,164 @@
+from collections.abc import Mapping
+from typing import Iterator, Mapping as MappingType, Optional, Set
+import json
+import os
+import re
+import shutil
+import numpy as np
+
+
+# Read-only id -> payload mapping: sorted ids, a contiguous UTF-8 blob and an offsets
+# array, all memory-mapped so opening is instant and worker processes share the pages.
+# Each write goes to a new generation directory; the CURRENT marker names the live one.
+class MappingStore(Mapping):
+    _ids_file: str = "ids.npy"
+    _offsets_file: str = "offsets.npy"
+    _blob_file: str = "payloads.bin"
+    _marker_file: str = "CURRENT"
+    suffix: str = ".mmap"
+
+    def __init__(self, ids: np.ndarray, offsets: np.ndarray, blob: np.ndarray):
+        if len(offsets) != len(ids) + 1:
+            raise ValueError("Offsets must have exactly one more entry than ids")
+
+        self._ids: np.ndarray = ids
+        self._offsets: np.ndarray = offsets
+        self._blob: np.ndarray = blob
+        self._dense: bool = len(ids) == 0 or (int(ids[0]) == 0 and int(ids[-1]) == len(ids) - 1)
+
+    @classmethod
+    def is_store(cls, path: str) -> bool:
+        # Stores written before generations existed keep their files at the top level
+        return os.path.isfile(os.path.join(path, cls._marker_file)) or os.path.isfile(os.path.join(path, cls._ids_file))
+
+    @classmethod
+    def open(cls, path: str) -> "MappingStore":
+        if not cls.is_store(path):
+            raise FileNotFoundError(f"Mapping store not found: {path}")
+
+        generation = cls._current_generation(path)
+        files = os.path.join(path, generation) if generation is not None else path
+        ids = np.load(os.path.join(files, cls._ids_file), mmap_mode='r')
+        offsets = np.load(os.path.join(files, cls._offsets_file), mmap_mode='r')
+        blob_path = os.path.join(files, cls._blob_file)
+        # np.memmap refuses zero-length files
+        if os.path.getsize(blob_path) == 0:
+            blob = np.zeros(0, dtype=np.uint8)
+        else:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        return cls(ids, offsets, blob)
+
+    @classmethod
+    def write(cls, path: str, mapping: MappingType[int, str]) -> None:
+        os.makedirs(path, exist_ok=True)
+
+        ids = np.fromiter(mapping.keys(), dtype='int64', count=len(mapping))
+        order = np.argsort(ids, kind='stable')
+        ids = ids[order]
+        if len(ids) > 1 and np.any(ids[1:] == ids[:-1]):
+            raise ValueError("Mapping ids must be unique")
+
+        # The three files go to a fresh generation directory and the CURRENT marker is swapped
+        # in one rename, so a reader sees either the old set or the new set, never a mix
+        previous = cls._current_generation(path)
+        generation = f"v{(int(previous[1:]) + 1 if previous else 1):06d}"
+        files = os.path.join(path, generation)
+        os.makedirs(files)
+
+        offsets = np.zeros(len(ids) + 1, dtype='int64')
+        with open(os.path.join(files, cls._blob_file), 'wb') as f:
+            for i, faiss_id in enumerate(ids):
+                encoded = mapping[int(faiss_id)].encode('utf-8')
+                f.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+
+        for name, array in ((cls._ids_file, ids), (cls._offsets_file, offsets)):
+            with open(os.path.join(files, name), 'wb') as f:
+                np.save(f, array)
+
+        marker_path = os.path.join(path, cls._marker_file)
+        with open(marker_path + ".tmp", 'w') as f:
+            f.write(generation)
+        os.replace(marker_path + ".tmp", marker_path)
+        cls._remove_stale(path, keep={generation, previous})
+
+    @classmethod
+    def _current_generation(cls, path: str) -> Optional[str]:
+        marker_path = os.path.join(path, cls._marker_file)
+        if not os.path.isfile(marker_path):
+            return None
+        with open(marker_path, 'r') as f:
+            return f.read().strip()
+
+    @classmethod
+    def _remove_stale(cls, path: str, keep: Set[Optional[str]]) -> None:
+        # The previous generation stays for readers that read CURRENT just before the swap; older
+        # ones (and top-level files of a pre-generation store) go. Readers that already
+        # memory-mapped a removed file keep their pages until they close it
+        for name in os.listdir(path):
+            entry = os.path.join(path, name)
+            if os.path.isdir(entry) and re.fullmatch(r"v\d{6}", name) and name not in keep:
+                shutil.rmtree(entry, ignore_errors=True)
+            elif name in (cls._ids_file, cls._offsets_file, cls._blob_file):
+                os.remove(entry)
+
+    def lookup(self, ids: np.ndarray) -> np.ndarray:
+        ids = np.asarray(ids, dtype='int64')
+        positions = self._positions(ids)
+
+        payloads = np.full(ids.shape, None, dtype=object)
+        found = positions >= 0
+        starts = self._offsets[positions[found]]
+        ends = self._offsets[positions[found] + 1]
+        payloads[found] = [self._decode(int(a), int(b)) for a, b in zip(starts, ends)]
+        return payloads
+
+    def ids(self) -> np.ndarray:
+        return self._ids
+
+    def __getitem__(self, faiss_id: int) -> str:
+        position = int(self._positions(np.array([faiss_id], dtype='int64'))[0])
+        if position < 0:
+            raise KeyError(faiss_id)
+        return self._decode(int(self._offsets[position]), int(self._offsets[position + 1]))
+
+    def __contains__(self, faiss_id: object) -> bool:
+        try:
+            return int(self._positions(np.array([faiss_id], dtype='int64'))[0]) >= 0
+        except (TypeError, ValueError):
+            return False
+
+    def __iter__(self) -> Iterator[int]:
+        return (int(faiss_id) for faiss_id in self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _positions(self, ids: np.ndarray) -> np.ndarray:
+        if self._dense:
+            return np.where((ids >= 0) & (ids < len(self._ids)), ids, -1)
+
+        positions = np.searchsorted(self._ids, ids)
+        clipped = np.minimum(positions, len(self._ids) - 1)
+        found = (positions < len(self._ids)) & (self._ids[clipped] == ids)
+        return np.where(found, positions, -1)
+
+    def _decode(self, start: int, end: int) -> str:
+        return self._blob[start:end].tobytes().decode('utf-8')
+
+
+def convert_json_mapping(json_path: str, store_path: str) -> int:
+    with open(json_path, 'r', encoding='utf-8') as f:
+        loaded_mapping = json.load(f)
+
+    mapping = {int(k): v for k, v in loaded_mapping.items()}
+    MappingStore.write(store_path, mapping)
+    return len(mapping)
+
+
+def is_mapping_store_path(path: str) -> bool:
+    # An existing path is a store only if it holds the store files; a path not written yet
+    # becomes a store when it carries the store suffix (data/marques_mapping.mmap)
+    if os.path.exists(path):
+        return os.path.isdir(path) and MappingStore.is_store(path)
+    return path.endswith(MappingStore.suffix)
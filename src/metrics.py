@@ -0,0 +1,334 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from bisect import bisect_left
+from contextlib import contextmanager
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import socketserver
+import threading
+import time
+
+F = TypeVar("F", bound=Callable[..., Any])
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# Seconds, from 100us (FAISS flat search on a small index) to a minute (a throttled embedding batch)
+latency_buckets: Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+descriptions: Dict[str, str] = {
+    "embedding_batch_seconds": "Embedding API/model call latency per batch",
+    "embedding_texts_total": "Texts sent to the embedding model",
+    "embedding_cache_hits_total": "Embeddings served from the embedding cache",
+    "embedding_retries_total": "Embedding calls retried after a transient error",
+    "embedding_throttled_seconds_total": "Time spent waiting on the embedding rate limiter",
+    "query_embedding_seconds": "Query embedding latency (cache lookups included)",
+    "faiss_search_seconds": "FAISS index search latency per query batch",
+    "faiss_queries_total": "Query vectors searched",
+    "similarity_graph_seconds": "Whole-index k-NN / range graph construction time",
+    "mapping_lookup_seconds": "FAISS id to payload lookup latency per query batch",
+    "index_load_seconds": "Index, mapping and metadata load time",
+    "index_load_bytes_total": "Index bytes loaded or memory-mapped",
+    "index_save_seconds": "Index, mapping and metadata save time",
+    "index_save_bytes_total": "Serialized index bytes saved",
+    "index_vectors": "Vectors in the most recently loaded or saved index",
+    "image_embedding_seconds": "CLIP embedding latency per image batch",
+    "images_embedded_total": "Images embedded by CLIP (cache misses)",
+    "phonetic_transcription_seconds": "epitran transcription latency (cache misses only)",
+    "phonetic_transcription_cache_hits_total": "Transcriptions served from the matcher cache",
+    "phonetic_rank_seconds": "rank_by_phonetic_similarity latency",
+    "phonetic_search_seconds": "Phonetic index search latency",
+}
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = latency_buckets):
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        # counts[i] holds observations <= buckets[i] and > buckets[i - 1]; the last slot is +Inf
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        # Linear interpolation inside the bucket holding the q-th observation
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "started", "profiler")
+
+    def __init__(self, registry: "MetricsRegistry", name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.profiler: Optional[cProfile.Profile] = None
+
+    def __enter__(self) -> "_Timer":
+        self.profiler = self.registry._maybe_profile(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        elapsed = time.perf_counter() - self.started
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.registry._add_profile(self.name, self.profiler)
+        self.registry.observe(self.name, elapsed, **self.labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+
+_null_timer = _NullTimer()
+
+
+class MetricsRegistry:
+    def __init__(self, enabled: bool = False):
+        # Disabled: every call returns after one attribute check, and timer() hands out a shared no-op
+        self.enabled: bool = enabled
+        self.counters: Dict[MetricKey, float] = {}
+        self.gauges: Dict[MetricKey, float] = {}
+        self.histograms: Dict[MetricKey, Histogram] = {}
+        self._lock = threading.Lock()
+        # name -> (profile every n-th call, calls seen, accumulated stats)
+        self._profiles: Dict[str, List[Any]] = {}
+        self._server: Optional[socketserver.TCPServer] = None
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            for profile in self._profiles.values():
+                profile[1], profile[2] = 0, None
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name: str, **labels: str) -> Any:
+        # with metrics.timer("faiss_search_seconds"): ...
+        if not self.enabled:
+            return _null_timer
+        return _Timer(self, name, labels)
+
+    def timed(self, name: str, **labels: str) -> Callable[[F], F]:
+        # Decorator form of timer()
+        def decorate(func: F) -> F:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Timer(self, name, labels):
+                    return func(*args, **kwargs)
+            return wrapper  # type: ignore[return-value]
+        return decorate
+
+    def profile(self, name: str, every: int = 1) -> None:
+        # Runs one in `every` calls timed under `name` inside cProfile; see profile_stats()
+        if every < 1:
+            raise ValueError("every must be >= 1")
+        with self._lock:
+            self._profiles[name] = [every, 0, None]
+
+    def profile_stats(self, name: str, sort: str = "cumulative", limit: int = 30) -> str:
+        profile = self._profiles.get(name)
+        if profile is None or profile[2] is None:
+            return f"No profiled calls for {name}"
+        stream = io.StringIO()
+        with self._lock:
+            stats = profile[2]
+            stats.stream = stream
+            stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def to_json(self) -> dict:
+        with self._lock:
+            return {
+                "counters": {MetricsRegistry._series(key): value for key, value in self.counters.items()},
+                "gauges": {MetricsRegistry._series(key): value for key, value in self.gauges.items()},
+                "histograms": {MetricsRegistry._series(key): histogram.to_dict() for key, histogram in self.histograms.items()},
+            }
+
+    def dump_json(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_json(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for kind, series in (("counter", self.counters), ("gauge", self.gauges)):
+                for name, items in MetricsRegistry._by_name(series):
+                    lines.extend(MetricsRegistry._header(name, kind))
+                    for labels, value in items:
+                        lines.append(f"{name}{MetricsRegistry._labels(labels)} {value}")
+            for name, items in MetricsRegistry._by_name(self.histograms):
+                lines.extend(MetricsRegistry._header(name, "histogram"))
+                for labels, histogram in items:
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{MetricsRegistry._labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{MetricsRegistry._labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{MetricsRegistry._labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9100, host: str = "0.0.0.0") -> socketserver.TCPServer:
+        # Standalone exporter for processes without the search service (builds, batch jobs):
+        # GET /metrics (Prometheus text) and /metrics.json. http.server is imported here, it
+        # costs more at startup than the rest of this module
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path == "/metrics":
+                    body, content_type = registry.to_prometheus().encode('utf-8'), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = json.dumps(registry.to_json()).encode('utf-8'), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def _maybe_profile(self, name: str) -> Optional[cProfile.Profile]:
+        profile = self._profiles.get(name)
+        if profile is None:
+            return None
+        with self._lock:
+            profile[1] += 1
+            if (profile[1] - 1) % profile[0]:
+                return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (nested profiled call)
+            return None
+        return profiler
+
+    def _add_profile(self, name: str, profiler: cProfile.Profile) -> None:
+        with self._lock:
+            profile = self._profiles[name]
+            if profile[2] is None:
+                profile[2] = pstats.Stats(profiler)
+            else:
+                profile[2].add(profiler)
+
+    @staticmethod
+    def _by_name(series: Dict[MetricKey, Any]) -> Iterator[Tuple[str, List[Tuple[Tuple[Tuple[str, str], ...], Any]]]]:
+        grouped: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], Any]]] = {}
+        for (name, labels), value in series.items():
+            grouped.setdefault(name, []).append((labels, value))
+        return iter(sorted(grouped.items()))
+
+    @staticmethod
+    def _header(name: str, kind: str) -> List[str]:
+        lines = [f"# TYPE {name} {kind}"]
+        if name in descriptions:
+            lines.insert(0, f"# HELP {name} {descriptions[name]}")
+        return lines
+
+    @staticmethod
+    def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+        if not labels:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+        return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+    @staticmethod
+    def _series(key: MetricKey) -> str:
+        return key[0] + MetricsRegistry._labels(key[1])
+
+
+# Process-wide registry used by the instrumented modules; METRICS_ENABLED=1 turns it on at import
+metrics = MetricsRegistry(enabled=os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes"))
+
+
+@contextmanager
+def profiled(output: Optional[str] = None, sort: str = "cumulative", limit: int = 30) -> Iterator[cProfile.Profile]:
+    # Ad-hoc cProfile around any block: stats go to `output` (.prof, for snakeviz) or stdout
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if output is not None:
+            profiler.dump_stats(output)
+        else:
+            pstats.Stats(profiler).sort_stats(sort).print_stats(limit)
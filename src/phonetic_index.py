@@ -0,0 +1,313 @@
+from typing import Dict, List, Mapping, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import heapq
+from collections import Counter
+from io import BytesIO
+from itertools import chain
+import hashlib
+import json
+import numpy as np
+import Levenshtein
+from src.storage_provider import StorageProvider
+
+_worker_phonetics: List[str] = []
+_worker_buckets: Dict[Tuple[int, int], "LengthBuckets"] = {}
+
+
+def _init_worker(phonetics: List[str]) -> None:
+    global _worker_phonetics
+    _worker_phonetics = phonetics
+
+
+def _search_chunk(query_phonetic: str, k: int, start: int, end: int) -> List[Tuple[int, int]]:
+    buckets = _worker_buckets.get((start, end))
+    if buckets is None:
+        buckets = _worker_buckets[(start, end)] = LengthBuckets(_worker_phonetics, start, end)
+    return buckets.top_k(query_phonetic, k)
+
+
+class LengthBuckets:
+    def __init__(self, phonetics: List[str], start: int = 0, end: Optional[int] = None):
+        # Transcriptions grouped by length: length -> (positions, transcriptions)
+        end = len(phonetics) if end is None else end
+        self.buckets: Dict[int, Tuple[List[int], List[str]]] = {}
+        for position in range(start, end):
+            phonetic = phonetics[position]
+            positions, strings = self.buckets.setdefault(len(phonetic), ([], []))
+            positions.append(position)
+            strings.append(phonetic)
+        self.max_length: int = max(self.buckets, default=0)
+
+    def top_k(self, query_phonetic: str, k: int) -> List[Tuple[int, int]]:
+        # |len(a) - len(b)| is a lower bound on the edit distance: visit buckets by growing length
+        # gap and stop once the gap exceeds the current k-th best distance. Inside a bucket the
+        # k-th best is passed as score_cutoff so Levenshtein can give up early on hopeless candidates.
+        query_length = len(query_phonetic)
+        best: List[Tuple[int, int]] = []
+        for gap in range(max(query_length, self.max_length - query_length) + 1):
+            if len(best) == k and gap > best[-1][0]:
+                break
+            for length in {query_length - gap, query_length + gap}:
+                bucket = self.buckets.get(length)
+                if bucket is None:
+                    continue
+                positions, strings = bucket
+                cutoff = best[-1][0] if len(best) == k else None
+                distances = [Levenshtein.distance(query_phonetic, s, score_cutoff=cutoff) for s in strings]
+                # (distance, position) ordering keeps ties in corpus order
+                best = heapq.nsmallest(k, chain(best, zip(distances, positions)))
+        return [(position, distance) for distance, position in best]
+
+
+class QGramIndex:
+    # Padding characters that do not occur in IPA transcriptions
+    _pad_start: str = "\x02"
+    _pad_end: str = "\x03"
+
+    def __init__(self, q: int, grams: List[str], offsets: np.ndarray, positions: np.ndarray, counts: np.ndarray, lengths: np.ndarray):
+        self.q: int = q
+        self.gram_ids: Dict[str, int] = {gram: i for i, gram in enumerate(grams)}
+        # CSR postings: the positions (and occurrence counts) of gram i are at offsets[i]:offsets[i + 1]
+        self.offsets: np.ndarray = offsets
+        self.positions: np.ndarray = positions
+        self.counts: np.ndarray = counts
+        self.lengths: np.ndarray = lengths
+        self._by_length: np.ndarray = np.argsort(lengths, kind='stable')
+        self._sorted_lengths: np.ndarray = lengths[self._by_length]
+
+    @classmethod
+    def build(cls, phonetics: List[str], q: int = 2) -> "QGramIndex":
+        if q <= 0:
+            raise ValueError("q must be positive")
+
+        gram_ids: Dict[str, int] = {}
+        rows_gram: List[int] = []
+        rows_position: List[int] = []
+        rows_count: List[int] = []
+        for position, phonetic in enumerate(phonetics):
+            for gram, count in Counter(QGramIndex._grams(phonetic, q)).items():
+                rows_gram.append(gram_ids.setdefault(gram, len(gram_ids)))
+                rows_position.append(position)
+                rows_count.append(count)
+
+        rows = np.asarray(rows_gram, dtype='int64')
+        order = np.argsort(rows, kind='stable')
+        offsets = np.zeros(len(gram_ids) + 1, dtype='int64')
+        np.cumsum(np.bincount(rows, minlength=len(gram_ids)), out=offsets[1:])
+        return cls(
+            q,
+            list(gram_ids),
+            offsets,
+            np.asarray(rows_position, dtype='int32')[order],
+            np.asarray(rows_count, dtype='int32')[order],
+            np.fromiter((len(p) for p in phonetics), dtype='int32', count=len(phonetics))
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "QGramIndex":
+        with np.load(BytesIO(data)) as arrays:
+            return cls(
+                int(arrays["q"]),
+                arrays["grams"].tolist(),
+                arrays["offsets"],
+                arrays["positions"],
+                arrays["counts"],
+                arrays["lengths"]
+            )
+
+    def to_bytes(self) -> bytes:
+        buffer = BytesIO()
+        np.savez(
+            buffer,
+            q=np.int64(self.q),
+            grams=np.array(list(self.gram_ids), dtype=str),
+            offsets=self.offsets,
+            positions=self.positions,
+            counts=self.counts,
+            lengths=self.lengths
+        )
+        return buffer.getvalue()
+
+    def candidates(self, query_phonetic: str, max_distance: int) -> np.ndarray:
+        return self.filter_shared(query_phonetic, *self.shared_grams(query_phonetic), max_distance)
+
+    def shared_grams(self, query_phonetic: str) -> Tuple[np.ndarray, np.ndarray]:
+        # Positions sharing at least one padded q-gram with the query, and how many they share.
+        # Independent of the radius: computed once per query, thresholded per radius by filter_shared
+        hit_positions: List[np.ndarray] = []
+        hit_counts: List[np.ndarray] = []
+        for gram, count in Counter(QGramIndex._grams(query_phonetic, self.q)).items():
+            gram_id = self.gram_ids.get(gram)
+            if gram_id is None:
+                continue
+            start, end = self.offsets[gram_id], self.offsets[gram_id + 1]
+            hit_positions.append(self.positions[start:end])
+            hit_counts.append(np.minimum(self.counts[start:end], count))
+
+        if not hit_positions:
+            return np.empty(0, dtype='int32'), np.empty(0)
+        positions, inverse = np.unique(np.concatenate(hit_positions), return_inverse=True)
+        return positions, np.bincount(inverse, weights=np.concatenate(hit_counts))
+
+    def filter_shared(self, query_phonetic: str, positions: np.ndarray, shared: np.ndarray, max_distance: int) -> np.ndarray:
+        # Count filtering: one edit destroys at most q padded q-grams, so a string within
+        # max_distance shares at least max(m, n) + q - 1 - max_distance * q of them with the query
+        q = self.q
+        query_length = len(query_phonetic)
+        lengths = self.lengths[positions]
+        needed = np.maximum(lengths, query_length) + q - 1 - max_distance * q
+        found = [positions[(np.abs(lengths - query_length) <= max_distance) & (shared >= needed)]]
+
+        # Short strings may be within reach without sharing any q-gram; take those lengths whole
+        for length in range(max(0, query_length - max_distance), query_length + max_distance + 1):
+            if max(length, query_length) + q - 1 - max_distance * q <= 0:
+                start = np.searchsorted(self._sorted_lengths, length, side='left')
+                end = np.searchsorted(self._sorted_lengths, length, side='right')
+                found.append(self._by_length[start:end])
+        return np.unique(np.concatenate(found))
+
+    def filters(self, query_phonetic: str, max_distance: int) -> bool:
+        # False once the count filter keeps the whole length window: the radius prunes nothing more
+        return len(query_phonetic) + self.q - 1 - max_distance * self.q > 0
+
+    @staticmethod
+    def _grams(text: str, q: int) -> List[str]:
+        padded = QGramIndex._pad_start * (q - 1) + text + QGramIndex._pad_end * (q - 1)
+        return [padded[i:i + q] for i in range(len(padded) - q + 1)]
+
+
+class PhoneticIndex:
+    _sidecar_name: str = "phonetic.json"
+    _qgram_sidecar_name: str = "phonetic_qgrams.npz"
+
+    def __init__(self, ids: List[int], texts: List[str], phonetics: List[str], language_code: str):
+        if not (len(ids) == len(texts) == len(phonetics)):
+            raise ValueError("ids, texts and phonetics must have the same length")
+
+        self.ids: List[int] = ids
+        self.texts: List[str] = texts
+        self.phonetics: List[str] = phonetics
+        self.language_code: str = language_code
+        self._buckets: Optional[LengthBuckets] = None
+        self._qgrams: Optional[QGramIndex] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_workers: int = 0
+
+    @classmethod
+    def build(cls, matcher, mapping: Mapping[int, str], previous: Optional["PhoneticIndex"] = None) -> "PhoneticIndex":
+        # Transcribe each distinct text once; reuse transcriptions from a previous build
+        known: Dict[str, str] = {}
+        if previous is not None and previous.language_code == matcher.language_code:
+            known = dict(zip(previous.texts, previous.phonetics))
+
+        ids: List[int] = []
+        texts: List[str] = []
+        phonetics: List[str] = []
+        for faiss_id, text in mapping.items():
+            if text not in known:
+                known[text] = matcher.to_phonetic(text)
+            ids.append(int(faiss_id))
+            texts.append(text)
+            phonetics.append(known[text])
+        return cls(ids, texts, phonetics, matcher.language_code)
+
+    @classmethod
+    def load(cls, storage_provider: StorageProvider) -> "PhoneticIndex":
+        if not storage_provider.sidecar_exists(PhoneticIndex._sidecar_name):
+            raise FileNotFoundError("Phonetic index not found")
+
+        data = json.loads(storage_provider.load_sidecar(PhoneticIndex._sidecar_name))
+        index = cls(data["ids"], data["texts"], data["phonetics"], data["language_code"])
+        # The q-gram postings are only reused when they were built from these exact transcriptions
+        if data.get("qgrams_fingerprint") == index._fingerprint() and storage_provider.sidecar_exists(PhoneticIndex._qgram_sidecar_name):
+            index._qgrams = QGramIndex.from_bytes(storage_provider.load_sidecar(PhoneticIndex._qgram_sidecar_name))
+        return index
+
+    @staticmethod
+    def exists(storage_provider: StorageProvider) -> bool:
+        return storage_provider.sidecar_exists(PhoneticIndex._sidecar_name)
+
+    @property
+    def qgrams(self) -> QGramIndex:
+        if self._qgrams is None:
+            self._qgrams = QGramIndex.build(self.phonetics)
+        return self._qgrams
+
+    def save(self, storage_provider: StorageProvider) -> None:
+        storage_provider.save_sidecar(PhoneticIndex._qgram_sidecar_name, self.qgrams.to_bytes())
+        data = {
+            "language_code": self.language_code,
+            "ids": self.ids,
+            "texts": self.texts,
+            "phonetics": self.phonetics,
+            "qgrams_fingerprint": self._fingerprint()
+        }
+        storage_provider.save_sidecar(PhoneticIndex._sidecar_name, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+    def search(self, query_phonetic: str, k: int = 10, workers: int = 1) -> List[Tuple[int, int]]:
+        # Returns (position, distance) pairs ordered by distance, then corpus order
+        if k <= 0 or len(self.phonetics) == 0:
+            return []
+
+        if workers <= 1:
+            if self._buckets is None:
+                self._buckets = LengthBuckets(self.phonetics)
+            return self._buckets.top_k(query_phonetic, k)
+
+        executor = self._pool(workers)
+        chunk = (len(self.phonetics) + workers - 1) // workers
+        futures = [
+            executor.submit(_search_chunk, query_phonetic, k, start, min(start + chunk, len(self.phonetics)))
+            for start in range(0, len(self.phonetics), chunk)
+        ]
+        # Each chunk's result is already its exact top-k; the global top-k is the best k among them
+        return heapq.nsmallest(k, (hit for future in futures for hit in future.result()), key=lambda hit: (hit[1], hit[0]))
+
+    def search_within(self, query_phonetic: str, max_distance: int) -> List[Tuple[int, int]]:
+        # Every transcription within max_distance edits, as (position, distance) ordered like search()
+        if max_distance < 0:
+            raise ValueError("max_distance must be non-negative")
+
+        hits: List[Tuple[int, int]] = []
+        for position in self.qgrams.candidates(query_phonetic, max_distance).tolist():
+            distance = Levenshtein.distance(query_phonetic, self.phonetics[position], score_cutoff=max_distance)
+            if distance <= max_distance:
+                hits.append((distance, position))
+        return [(position, distance) for distance, position in sorted(hits)]
+
+    def search_nearest(self, query_phonetic: str, k: int = 10) -> List[Tuple[int, int]]:
+        # Widen the radius one edit at a time until k marks fall inside it; everything outside is then farther.
+        # The q-gram overlap is counted once and each candidate scored once, however many radii it takes
+        if k <= 0 or len(self.phonetics) == 0:
+            return []
+
+        qgrams = self.qgrams
+        positions, shared = qgrams.shared_grams(query_phonetic)
+        distances: Dict[int, int] = {}
+        max_distance = 0
+        while qgrams.filters(query_phonetic, max_distance):
+            for position in qgrams.filter_shared(query_phonetic, positions, shared, max_distance).tolist():
+                if position not in distances:
+                    distances[position] = Levenshtein.distance(query_phonetic, self.phonetics[position])
+            hits = sorted((distance, position) for position, distance in distances.items() if distance <= max_distance)
+            if len(hits) >= min(k, len(self.phonetics)):
+                return [(position, distance) for distance, position in hits[:k]]
+            max_distance += 1
+        # Distant queries: the filter would now admit whole length buckets, so scan them exactly instead
+        return self.search(query_phonetic, k)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _fingerprint(self) -> str:
+        return hashlib.blake2b("\n".join(self.phonetics).encode('utf-8'), digest_size=16).hexdigest()
+
+    def _pool(self, workers: int) -> ProcessPoolExecutor:
+        # Workers receive the transcriptions once, at start-up, not with every query
+        if self._executor is None or self._executor_workers != workers:
+            self.close()
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.phonetics,))
+            self._executor_workers = workers
+        return self._executor
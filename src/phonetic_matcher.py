@@ -1,24 +1,54 @@
-from typing import List, Tuple
-import epitran
+from typing import List, Optional, Tuple
+from collections import OrderedDict
+import heapq
+import threading
 import Levenshtein
+from src.phonetic_index import PhoneticIndex
+from src.metrics import metrics
 
 
 class PhoneticMatcher:
+    _cache_size = 100000
+    
     def __init__(self, language_code: str = "fra-Latn"):
+        # epitran loads its transliteration tables on import: keep it out of processes that never transcribe
+        import epitran
+        self.language_code: str = language_code
         self.epi = epitran.Epitran(language_code)
+        self._transcriptions: "OrderedDict[str, str]" = OrderedDict()
+        # The service ranks queries and rebuilds indexes on different threads; OrderedDict reordering is not atomic
+        self._transcriptions_lock = threading.Lock()
     
     def to_phonetic(self, text: str) -> str:
-        return self.epi.transliterate(text)
+        # epitran dominates ranking time; the same candidates come back query after query
+        with self._transcriptions_lock:
+            phonetic = self._transcriptions.get(text)
+            if phonetic is not None:
+                self._transcriptions.move_to_end(text)
+        if phonetic is not None:
+            metrics.inc("phonetic_transcription_cache_hits_total")
+            return phonetic
+        
+        # Transcribed outside the lock so a slow miss does not stall the other threads' hits
+        with metrics.timer("phonetic_transcription_seconds"):
+            phonetic = self.epi.transliterate(text)
+        with self._transcriptions_lock:
+            self._transcriptions[text] = phonetic
+            if len(self._transcriptions) > PhoneticMatcher._cache_size:
+                self._transcriptions.popitem(last=False)
+        return phonetic
     
     def calculate_distance(self, text1: str, text2: str) -> int:
         phonetic1 = self.to_phonetic(text1)
         phonetic2 = self.to_phonetic(text2)
         return Levenshtein.distance(phonetic1, phonetic2)
     
+    @metrics.timed("phonetic_rank_seconds")
     def rank_by_phonetic_similarity(
         self, 
         query: str, 
-        candidates: List[str]
+        candidates: List[str],
+        k: Optional[int] = None
     ) -> List[Tuple[str, int]]:
         query_phonetic = self.to_phonetic(query)
         
@@ -28,6 +58,44 @@ class PhoneticMatcher:
             distance = Levenshtein.distance(query_phonetic, candidate_phonetic)
             results.append((candidate, distance))
         
+        if k is not None:
+            return heapq.nsmallest(k, results, key=lambda x: x[1])
         results.sort(key=lambda x: x[1])
         return results
 
+    def build_index(self, mapping, previous: Optional[PhoneticIndex] = None) -> PhoneticIndex:
+        return PhoneticIndex.build(self, mapping, previous)
+    
+    @metrics.timed("phonetic_search_seconds", method="scan")
+    def search_index(
+        self,
+        query: str,
+        index: PhoneticIndex,
+        k: int = 10,
+        workers: int = 1
+    ) -> List[Tuple[int, str, int]]:
+        if index.language_code != self.language_code:
+            raise ValueError(f"Phonetic index was built for {index.language_code}, not {self.language_code}")
+        
+        hits = index.search(self.to_phonetic(query), k=k, workers=workers)
+        return [(index.ids[position], index.texts[position], distance) for position, distance in hits]
+
+    @metrics.timed("phonetic_search_seconds", method="qgram")
+    def search_similar(
+        self,
+        query: str,
+        index: PhoneticIndex,
+        k: int = 10,
+        max_distance: Optional[int] = None
+    ) -> List[Tuple[int, str, int]]:
+        # q-gram retrieval: every mark within max_distance when given, otherwise the exact top-k
+        if index.language_code != self.language_code:
+            raise ValueError(f"Phonetic index was built for {index.language_code}, not {self.language_code}")
+
+        query_phonetic = self.to_phonetic(query)
+        if max_distance is not None:
+            hits = index.search_within(query_phonetic, max_distance)
+        else:
+            hits = index.search_nearest(query_phonetic, k)
+        return [(index.ids[position], index.texts[position], distance) for position, distance in hits]
+
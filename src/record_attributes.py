@@ -0,0 +1,236 @@
+from typing import Any, List, Mapping, Optional, Sequence
+from dataclasses import dataclass
+from io import BytesIO
+import re
+import faiss
+import numpy as np
+from src.storage_provider import StorageProvider
+
+
+@dataclass(frozen=True)
+class RecordFilter:
+    # Inclusive "YYYY-MM-DD" bounds on the filing date
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    # Records covering at least one of these Nice classes (1-45)
+    classes: Optional[Sequence[int]] = None
+    statuses: Optional[Sequence[str]] = None
+
+
+class RecordAttributes:
+    _sidecar_name: str = "attributes.npz"
+    # Dates are stored as days since 1970-01-01; records without a date never match a date bound
+    _missing_date: int = np.iinfo(np.int32).min
+    _max_class: int = 63
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        dates: np.ndarray,
+        classes: np.ndarray,
+        statuses: np.ndarray,
+        status_names: List[str],
+        record_ids: Optional[np.ndarray] = None
+    ):
+        # One row per record, columnar so a filter is a few vectorized comparisons. ids are FAISS ids;
+        # when several records share a vector (deduplicated marks) their rows share it too and
+        # record_ids tells them apart
+        self.ids: np.ndarray = ids
+        self.dates: np.ndarray = dates
+        self.classes: np.ndarray = classes
+        self.statuses: np.ndarray = statuses
+        self.status_names: List[str] = status_names
+        self.record_ids: np.ndarray = ids if record_ids is None else record_ids
+
+    @classmethod
+    def from_records(
+        cls,
+        ids: Sequence[int],
+        records: Sequence[Mapping[str, Any]],
+        date_field: str = "ApplicationDate",
+        classes_field: str = "ClassNumber",
+        status_field: str = "MarkCurrentStatusCode",
+        status_names: Optional[List[str]] = None,
+        record_ids: Optional[Sequence[int]] = None
+    ) -> "RecordAttributes":
+        # ids are the FAISS ids of the records (FaissManager.to_faiss_ids, or positions for indexes without ids)
+        if len(ids) != len(records) or (record_ids is not None and len(record_ids) != len(records)):
+            raise ValueError("ids and records must have the same length")
+        status_names = list(status_names or [])
+        codes = {name: code for code, name in enumerate(status_names)}
+        statuses = np.empty(len(records), dtype=np.uint16)
+        for i, record in enumerate(records):
+            status = str(record.get(status_field) or "")
+            if status not in codes:
+                codes[status] = len(status_names)
+                status_names.append(status)
+            statuses[i] = codes[status]
+
+        return cls(
+            np.asarray(ids, dtype='int64'),
+            np.fromiter((RecordAttributes._day(record.get(date_field)) for record in records), dtype=np.int32, count=len(records)),
+            np.fromiter((RecordAttributes._class_bits(record.get(classes_field)) for record in records), dtype=np.uint64, count=len(records)),
+            statuses,
+            status_names,
+            np.asarray(record_ids, dtype='int64') if record_ids is not None else None
+        )
+
+    @classmethod
+    def concat(cls, parts: Sequence["RecordAttributes"]) -> "RecordAttributes":
+        # Parts built in sequence with status_names=previous.status_names share one growing vocabulary
+        if not parts:
+            raise ValueError("Nothing to concatenate")
+        return cls(
+            np.concatenate([part.ids for part in parts]),
+            np.concatenate([part.dates for part in parts]),
+            np.concatenate([part.classes for part in parts]),
+            np.concatenate([part.statuses for part in parts]),
+            parts[-1].status_names,
+            np.concatenate([part.record_ids for part in parts])
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RecordAttributes":
+        with np.load(BytesIO(data)) as arrays:
+            return cls(
+                arrays["ids"],
+                arrays["dates"],
+                arrays["classes"],
+                arrays["statuses"],
+                arrays["status_names"].tolist(),
+                arrays["record_ids"] if "record_ids" in arrays.files else None
+            )
+
+    def to_bytes(self) -> bytes:
+        buffer = BytesIO()
+        np.savez(
+            buffer,
+            ids=self.ids,
+            dates=self.dates,
+            classes=self.classes,
+            statuses=self.statuses,
+            status_names=np.array(self.status_names, dtype=str),
+            record_ids=self.record_ids
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def load(cls, storage_provider: StorageProvider) -> "RecordAttributes":
+        if not storage_provider.sidecar_exists(RecordAttributes._sidecar_name):
+            raise FileNotFoundError("Record attributes not found")
+        return cls.from_bytes(storage_provider.load_sidecar(RecordAttributes._sidecar_name))
+
+    @staticmethod
+    def exists(storage_provider: StorageProvider) -> bool:
+        return storage_provider.sidecar_exists(RecordAttributes._sidecar_name)
+
+    def save(self, storage_provider: StorageProvider) -> None:
+        storage_provider.save_sidecar(RecordAttributes._sidecar_name, self.to_bytes())
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def upsert(
+        self,
+        ids: Sequence[int],
+        records: Sequence[Mapping[str, Any]],
+        record_ids: Optional[Sequence[int]] = None,
+        **fields: str
+    ) -> "RecordAttributes":
+        # Daily feed: replaces the rows of re-filed records and appends new ones
+        update = RecordAttributes.from_records(ids, records, status_names=self.status_names, record_ids=record_ids, **fields)
+        return RecordAttributes.concat([self._rows(~np.isin(self.record_ids, update.record_ids)), update])
+
+    def remove(self, ids: Sequence[int]) -> "RecordAttributes":
+        # Drops every row of the given FAISS ids
+        return self._rows(~np.isin(self.ids, np.asarray(ids, dtype='int64')))
+
+    def remove_records(self, record_ids: Sequence[int]) -> "RecordAttributes":
+        return self._rows(~np.isin(self.record_ids, np.asarray(record_ids, dtype='int64')))
+
+    def _rows(self, kept: np.ndarray) -> "RecordAttributes":
+        return RecordAttributes(
+            self.ids[kept],
+            self.dates[kept],
+            self.classes[kept],
+            self.statuses[kept],
+            self.status_names,
+            self.record_ids[kept]
+        )
+
+    def mask(self, where: RecordFilter) -> np.ndarray:
+        matches = np.ones(len(self.ids), dtype=bool)
+        if where.date_from is not None:
+            matches &= self.dates >= RecordAttributes._day(where.date_from, strict=True)
+        if where.date_to is not None:
+            # The missing-date sentinel is below every real date: exclude it explicitly
+            matches &= (self.dates <= RecordAttributes._day(where.date_to, strict=True)) & (self.dates != RecordAttributes._missing_date)
+        if where.classes is not None:
+            wanted = RecordAttributes._class_bits(list(where.classes), strict=True)
+            matches &= (self.classes & np.uint64(wanted)) != 0
+        if where.statuses is not None:
+            codes = [code for code, name in enumerate(self.status_names) if name in set(where.statuses)]
+            matches &= np.isin(self.statuses, codes)
+        return matches
+
+    def matching_ids(self, where: RecordFilter) -> np.ndarray:
+        # A shared vector matches when any of its records does
+        return np.unique(self.ids[self.mask(where)])
+
+    def selector(self, where: RecordFilter) -> faiss.IDSelector:
+        return self.id_selector(self.matching_ids(where))
+
+    def id_selector(self, ids: np.ndarray) -> faiss.IDSelector:
+        # Evaluated by FAISS for every candidate during the scan, so filtered queries keep full
+        # recall without over-fetching. Dense ids (positions, small ApplicationNumbers) get a
+        # bitmap with O(1) lookups; sparse hashed ids a hash set. Ids without an attribute row
+        # (vectors added after the table was built) are never in ids, so they never match
+        if len(ids) == 0:
+            return faiss.IDSelectorRange(0, 0)
+        bound = int(self.ids.max()) + 1
+        if bound <= 64 * len(self.ids):
+            bits = np.zeros(bound, dtype=bool)
+            bits[ids] = True
+            bitmap = np.packbits(bits, bitorder='little')
+            # n is the bitmap size in bytes: ids past it are rejected instead of read out of bounds
+            selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+            # The selector only points at the bitmap: keep it alive with the selector
+            selector.referenced_objects = [bitmap]
+            return selector
+        return faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(np.ascontiguousarray(ids)))
+
+    @staticmethod
+    def _day(value: Any, strict: bool = False) -> int:
+        # "2021-03-15", "2021-03-15T00:00:00" and "20210315" are accepted
+        text = str(value or "").strip()
+        if re.fullmatch(r"\d{8}", text):
+            text = f"{text[:4]}-{text[4:6]}-{text[6:]}"
+        try:
+            day = np.datetime64(text[:10], 'D')
+        except ValueError:
+            day = np.datetime64('NaT')
+        if np.isnat(day):
+            if strict:
+                raise ValueError(f"Invalid date {value!r}, expected YYYY-MM-DD")
+            return RecordAttributes._missing_date
+        return int(day.astype(np.int64))
+
+    @staticmethod
+    def _class_bits(value: Any, strict: bool = False) -> int:
+        # Nice classes as a list, a "9, 35, 42" string or a list of {"ClassNumber": ...} records
+        if value is None:
+            return 0
+        if isinstance(value, Mapping):
+            return RecordAttributes._class_bits(value.get("ClassNumber"), strict)
+        if isinstance(value, (list, tuple)):
+            bits = 0
+            for item in value:
+                bits |= RecordAttributes._class_bits(item, strict)
+            return bits
+        bits = 0
+        for number in map(int, re.findall(r"\d+", str(value))):
+            if 1 <= number <= RecordAttributes._max_class:
+                bits |= 1 << number
+            elif strict:
+                raise ValueError(f"Invalid class {number}, expected 1-{RecordAttributes._max_class}")
+        return bits
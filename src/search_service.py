@@ -0,0 +1,330 @@
+from typing import Any, Callable, FrozenSet, List, Optional, Sequence, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from urllib.parse import urlsplit
+import asyncio
+import hmac
+import time
+import requests
+from aiohttp import web
+from PIL import Image
+from src.faiss_manager import FaissManager
+from src.storage_provider import StorageProvider
+from src.embedding_cache import EmbeddingCache
+from src.embedder import Embedder
+from src.image_embedder import ImageEmbedder
+from src.image_pipeline import HttpFetcher
+from src.phonetic_index import PhoneticIndex
+from src.phonetic_matcher import PhoneticMatcher
+from src.metrics import metrics
+
+
+class MicroBatcher:
+    def __init__(self, process: Callable[[List[Any]], List[Any]], max_batch: int = 64, max_wait: float = 0.005):
+        # Requests arriving within max_wait seconds (or while the previous batch is still running)
+        # are handed to process() together; one worker thread keeps models single-threaded
+        self.process = process
+        self.max_batch: int = max_batch
+        self.max_wait: float = max_wait
+        self.batches: int = 0
+        self.items: int = 0
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The event loop only keeps weak references to tasks: running batches are held here until done
+        self._tasks: Set[asyncio.Task] = set()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    async def shutdown(self) -> None:
+        # Queued requests are cancelled, not flushed; running batches are cancelled and awaited
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        for _, future in batch:
+            future.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, self.process, [item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Expected {len(batch)} results, got {len(results)}")
+        except asyncio.CancelledError:
+            # Requests must not wait forever on a batch that will never answer
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+@dataclass
+class ServiceState:
+    text: Optional[FaissManager] = None
+    image: Optional[FaissManager] = None
+    phonetic_index: Optional[PhoneticIndex] = None
+    loaded_at: float = 0.0
+
+
+class SearchService:
+    def __init__(
+        self,
+        text_storage: Optional[StorageProvider] = None,
+        image_storage: Optional[StorageProvider] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        embedder: Optional[Embedder] = None,
+        image_embedder: Optional[ImageEmbedder] = None,
+        phonetic_matcher: Optional[PhoneticMatcher] = None,
+        mmap: bool = True,
+        max_batch: int = 64,
+        max_wait_ms: float = 5.0,
+        max_k: int = 100,
+        url_hosts: Sequence[str] = (),
+        max_phonetic_distance: int = 4,
+        admin_token: Optional[str] = None
+    ):
+        self.text_storage: Optional[StorageProvider] = text_storage
+        self.image_storage: Optional[StorageProvider] = image_storage
+        self.embedding_cache: Optional[EmbeddingCache] = embedding_cache
+        self.embedder: Optional[Embedder] = embedder
+        # Models are loaded once and survive index reloads
+        self.image_embedder: Optional[ImageEmbedder] = image_embedder
+        self.phonetic_matcher: Optional[PhoneticMatcher] = phonetic_matcher
+        self.mmap: bool = mmap
+        self.max_k: int = max_k
+        # q-gram retrieval scans every length within the radius: keep one request from pinning the worker
+        self.max_phonetic_distance: int = max_phonetic_distance
+        # Bearer token for the /admin routes; without one they only answer loopback clients
+        self.admin_token: Optional[str] = admin_token
+        self.state: ServiceState = ServiceState()
+        # Hosts that /search/image may download {"url": ...} queries from. None by default: the server
+        # would otherwise fetch any address a client names, internal services included
+        self.url_hosts: FrozenSet[str] = frozenset(host.lower() for host in url_hosts)
+        # A redirect could leave the allowed hosts
+        self.fetcher = HttpFetcher(concurrency=4, follow_redirects=False)
+
+        max_wait = max_wait_ms / 1000.0
+        self.text_batcher = MicroBatcher(self._search_texts, max_batch, max_wait)
+        self.image_batcher = MicroBatcher(self._search_images, max_batch, max_wait)
+        # Phonetic queries do not batch; one thread keeps their CPU-bound ranking off the default pool
+        self._phonetic_executor = ThreadPoolExecutor(max_workers=1)
+        self._reload_lock = asyncio.Lock()
+
+    def load(self) -> ServiceState:
+        # Builds a complete new state; in-flight batches keep using the one they started with
+        state = ServiceState(loaded_at=time.time())
+        if self.text_storage is not None:
+            state.text = FaissManager(self.text_storage, embedding_cache=self.embedding_cache, embedder=self.embedder)
+            state.text.load(mmap=self.mmap)
+            if self.phonetic_matcher is not None:
+                if PhoneticIndex.exists(self.text_storage):
+                    state.phonetic_index = PhoneticIndex.load(self.text_storage)
+                else:
+                    state.phonetic_index = self.phonetic_matcher.build_index(state.text.mapping)
+        if self.image_storage is not None:
+            state.image = FaissManager(self.image_storage, embedding_cache=self.embedding_cache)
+            state.image.load(mmap=self.mmap)
+        self.state = state
+        return state
+
+    async def reload(self) -> ServiceState:
+        async with self._reload_lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.load)
+
+    def close(self) -> None:
+        self.text_batcher.close()
+        self.image_batcher.close()
+        self._phonetic_executor.shutdown()
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._errors])
+        app.add_routes([
+            web.get("/health", self._health),
+            web.get("/metrics", self._metrics),
+            web.get("/metrics.json", self._metrics_json),
+            web.post("/search/text", self._text_endpoint),
+            web.post("/search/image", self._image_endpoint),
+            web.post("/search/phonetic", self._phonetic_endpoint),
+            web.post("/admin/reload", self._reload_endpoint),
+        ])
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+    async def _cleanup(self, app: web.Application) -> None:
+        await asyncio.gather(self.text_batcher.shutdown(), self.image_batcher.shutdown())
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def _search_texts(self, items: List[Tuple[str, int]]) -> List[List[dict]]:
+        manager = self.state.text
+        if manager is None:
+            raise LookupError("No text index loaded")
+        embeddings = manager.embed_queries([query for query, _ in items])
+        return SearchService._split(manager, manager.search_batch(embeddings, max(k for _, k in items)), items)
+
+    def _search_images(self, items: List[Tuple[Image.Image, int]]) -> List[List[dict]]:
+        manager = self.state.image
+        if manager is None or self.image_embedder is None:
+            raise LookupError("No image index loaded")
+        embeddings = self.image_embedder.embed_images([image for image, _ in items])
+        return SearchService._split(manager, manager.search_batch(embeddings, max(k for _, k in items)), items)
+
+    @staticmethod
+    def _split(manager: FaissManager, result, items: List[Tuple[Any, int]]) -> List[List[dict]]:
+        # One batched FAISS call at the largest k; each request gets back its own top-k
+        responses = []
+        for row, (_, k) in enumerate(items):
+            hits = []
+            for faiss_id, payload, value in zip(result.ids[row][:k], result.payloads[row][:k], result.distances[row][:k]):
+                if faiss_id >= 0 and payload is not None:
+                    hits.append({"id": int(faiss_id), "text": payload, "score": float(value)})
+            responses.append(hits)
+        return responses
+
+    def _k(self, value: Any) -> int:
+        k = int(value if value is not None else 10)
+        if not 1 <= k <= self.max_k:
+            raise ValueError(f"k must be between 1 and {self.max_k}")
+        return k
+
+    def _check_admin(self, request: web.Request) -> None:
+        if self.admin_token is None:
+            if request.remote not in ("127.0.0.1", "::1"):
+                raise web.HTTPForbidden(text="Admin routes are local-only unless an admin token is configured")
+            return
+        # Constant-time comparison: the token must not leak through response timing
+        if not hmac.compare_digest(request.headers.get("Authorization", "").encode('utf-8'), f"Bearer {self.admin_token}".encode('utf-8')):
+            raise web.HTTPUnauthorized(text="Invalid or missing admin token")
+
+    def _max_distance(self, value: Any) -> Optional[int]:
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= self.max_phonetic_distance:
+            raise ValueError(f"max_distance must be an integer between 0 and {self.max_phonetic_distance}")
+        return value
+
+    def _check_url(self, url: Any) -> str:
+        if not self.url_hosts:
+            raise ValueError("Image URLs are disabled on this server; send the image bytes instead")
+        if not isinstance(url, str):
+            raise ValueError("url must be a string")
+        parsed = urlsplit(url)
+        if parsed.scheme not in ("http", "https") or (parsed.hostname or "") not in self.url_hosts:
+            raise ValueError(f"Image URLs must be http(s) on one of: {', '.join(sorted(self.url_hosts))}")
+        return url
+
+    @web.middleware
+    async def _errors(self, request: web.Request, handler):
+        try:
+            return await handler(request)
+        except requests.RequestException as e:
+            # The image URL could not be fetched: the upstream host failed, not this server
+            return web.json_response({"error": f"Cannot fetch image: {e}"}, status=502)
+        except (ValueError, KeyError, TypeError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        except LookupError as e:
+            return web.json_response({"error": str(e)}, status=503)
+
+    async def _health(self, request: web.Request) -> web.Response:
+        state = self.state
+        return web.json_response({
+            "status": "ok" if state.loaded_at else "loading",
+            "loaded_at": state.loaded_at,
+            "text_vectors": state.text.index.ntotal if state.text is not None else None,
+            "image_vectors": state.image.index.ntotal if state.image is not None else None,
+            "phonetic_marks": len(state.phonetic_index.ids) if state.phonetic_index is not None else None,
+            "text_batches": {"batches": self.text_batcher.batches, "items": self.text_batcher.items},
+            "image_batches": {"batches": self.image_batcher.batches, "items": self.image_batcher.items},
+        })
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(body=metrics.to_prometheus().encode('utf-8'), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    async def _metrics_json(self, request: web.Request) -> web.Response:
+        return web.json_response(metrics.to_json())
+
+    async def _text_endpoint(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        k = self._k(body.get("k"))
+        query = body["query"]
+        if not isinstance(query, str) or not query:
+            raise ValueError("query must be a non-empty string")
+        hits = await self.text_batcher.submit((query, k))
+        return web.json_response({"query": query, "metric": self.state.text.config.metric, "results": hits})
+
+    async def _image_endpoint(self, request: web.Request) -> web.Response:
+        # Raw image bytes in the body, or JSON {"url": ..., "k": ...}
+        k = self._k(request.query.get("k"))
+        loop = asyncio.get_running_loop()
+        if request.content_type == "application/json":
+            body = await request.json()
+            k = self._k(body.get("k", k))
+            data = await loop.run_in_executor(None, self.fetcher.fetch, self._check_url(body["url"]))
+        else:
+            data = await request.read()
+        try:
+            image = await loop.run_in_executor(None, lambda: Image.open(BytesIO(data)).convert('RGB'))
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ValueError(f"Cannot decode image: {e}") from e
+        hits = await self.image_batcher.submit((image, k))
+        return web.json_response({"metric": self.state.image.config.metric, "results": hits})
+
+    async def _phonetic_endpoint(self, request: web.Request) -> web.Response:
+        state = self.state
+        if state.phonetic_index is None or self.phonetic_matcher is None:
+            raise LookupError("No phonetic index loaded")
+        body = await request.json()
+        k = self._k(body.get("k"))
+        query = body["query"]
+        if not isinstance(query, str) or not query:
+            raise ValueError("query must be a non-empty string")
+        max_distance = self._max_distance(body.get("max_distance"))
+        loop = asyncio.get_running_loop()
+        matches = await loop.run_in_executor(
+            self._phonetic_executor,
+            lambda: self.phonetic_matcher.search_similar(query, state.phonetic_index, k=k, max_distance=max_distance)
+        )
+        results = [{"id": faiss_id, "text": text, "distance": distance} for faiss_id, text, distance in matches]
+        return web.json_response({"query": query, "results": results})
+
+    async def _reload_endpoint(self, request: web.Request) -> web.Response:
+        self._check_admin(request)
+        state = await self.reload()
+        return web.json_response({"status": "reloaded", "loaded_at": state.loaded_at})
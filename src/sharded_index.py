@@ -0,0 +1,285 @@
+from typing import Any, List, Optional, Sequence, Tuple, Union
+from multiprocessing.connection import Client, Connection, Listener
+import multiprocessing
+import os
+import threading
+import numpy as np
+from src.faiss_manager import BatchSearchResult, FaissManager
+from src.index_builder import IndexBuilder
+from src.storage_provider import FileSystemStorageProvider, StorageProvider
+from src.index_config import IndexConfig
+from src.embedding_cache import EmbeddingCache
+from src.embedder import Embedder, GeminiEmbedder
+
+# "/tmp/shard0.sock" for a Unix socket on this machine, ("10.0.0.5", 7000) for TCP
+Address = Union[str, Tuple[str, int]]
+
+
+def check_authkey(address: Address, authkey: Optional[bytes]) -> None:
+    # Connections unpickle every message: anyone who can reach an unauthenticated TCP port can run code
+    if authkey is None and isinstance(address, tuple):
+        raise ValueError(f"TCP shard address {address} requires an authkey")
+
+
+def shard_storages(index_path: str, mapping_path: str, shards: int) -> List[FileSystemStorageProvider]:
+    # data/marques_index.faiss -> data/marques_index.shard0-of-4.faiss, ...
+    def shard_path(path: str, shard: int) -> str:
+        root, extension = os.path.splitext(path)
+        return f"{root}.shard{shard}-of-{shards}{extension}"
+    return [FileSystemStorageProvider(shard_path(index_path, i), shard_path(mapping_path, i)) for i in range(shards)]
+
+
+def partition(ids: Sequence[Union[int, str]], shards: int, mode: str = "hash") -> List[List[int]]:
+    # Positions of the records each shard holds. "hash" spreads records by FAISS id, so a record
+    # always lands on the same shard; "range" keeps contiguous slices of the input order
+    if shards < 1:
+        raise ValueError("shards must be >= 1")
+    if mode == "hash":
+        assignment = FaissManager.to_faiss_ids(ids) % shards
+        return [np.flatnonzero(assignment == shard).tolist() for shard in range(shards)]
+    if mode == "range":
+        bounds = np.linspace(0, len(ids), shards + 1).astype(int)
+        return [list(range(bounds[shard], bounds[shard + 1])) for shard in range(shards)]
+    raise ValueError(f"Unknown partition mode {mode!r}, expected 'hash' or 'range'")
+
+
+def build_shards(
+    texts: List[str],
+    ids: Sequence[Union[int, str]],
+    storages: Sequence[StorageProvider],
+    index_config: Union[str, IndexConfig, None] = None,
+    mode: str = "hash",
+    embedding_cache: Optional[EmbeddingCache] = None,
+    embedder: Optional[Embedder] = None,
+    **builder_options: Any
+) -> None:
+    # builder_options go to IndexBuilder (concurrency, requests_per_minute, ...)
+    for storage, positions in zip(storages, partition(ids, len(storages), mode)):
+        if not positions:
+            raise ValueError(f"Too few records for {len(storages)} shards")
+        faiss_manager = FaissManager(storage_provider=storage, embedding_cache=embedding_cache, embedder=embedder)
+        IndexBuilder(faiss_manager, embedder=embedder, **builder_options).build_index_streaming(
+            [texts[i] for i in positions],
+            index_config=index_config,
+            ids=[ids[i] for i in positions]
+        )
+
+
+def merge_results(results: Sequence[BatchSearchResult], k: int, higher_is_better: bool) -> BatchSearchResult:
+    # Each shard returns its own top-k; the global top-k is among their union. Empty slots
+    # (id -1) carry the worst possible value and sort last
+    distances = np.hstack([result.distances for result in results])
+    ids = np.hstack([result.ids for result in results])
+    payloads = np.hstack([result.payloads for result in results])
+    order = np.argsort(-distances if higher_is_better else distances, axis=1, kind="stable")[:, :k]
+    return BatchSearchResult(
+        np.take_along_axis(distances, order, axis=1),
+        np.take_along_axis(ids, order, axis=1),
+        np.take_along_axis(payloads, order, axis=1)
+    )
+
+
+def serve_shard(
+    storage_provider: StorageProvider,
+    address: Address,
+    authkey: Optional[bytes] = None,
+    mmap: bool = True,
+    ready: Optional[Connection] = None
+) -> None:
+    # Worker process: owns one shard and answers search requests until told to stop
+    try:
+        check_authkey(address, authkey)
+        faiss_manager = FaissManager(storage_provider=storage_provider)
+        faiss_manager.load(mmap=mmap)
+        listener = Listener(address, authkey=authkey)
+    except Exception as e:
+        if ready is not None:
+            ready.send(e)
+        raise
+    if ready is not None:
+        ready.send(True)
+        ready.close()
+
+    state = {"manager": faiss_manager}
+    stopped = threading.Event()
+
+    def handle(connection: Connection) -> None:
+        with connection:
+            while not stopped.is_set():
+                try:
+                    command, *args = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", execute(command, args))
+                except Exception as e:
+                    reply = ("error", e)
+                connection.send(reply)
+                if command == "stop":
+                    stopped.set()
+                    # Unblock accept() so the main loop notices
+                    try:
+                        Client(address, authkey=authkey).close()
+                    except OSError:
+                        pass
+
+    def execute(command: str, args: List[Any]) -> Any:
+        manager = state["manager"]
+        if command == "search":
+            embeddings, k, nprobe, ef_search = args
+            return tuple(manager.search_batch(embeddings, k, nprobe=nprobe, ef_search=ef_search))
+        if command == "info":
+            return {
+                "index": manager.config.to_dict(),
+                "embedder": manager._index_embedder,
+                "dimension": manager.index.d,
+                "ntotal": manager.index.ntotal,
+                "pid": os.getpid()
+            }
+        if command == "reload":
+            # Load aside and swap: searches in flight keep the old index
+            reloaded = FaissManager(storage_provider=storage_provider)
+            reloaded.load(mmap=mmap)
+            state["manager"] = reloaded
+            return reloaded.index.ntotal
+        if command == "stop":
+            return None
+        raise ValueError(f"Unknown command {command!r}")
+
+    # One thread per coordinator connection; FAISS releases the GIL while searching
+    with listener:
+        while not stopped.is_set():
+            try:
+                connection = listener.accept()
+            except OSError:
+                continue
+            threading.Thread(target=handle, args=(connection,), daemon=True).start()
+
+
+def start_shards(
+    storages: Sequence[StorageProvider],
+    addresses: Sequence[Address],
+    authkey: Optional[bytes] = None,
+    mmap: bool = True,
+    timeout: float = 300
+) -> List[multiprocessing.Process]:
+    for address in addresses:
+        check_authkey(address, authkey)
+    # Spawned (not forked) workers: OpenMP state does not survive fork
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    waiting = []
+    for storage, address in zip(storages, addresses):
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=serve_shard, args=(storage, address, authkey, mmap, sender), daemon=True)
+        process.start()
+        sender.close()
+        processes.append(process)
+        waiting.append(receiver)
+
+    try:
+        for address, receiver in zip(addresses, waiting):
+            if not receiver.poll(timeout):
+                raise TimeoutError(f"Shard at {address} did not start within {timeout}s")
+            status = receiver.recv()
+            if status is not True:
+                raise RuntimeError(f"Shard at {address} failed to start: {status!r}")
+    except BaseException:
+        # No half-started cluster: the shards that did come up would hold their sockets forever
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        raise
+    finally:
+        for receiver in waiting:
+            receiver.close()
+    return processes
+
+
+class ShardedSearcher:
+    def __init__(
+        self,
+        addresses: Sequence[Address],
+        authkey: Optional[bytes] = None,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        embedder: Optional[Embedder] = None
+    ):
+        # Coordinator: embeds each query batch once, scatters it to every shard and merges the top-k
+        self.addresses: List[Address] = list(addresses)
+        for address in self.addresses:
+            check_authkey(address, authkey)
+        self.connections: List[Connection] = [Client(address, authkey=authkey) for address in self.addresses]
+        self.embedding_cache: Optional[EmbeddingCache] = embedding_cache
+        self.embedder: Optional[Embedder] = embedder
+        # Connections carry one request at a time
+        self._lock = threading.Lock()
+
+        self.shard_info: List[dict] = self._broadcast("info")
+        self.config: IndexConfig = IndexConfig.from_dict(self.shard_info[0]["index"])
+        for info in self.shard_info[1:]:
+            if info["dimension"] != self.dimension or IndexConfig.from_dict(info["index"]).metric != self.config.metric:
+                raise ValueError("Shards disagree on dimension or metric")
+        self._check_embedder()
+
+    @property
+    def dimension(self) -> int:
+        return self.shard_info[0]["dimension"]
+
+    @property
+    def ntotal(self) -> int:
+        return sum(info["ntotal"] for info in self.shard_info)
+
+    def search(self, query: str, k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> List[Tuple[str, float]]:
+        return self.search_texts([query], k, nprobe=nprobe, ef_search=ef_search).to_tuples(0)
+
+    def search_texts(self, queries: List[str], k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> BatchSearchResult:
+        return self.search_batch(self.embed_queries(queries), k, nprobe=nprobe, ef_search=ef_search)
+
+    def search_batch(self, embeddings: np.ndarray, k: int = 5, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> BatchSearchResult:
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+        results = self._broadcast("search", embeddings, k, nprobe, ef_search)
+        return merge_results([BatchSearchResult(*result) for result in results], k, self.config.higher_is_better)
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        return FaissManager.embed_query_texts(self.text_embedder(), queries, self.dimension, self.embedding_cache)
+
+    def text_embedder(self) -> Embedder:
+        if self.embedder is None:
+            self.embedder = GeminiEmbedder(output_dimensionality=self.config.output_dimensionality)
+            self._check_embedder()
+        return self.embedder
+
+    def reload(self) -> int:
+        self._broadcast("reload")
+        self.shard_info = self._broadcast("info")
+        return self.ntotal
+
+    def stop(self) -> None:
+        self._broadcast("stop")
+        self.close()
+
+    def close(self) -> None:
+        for connection in self.connections:
+            connection.close()
+
+    def _broadcast(self, command: str, *args: Any) -> List[Any]:
+        # Scatter to every shard before reading any reply, so shards work in parallel
+        with self._lock:
+            for connection in self.connections:
+                connection.send((command, *args))
+            replies = [connection.recv() for connection in self.connections]
+        for status, value in replies:
+            if status == "error":
+                raise value
+        return [value for _, value in replies]
+
+    def _check_embedder(self) -> None:
+        if self.embedder is None:
+            return
+        for address, info in zip(self.addresses, self.shard_info):
+            expected = info["embedder"]
+            if expected is not None and expected.get("model_id") != self.embedder.model_id:
+                raise ValueError(f"Shard {address} was built with embedder {expected.get('model_id')}, not {self.embedder.model_id}")
+        if self.dimension != self.embedder.dimension:
+            raise ValueError(f"Index dimension {self.dimension} does not match embedder {self.embedder.model_id}")
@@ -0,0 +1,81 @@
+from typing import List, NamedTuple, Tuple
+import numpy as np
+
+
+class SimilarityGraph(NamedTuple):
+    # CSR adjacency over the vectors of an index: the neighbors of node i are
+    # indices[indptr[i]:indptr[i + 1]] (node positions, not FAISS ids) with matching distances.
+    # Same layout as scipy.sparse.csr_matrix((distances, indices, indptr)) if scipy is around
+    ids: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
+    distances: np.ndarray
+    # Squared L2 distances for "l2" indexes; inner-product / cosine scores otherwise
+    higher_is_better: bool
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    def neighbors(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        # FAISS ids and distances of one node's neighbors
+        start, end = self.indptr[node], self.indptr[node + 1]
+        return self.ids[self.indices[start:end]], self.distances[start:end]
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Each undirected edge once, as (FAISS id, FAISS id, distance) columns
+        sources = self._sources()
+        kept = sources < self.indices
+        # An edge seen from one side only (k-NN graphs are not symmetric) is kept from that side
+        reverse = np.isin(sources * len(self.ids) + self.indices, self.indices * len(self.ids) + sources)
+        kept |= (sources > self.indices) & ~reverse
+        return self.ids[sources[kept]], self.ids[self.indices[kept]], self.distances[kept]
+
+    def within(self, threshold: float) -> "SimilarityGraph":
+        # Drops the edges further than threshold (below it for scores)
+        kept = self.distances >= threshold if self.higher_is_better else self.distances <= threshold
+        counts = np.bincount(self._sources()[kept], minlength=len(self.ids))
+        indptr = np.concatenate([[0], np.cumsum(counts)]).astype('int64')
+        return SimilarityGraph(self.ids, indptr, self.indices[kept], self.distances[kept], self.higher_is_better)
+
+    def components(self) -> np.ndarray:
+        # Connected-component label of every node (0..n_components-1), edges taken as undirected
+        sources = self._sources()
+        return connected_components(len(self.ids), sources, self.indices)
+
+    def clusters(self, min_size: int = 2) -> List[np.ndarray]:
+        # FAISS ids of each group of near-duplicates, largest first; singletons are dropped by default
+        labels = self.components()
+        order = np.argsort(labels, kind='stable')
+        bounds = np.flatnonzero(np.diff(labels[order])) + 1
+        groups = [self.ids[group] for group in np.split(order, bounds) if len(group) >= min_size]
+        groups.sort(key=len, reverse=True)
+        return groups
+
+    def _sources(self) -> np.ndarray:
+        # Node of every edge, expanded from indptr
+        return np.repeat(np.arange(len(self.ids), dtype='int64'), np.diff(self.indptr))
+
+
+def connected_components(n: int, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    # Vectorized union-find: every round hooks the larger root of each edge under the smaller one,
+    # then compresses paths until each node points at its root. A pure-Python union-find would do
+    # one interpreter step per edge; this does a few numpy passes per round, and rounds shrink fast
+    labels = np.arange(n, dtype='int64')
+    sources = np.asarray(sources, dtype='int64')
+    targets = np.asarray(targets, dtype='int64')
+    while len(sources):
+        low = np.minimum(labels[sources], labels[targets])
+        high = np.maximum(labels[sources], labels[targets])
+        merging = low != high
+        if not merging.any():
+            break
+        np.minimum.at(labels, high[merging], low[merging])
+        while True:
+            parents = labels[labels]
+            if np.array_equal(parents, labels):
+                break
+            labels = parents
+        # Edges already inside one component cannot merge anything again
+        sources, targets = sources[merging], targets[merging]
+    return np.unique(labels, return_inverse=True)[1].reshape(-1)
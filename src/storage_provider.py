@@ -1,6 +1,7 @@
-from typing import Protocol, Dict
+from typing import Protocol, Mapping, Optional
 import json
 import os
+from src.mapping_store import MappingStore, is_mapping_store_path
 
 class StorageProvider(Protocol):
     def save_index(self, index_data: bytes) -> None:
@@ -9,11 +10,14 @@ class StorageProvider(Protocol):
     def load_index(self) -> bytes:
         """Load FAISS index binary data"""
     
-    def save_mapping(self, mapping: Dict[int, str]) -> None:
+    def index_local_path(self) -> Optional[str]:
+        """Local file path of the index if the backend supports path-based (mmap) loading, else None"""
+    
+    def save_mapping(self, mapping: Mapping[int, str]) -> None:
         """Save mapping dictionary"""
     
-    def load_mapping(self) -> Dict[int, str]:
-        """Load mapping dictionary"""
+    def load_mapping(self) -> Mapping[int, str]:
+        """Load mapping dictionary (may be a lazy, read-only MappingStore)"""
     
     def index_exists(self) -> bool:
         """Check if index exists"""
@@ -23,6 +27,18 @@ class StorageProvider(Protocol):
     
     def load_data(self, file_path: str) -> list:
         """Load JSON data from file"""
+    
+    def save_sidecar(self, name: str, data: bytes) -> None:
+        """Save auxiliary data stored next to the index (metadata, checkpoints, ...)"""
+    
+    def load_sidecar(self, name: str) -> bytes:
+        """Load auxiliary data stored next to the index"""
+    
+    def sidecar_exists(self, name: str) -> bool:
+        """Check if auxiliary data exists"""
+    
+    def delete_sidecar(self, name: str) -> None:
+        """Delete auxiliary data if it exists"""
 
 class FileSystemStorageProvider:
     def __init__(self, index_path: str, mapping_path: str):
@@ -30,20 +46,31 @@ class FileSystemStorageProvider:
         self.mapping_path: str = mapping_path
     
     def save_index(self, index_data: bytes) -> None:
-        with open(self.index_path, 'wb') as f:
+        # Write aside and swap in: truncating a file other processes have mmapped would crash them
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'wb') as f:
             f.write(index_data)
+        os.replace(tmp_path, self.index_path)
     
     def load_index(self) -> bytes:
         with open(self.index_path, 'rb') as f:
             return f.read()
     
-    def save_mapping(self, mapping: Dict[int, str]) -> None:
+    def index_local_path(self) -> Optional[str]:
+        return self.index_path
+    
+    def save_mapping(self, mapping: Mapping[int, str]) -> None:
+        if is_mapping_store_path(self.mapping_path):
+            MappingStore.write(self.mapping_path, mapping)
+            return
         with open(self.mapping_path, 'w') as f:
-            json.dump(mapping, f, indent=2)
+            json.dump(dict(mapping), f, indent=2)
     
-    def load_mapping(self) -> Dict[int, str]:
+    def load_mapping(self) -> Mapping[int, str]:
         if not os.path.exists(self.mapping_path):
             raise FileNotFoundError(f"Mapping file not found: {self.mapping_path}")
+        if is_mapping_store_path(self.mapping_path):
+            return MappingStore.open(self.mapping_path)
         with open(self.mapping_path, 'r') as f:
             loaded_mapping = json.load(f)
             return {int(k): v for k, v in loaded_mapping.items()}
@@ -57,3 +84,29 @@ class FileSystemStorageProvider:
     def load_data(self, file_path: str) -> list:
         with open(file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
+
+    def save_sidecar(self, name: str, data: bytes) -> None:
+        # Atomic replace so a crash mid-write never leaves a torn checkpoint behind
+        path = self._sidecar_path(name)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+    
+    def load_sidecar(self, name: str) -> bytes:
+        path = self._sidecar_path(name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Sidecar file not found: {path}")
+        with open(path, 'rb') as f:
+            return f.read()
+    
+    def sidecar_exists(self, name: str) -> bool:
+        return os.path.exists(self._sidecar_path(name))
+    
+    def delete_sidecar(self, name: str) -> None:
+        path = self._sidecar_path(name)
+        if os.path.exists(path):
+            os.remove(path)
+    
+    def _sidecar_path(self, name: str) -> str:
+        # data/marques_index.faiss + "meta.json" -> data/marques_index.meta.json
+        return f"{os.path.splitext(self.index_path)[0]}.{name}"
@@ -0,0 +1,70 @@
+import pytest
+from src.embedder import FakeEmbedder
+from src.faiss_manager import FaissManager
+from src.index_config import IndexConfig
+from src.storage_provider import FileSystemStorageProvider
+
+embedder = FakeEmbedder(32)
+texts = [f"mark {i}" for i in range(2000)]
+ids = [f"FR{i}" for i in range(2000)]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return FileSystemStorageProvider(str(tmp_path / "index.faiss"), str(tmp_path / "mapping.json"))
+
+
+@pytest.fixture
+def ivf(storage):
+    # Every list probed: results are exact, so they can be asserted on
+    faiss_manager = FaissManager(storage, embedder=embedder)
+    faiss_manager.create_index(embedder.dimension, IndexConfig(factory="IVF16,Flat", nprobe=16, id_map=True))
+    vectors = embedder.embed(texts)
+    faiss_manager.train(vectors)
+    faiss_manager.add_vectors(vectors, texts, ids=ids)
+    return faiss_manager
+
+
+def test_ivf_upsert_replaces_vectors_and_payloads(ivf):
+    ivf.upsert(["FR3", "FR4", "FR-new"], embedder.embed(["Selego", "Selecto", "Brand New"]), ["Selego", "Selecto", "Brand New"])
+
+    assert ivf.index.ntotal == len(texts) + 1
+    assert ivf.search("Selego", k=1) == [("Selego", pytest.approx(0.0, abs=1e-5))]
+    assert ivf.search("Brand New", k=1)[0][0] == "Brand New"
+    assert all(text != "mark 3" for text, _ in ivf.search("mark 3", k=5))
+    assert ivf.lookup(FaissManager.to_faiss_ids(["FR4"])).tolist() == ["Selecto"]
+
+
+def test_ivf_remove_drops_vectors_and_payloads(ivf):
+    removed = ivf.remove(["FR10", "FR11", "FR-unknown"])
+
+    assert removed == 2
+    assert ivf.index.ntotal == len(texts) - 2
+    assert "mark 10" not in [text for text, _ in ivf.search("mark 10", k=10)]
+    assert ivf.lookup(FaissManager.to_faiss_ids(["FR10", "FR12"])).tolist() == [None, "mark 12"]
+
+
+def test_ivf_updates_after_reload(ivf, storage):
+    ivf.save()
+    reloaded = FaissManager(storage, embedder=embedder)
+    reloaded.load()
+
+    assert reloaded.remove(["FR0"]) == 1
+    reloaded.upsert(["FR1"], embedder.embed(["Selego"]), ["Selego"])
+    _, vectors = reloaded.reconstruct_all()
+    assert len(vectors) == len(texts) - 1
+    assert reloaded.search("Selego", k=1)[0][0] == "Selego"
+
+
+def test_upserts_require_unique_ids(ivf):
+    with pytest.raises(ValueError, match="unique"):
+        ivf.upsert(["FR1", "FR1"], embedder.embed(["a", "b"]), ["a", "b"])
+
+
+def test_hnsw_refuses_removal(storage):
+    faiss_manager = FaissManager(storage, embedder=embedder)
+    faiss_manager.create_index(embedder.dimension, IndexConfig(factory="HNSW16", id_map=True))
+    faiss_manager.add_vectors(embedder.embed(texts[:10]), texts[:10], ids=ids[:10])
+    with pytest.raises(ValueError, match="does not support removal"):
+        faiss_manager.remove(["FR1"])
+    assert faiss_manager.lookup(FaissManager.to_faiss_ids(["FR1"])).tolist() == ["mark 1"]
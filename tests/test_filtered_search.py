@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from benchmarks import synthetic
+from src.faiss_manager import FaissManager
+from src.index_config import IndexConfig
+from src.record_attributes import RecordAttributes, RecordFilter
+from src.storage_provider import FileSystemStorageProvider
+
+n = 5000
+# Only the first records have attributes, as after vectors were added without refreshing them
+attributed = 3000
+dimension = 32
+
+
+def records():
+    return [
+        {
+            "ApplicationDate": f"{2000 + i % 20}-{1 + i % 12:02d}-15",
+            "ClassNumber": [9] if i % 7 == 0 else [35, 42],
+            "MarkCurrentStatusCode": "Registered" if i % 2 else "Filed"
+        }
+        for i in range(attributed)
+    ]
+
+
+def build(tmp_path, config: IndexConfig, ids=None) -> FaissManager:
+    faiss_manager = FaissManager(FileSystemStorageProvider(str(tmp_path / "index.faiss"), str(tmp_path / "mapping.json")))
+    faiss_manager.create_index(dimension, config)
+    faiss_manager.add_vectors(synthetic.embeddings(n, dimension), [f"mark {i}" for i in range(n)], ids=ids)
+    faiss_ids = FaissManager.to_faiss_ids(ids) if ids is not None else np.arange(n)
+    faiss_manager.attributes = RecordAttributes.from_records(faiss_ids[:attributed], records())
+    return faiss_manager
+
+
+@pytest.fixture(params=["positions", "hashed"])
+def faiss_manager(request, tmp_path):
+    # Positional ids get a bitmap selector, hashed external ids a hash-set selector
+    if request.param == "positions":
+        return build(tmp_path, IndexConfig.flat())
+    return build(tmp_path, IndexConfig(factory="Flat", id_map=True), ids=[f"FR{i}" for i in range(n)])
+
+
+@pytest.mark.parametrize("exact_filter_limit", [0, 10**6])
+def test_filtered_search_only_returns_matching_records(faiss_manager, monkeypatch, exact_filter_limit):
+    # 0 pushes the filter down into FAISS; a large limit answers by an exact scan of the matches
+    monkeypatch.setattr(FaissManager, "_exact_filter_limit", exact_filter_limit)
+    where = RecordFilter(classes=[9])
+    allowed = set(faiss_manager.attributes.matching_ids(where).tolist())
+    # Queries near vectors that have no attributes at all
+    queries = synthetic.embeddings(n, dimension)[attributed + 1000:attributed + 1100]
+
+    result = faiss_manager.search_batch(queries, 10, where=where)
+
+    found = result.ids[result.ids >= 0]
+    assert len(found) == 10 * len(queries)
+    assert set(found.tolist()) <= allowed
+
+
+def test_filtered_search_is_exact_on_flat_indexes(faiss_manager):
+    where = RecordFilter(date_from="2010-01-01", statuses=["Registered"])
+    allowed = faiss_manager.attributes.matching_ids(where)
+    all_ids, vectors = faiss_manager.reconstruct_all()
+    queries = synthetic.queries(20, dimension)
+
+    result = faiss_manager.search_batch(queries, 5, where=where)
+
+    allowed_vectors = vectors[np.isin(all_ids, allowed)]
+    allowed_ids = all_ids[np.isin(all_ids, allowed)]
+    distances = ((queries[:, None, :] - allowed_vectors[None, :, :]) ** 2).sum(axis=2)
+    expected = allowed_ids[np.argsort(distances, axis=1, kind='stable')[:, :5]]
+    assert (np.sort(result.ids, axis=1) == np.sort(expected, axis=1)).all()
+
+
+def test_filter_without_matches_returns_nothing(faiss_manager):
+    result = faiss_manager.search_batch(synthetic.queries(3, dimension), 5, where=RecordFilter(statuses=["Expired"]))
+    assert (result.ids == -1).all()
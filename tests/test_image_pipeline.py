@@ -0,0 +1,94 @@
+import threading
+from typing import Iterator, List
+import numpy as np
+import pytest
+from PIL import Image
+from src.embedder import FakeEmbedder
+from src.faiss_manager import FaissManager
+from src.image_pipeline import DirectoryFetcher, ImagePipeline
+from src.index_config import IndexConfig
+from src.storage_provider import FileSystemStorageProvider
+
+
+class PixelEmbedder:
+    # Stands in for CLIP: FakeEmbedder vectors seeded by the decoded pixels, so no model is loaded
+    def __init__(self, dimension: int = 16):
+        self.fake = FakeEmbedder(dimension)
+
+    def get_embedding_dimension(self) -> int:
+        return self.fake.dimension
+
+    def embed_images(self, images: List[Image.Image], batch_size: int = 32) -> np.ndarray:
+        return self.fake.embed([image.tobytes().hex() for image in images])
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    for i in range(10):
+        Image.new('RGB', (32 + i, 24), (25 * i, 255 - 25 * i, 128)).save(tmp_path / f"{i}.png")
+    (tmp_path / "broken.png").write_bytes(b"not an image")
+    return tmp_path
+
+
+def manager(tmp_path) -> FaissManager:
+    return FaissManager(FileSystemStorageProvider(str(tmp_path / "images.faiss"), str(tmp_path / "images.json")))
+
+
+def pipeline(image_dir) -> ImagePipeline:
+    return ImagePipeline(DirectoryFetcher(str(image_dir)), PixelEmbedder(), fetch_workers=3, decode_workers=2, batch_size=4, queue_size=2)
+
+
+def test_run_indexes_every_readable_image(image_dir, tmp_path):
+    faiss_manager = manager(tmp_path)
+    sources = [f"{i}.png" for i in range(10)] + ["broken.png", "missing.png"]
+
+    report = pipeline(image_dir).run(sources, faiss_manager)
+
+    assert faiss_manager.index.ntotal == 10
+    assert faiss_manager.config.metric == "cosine"
+    assert sorted(faiss_manager.mapping.values()) == sorted(f"{i}.png" for i in range(10))
+    assert sorted((stage, source) for stage, source, _ in report.failures) == [("decode", "broken.png"), ("fetch", "missing.png")]
+    assert report.stages["embed"].processed == 10
+
+    # An image searches back to itself
+    with Image.open(image_dir / "3.png") as image:
+        query = PixelEmbedder().embed_images([image.convert('RGB')])
+    assert faiss_manager.search_batch(query, 1).payloads[0][0] == "3.png"
+
+
+def test_run_uses_the_given_index_config(image_dir, tmp_path):
+    faiss_manager = manager(tmp_path)
+    pipeline(image_dir).run([f"{i}.png" for i in range(10)], faiss_manager, index_config=IndexConfig.hnsw(metric="ip"))
+
+    assert faiss_manager.config.factory == "HNSW32"
+    assert faiss_manager.config.metric == "ip"
+    assert faiss_manager.index.ntotal == 10
+
+
+def test_run_rejects_untrained_indexes(image_dir, tmp_path):
+    with pytest.raises(ValueError, match="train"):
+        pipeline(image_dir).run(["0.png"], manager(tmp_path), index_config=IndexConfig.ivf_flat(4))
+
+
+def test_failing_sources_stop_the_workers(image_dir, tmp_path):
+    def sources() -> Iterator[str]:
+        for i in range(6):
+            yield f"{i}.png"
+        raise RuntimeError("feed broke")
+
+    faiss_manager = manager(tmp_path)
+    errors: List[BaseException] = []
+
+    def run() -> None:
+        try:
+            pipeline(image_dir).run(sources(), faiss_manager)
+        except RuntimeError as e:
+            errors.append(e)
+
+    # Run aside: a regression would hang forever instead of failing
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "ImagePipeline.run did not return"
+    assert [str(e) for e in errors] == ["feed broke"]
+    assert faiss_manager.index.ntotal == 6
@@ -0,0 +1,13 @@
+import pytest
+from benchmarks.import_time import budgets, heavy_modules, import_once
+
+
+@pytest.mark.parametrize("module", sorted(budgets))
+def test_import_is_light(module):
+    # Same probe and budgets as benchmarks/import_time.py; best of three absorbs a cold disk cache
+    wall, result = min((import_once(module) for _ in range(3)), key=lambda run: run[0])
+    assert result.returncode == 0, result.stderr.strip().splitlines()[-1:]
+
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    assert loaded == [], f"{module} imports heavy backends: {', '.join(loaded)} (expected none of {heavy_modules})"
+    assert wall <= budgets[module], f"{module} took {wall:.2f}s to import, budget {budgets[module]:.2f}s"
@@ -0,0 +1,67 @@
+import os
+from typing import List
+import numpy as np
+import pytest
+from src.embedder import FakeEmbedder
+from src.faiss_manager import FaissManager
+from src.index_builder import IndexBuilder
+from src.index_config import IndexConfig
+from src.storage_provider import FileSystemStorageProvider
+
+texts = [f"mark {i}" for i in range(3000)]
+ids = [f"FR{i}" for i in range(3000)]
+
+
+class Interrupted(Exception):
+    pass
+
+
+class CrashingEmbedder(FakeEmbedder):
+    # Same model id and vectors as FakeEmbedder(32), but the build dies on the crash_at-th API call
+    def __init__(self, crash_at: int = 0):
+        super().__init__(32, batch_size=50)
+        self.crash_at: int = crash_at
+
+    def embed(self, texts: List[str], task_type: str = "retrieval_document") -> np.ndarray:
+        if self.calls + 1 == self.crash_at:
+            raise Interrupted()
+        return super().embed(texts, task_type)
+
+
+def build(directory, config, embedder: CrashingEmbedder, with_ids: bool) -> FaissManager:
+    directory.mkdir(exist_ok=True)
+    storage = FileSystemStorageProvider(str(directory / "index.faiss"), str(directory / "mapping.json"))
+    # One worker: the crash lands after exactly crash_at - 1 batches
+    builder = IndexBuilder(FaissManager(storage), concurrency=1, requests_per_minute=None, embedder=embedder)
+    builder.build_index_streaming(texts, config, batch_size=50, checkpoint_every=5, ids=ids if with_ids else None)
+    faiss_manager = FaissManager(storage, embedder=embedder)
+    faiss_manager.load()
+    return faiss_manager
+
+
+@pytest.mark.parametrize("config, with_ids", [
+    (IndexConfig.flat(), False),
+    (IndexConfig(factory="IVF8,Flat", nprobe=8, train_size=1200), False),
+    (IndexConfig(factory="IVF8,Flat", nprobe=8, train_size=1200), True),
+])
+@pytest.mark.parametrize("crash_at", [12, 23, 40])
+def test_resumed_build_matches_uninterrupted_build(tmp_path, config, with_ids, crash_at):
+    reference = build(tmp_path / "reference", config, CrashingEmbedder(), with_ids)
+
+    with pytest.raises(Interrupted):
+        build(tmp_path / "resumed", config, CrashingEmbedder(crash_at), with_ids)
+    resuming = CrashingEmbedder()
+    resumed = build(tmp_path / "resumed", config, resuming, with_ids)
+
+    # Batches saved by the last checkpoint are not embedded again
+    checkpointed = (crash_at - 1) // 5 * 5
+    assert resuming.calls == len(texts) // 50 - checkpointed
+    assert dict(resumed.mapping) == dict(reference.mapping)
+    reference_ids, reference_vectors = reference.reconstruct_all()
+    resumed_ids, resumed_vectors = resumed.reconstruct_all()
+    assert (resumed_ids == reference_ids).all()
+    assert np.allclose(resumed_vectors, reference_vectors)
+    queries = resuming.embed(texts[::300])
+    assert (resumed.search_batch(queries, 5).ids == reference.search_batch(queries, 5).ids).all()
+    # Checkpoint files are gone once the build completes
+    assert sorted(os.listdir(tmp_path / "resumed")) == sorted(os.listdir(tmp_path / "reference"))
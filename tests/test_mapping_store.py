@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from src.embedder import FakeEmbedder
+from src.faiss_manager import FaissManager
+from src.index_config import IndexConfig
+from src.mapping_store import MappingStore, is_mapping_store_path
+from src.storage_provider import FileSystemStorageProvider
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "mapping.mmap")
+    mapping = {5: "L'Oréal", 0: "", 2**62: "Selego", 7: "Crédit Agricole 🌾"}
+
+    MappingStore.write(path, mapping)
+    store = MappingStore.open(path)
+
+    assert dict(store.items()) == mapping
+    assert store.ids().tolist() == sorted(mapping)
+    assert store.lookup(np.array([[7, 1], [-1, 2**62]])).tolist() == [["Crédit Agricole 🌾", None], [None, "Selego"]]
+    assert 3 not in store
+    with pytest.raises(KeyError):
+        store[3]
+
+
+def test_rewrite_swaps_generations(tmp_path):
+    path = str(tmp_path / "mapping.mmap")
+    MappingStore.write(path, {0: "old"})
+    reader = MappingStore.open(path)
+
+    MappingStore.write(path, {0: "new", 1: "added"})
+    MappingStore.write(path, {0: "newest"})
+
+    # A store opened before the swaps keeps its own generation
+    assert dict(reader.items()) == {0: "old"}
+    assert dict(MappingStore.open(path).items()) == {0: "newest"}
+    assert is_mapping_store_path(path)
+
+
+def test_storage_provider_picks_the_format_from_the_path(tmp_path):
+    mapping = {i: f"mark {i}" for i in range(100)}
+    json_storage = FileSystemStorageProvider(str(tmp_path / "a.faiss"), str(tmp_path / "a.json"))
+    store_storage = FileSystemStorageProvider(str(tmp_path / "b.faiss"), str(tmp_path / "b.mmap"))
+    json_storage.save_mapping(mapping)
+    store_storage.save_mapping(mapping)
+
+    assert isinstance(json_storage.load_mapping(), dict)
+    assert isinstance(store_storage.load_mapping(), MappingStore)
+    assert dict(store_storage.load_mapping().items()) == json_storage.load_mapping() == mapping
+
+
+def test_memory_mapped_index_refuses_upserts(tmp_path):
+    storage = FileSystemStorageProvider(str(tmp_path / "index.faiss"), str(tmp_path / "mapping.mmap"))
+    embedder = FakeEmbedder(16)
+    texts = [f"mark {i}" for i in range(50)]
+    ids = [f"FR{i}" for i in range(50)]
+    faiss_manager = FaissManager(storage, embedder=embedder)
+    faiss_manager.create_index(embedder.dimension, IndexConfig(id_map=True))
+    faiss_manager.add_vectors(embedder.embed(texts), texts, ids=ids)
+    faiss_manager.save()
+
+    mapped = FaissManager(storage, embedder=embedder)
+    mapped.load(mmap=True)
+    assert isinstance(mapped.mapping, MappingStore)
+    assert mapped.search("mark 7", k=1)[0][0] == "mark 7"
+    with pytest.raises(ValueError, match="read-only"):
+        mapped.upsert(["FR7"], embedder.embed(["renamed"]), ["renamed"])
+    assert mapped.index.ntotal == 50
+    assert mapped.lookup(FaissManager.to_faiss_ids(["FR7"])).tolist() == ["mark 7"]
+
+    # A regular load can be modified, and saves back to the store
+    writable = FaissManager(storage, embedder=embedder)
+    writable.load()
+    writable.upsert(["FR7"], embedder.embed(["renamed"]), ["renamed"])
+    writable.save()
+    reloaded = FaissManager(storage, embedder=embedder)
+    reloaded.load(mmap=True)
+    assert reloaded.search("renamed", k=1)[0][0] == "renamed"
@@ -0,0 +1,43 @@
+from typing import List, Tuple
+import Levenshtein
+import pytest
+from benchmarks import synthetic
+from src.phonetic_index import PhoneticIndex, QGramIndex
+
+# The engines only compare strings: synthetic marks stand in for IPA transcriptions, no epitran needed
+phonetics = [mark.lower() for mark in synthetic.marks(3000)] + ["", "a", "ab"]
+index = PhoneticIndex(list(range(len(phonetics))), phonetics, phonetics, "fra-Latn")
+queries = [phonetics[17], phonetics[2500], "selego", "maison crédit", "x", "", "zzzzzzzzzzzzzzzzzzzzzzzz"]
+
+
+def scan(query: str) -> List[Tuple[int, int]]:
+    # Brute force: every (position, distance), ordered like the engines
+    return sorted(((position, Levenshtein.distance(query, phonetic)) for position, phonetic in enumerate(phonetics)), key=lambda hit: (hit[1], hit[0]))
+
+
+@pytest.mark.parametrize("query", queries)
+@pytest.mark.parametrize("max_distance", [0, 1, 2, 4])
+def test_search_within_matches_a_full_scan(query, max_distance):
+    assert index.search_within(query, max_distance) == [hit for hit in scan(query) if hit[1] <= max_distance]
+
+
+@pytest.mark.parametrize("query", queries)
+@pytest.mark.parametrize("k", [1, 10, 1000])
+def test_search_nearest_matches_a_full_scan(query, k):
+    assert index.search_nearest(query, k) == scan(query)[:k]
+
+
+@pytest.mark.parametrize("query", queries)
+def test_length_buckets_match_a_full_scan(query):
+    assert index.search(query, 25) == scan(query)[:25]
+
+
+def test_qgram_postings_round_trip():
+    restored = QGramIndex.from_bytes(index.qgrams.to_bytes())
+    for query in queries:
+        assert restored.candidates(query, 2).tolist() == index.qgrams.candidates(query, 2).tolist()
+
+
+def test_negative_radius_is_rejected():
+    with pytest.raises(ValueError):
+        index.search_within("selego", -1)